@@ -13,6 +13,7 @@ Features
   `--branch-rate`, `--loop-rate`, `--attr-rate`, `--flow-rate`, `--flow-count`)
 - Helper multiplicity (`--string-helpers`, `--call-helpers`)
 - Optional multithreaded stage acceleration (`--mt-workers`)
+- Multi-file batches across worker processes (`--jobs`)
 - Frontline symbol redirects (`--frontline-redirects`, `--redirect-rate`, `--redirect-max`, `--redirect-kinds`)
 - Redirect presets + per-kind resolver modes (`--redirect-all`, `--redirect-class-mode`,
   `--redirect-function-mode`, `--redirect-variable-mode`)
@@ -32,23 +33,78 @@ import argparse
 import ast
 import base64
 import builtins
-import copy
-from concurrent.futures import ThreadPoolExecutor
+import functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timezone
 import hashlib
 import json
 import keyword
 import marshal
+import math
+import os
 import random
 import struct
 import sys
 import zlib
-from dataclasses import dataclass, field
+from dataclasses import dataclass, fields, replace
 from pathlib import Path
-from typing import Iterable
+from typing import Callable, Iterable, Iterator
+
+
+BUILTIN_NAMES = frozenset(dir(builtins))
+_RESERVED = BUILTIN_NAMES | frozenset(keyword.kwlist)
+# Builtins that may be aliased; dunders (__import__, __build_class__, ...) never are.
+_BUILTIN_NAMES_NOT_DUNDER = frozenset(name for name in BUILTIN_NAMES if not (name[:2] == "__" == name[-2:]))
+# Expression contexts and operators carry no state, so one instance of each is shared
+# (ast.parse does the same).
+_LOAD = ast.Load()
+_STORE = ast.Store()
+_DEL = ast.Del()
+_ADD = ast.Add()
+_BITXOR = ast.BitXor()
+_NOT = ast.Not()
+_EQ = ast.Eq()
+_IS = ast.Is()
+# Argument packs for calls without args/kwargs; shared because nothing appends to
+# their (empty) element lists once they are in the tree.
+_EMPTY_TUPLE = ast.Tuple(elts=[], ctx=_LOAD)
+_EMPTY_DICT = ast.Dict(keys=[], values=[])
+# Dunders attribute rewriters see most often; a set hit skips the slicing check.
+_COMMON_DUNDERS = frozenset(dir(object)) | frozenset(
+    ("__dict__", "__name__", "__qualname__", "__module__", "__file__", "__all__", "__path__", "__wrapped__")
+)
+# ASDL field types that never hold a node worth walking into: plain values, plus the
+# field-less context/operator singletons.
+_LEAF_FIELD_TYPES = frozenset(
+    ("identifier", "string", "constant", "int", "expr_context", "operator", "unaryop", "cmpop", "boolop")
+)
 
 
-BUILTIN_NAMES = set(dir(builtins))
+def _child_fields(cls: type) -> tuple[str, ...]:
+    # Node classes document their ASDL signature, e.g. "Name(identifier id, expr_context ctx)".
+    doc = cls.__doc__ or ""
+    start = doc.find("(")
+    if start < 0 or not doc.endswith(")"):
+        return cls._fields
+    fields: list[str] = []
+    names: list[str] = []
+    for part in doc[start + 1 : -1].split(", "):
+        kind, _, name = part.partition(" ")
+        names.append(name)
+        if kind.rstrip("*?") not in _LEAF_FIELD_TYPES:
+            fields.append(name)
+    if tuple(names) != cls._fields:
+        return cls._fields
+    return tuple(fields)
+
+
+# Per node class, the fields that can hold child nodes; walkers fall back to _fields
+# for classes missing here.
+_CHILD_FIELDS: dict[type, tuple[str, ...]] = {
+    cls: _child_fields(cls)
+    for cls in vars(ast).values()
+    if isinstance(cls, type) and issubclass(cls, ast.AST) and cls._fields
+}
 PASS_TRANSFORMS = (
     "imports",
     "attrs",
@@ -63,6 +119,26 @@ PASS_TRANSFORMS = (
     "none",
     "flow",
 )
+# Repeated string literals shorter than this share one encoding unless --no-dedup.
+STRING_DEDUP_MAX_LEN = 32
+# From their second occurrence, deduplicated literals at least this long read a shared
+# module-level name instead of repeating the decode call.
+STRING_HOIST_MIN_LEN = 4
+# Constant-level transforms that share one walk when adjacent in the order (value: stats field).
+CONSTANT_TRANSFORMS = {
+    "bools": "bools",
+    "ints": "ints",
+    "floats": "floats",
+    "bytes": "bytes_",
+    "none": "none_values",
+}
+# Node-rewrite transforms that share one walk (FusedRewriter) when adjacent in the order.
+REWRITE_TRANSFORMS = {
+    "attrs": "attrs",
+    "setattrs": "setattrs",
+    "calls": "calls",
+    "flow": "flow_blocks",
+}
 METHOD_FAMILIES = ("attr", "setattr", "call", "builtin", "import")
 
 AVAILABLE_METHODS: dict[str, tuple[str, ...]] = {
@@ -101,47 +177,52 @@ AVAILABLE_METHODS: dict[str, tuple[str, ...]] = {
     ),
 }
 
-RISKY_METHODS = {"call": {"builtins_eval_call"}}
+RISKY_METHODS = {"call": frozenset({"builtins_eval_call"})}
 
-DYNAMIC_LEVEL_DEFAULTS: dict[str, dict[str, tuple[str, ...]]] = {
+# Frozen so resolve_config can start from them without copying.
+DYNAMIC_LEVEL_DEFAULTS: dict[str, dict[str, frozenset[str]]] = {
     "safe": {
-        "attr": ("getattr", "builtins_getattr", "operator_attrgetter", "lambda_getattr"),
-        "setattr": ("setattr", "delattr", "builtins_setattr", "builtins_delattr", "lambda_setattr"),
-        "call": ("helper_wrap", "lambda_wrap", "factory_lambda_call"),
-        "builtin": ("alias", "builtins_getattr_alias"),
-        "import": ("importlib_import_module", "builtins_import"),
+        "attr": frozenset(("getattr", "builtins_getattr", "operator_attrgetter", "lambda_getattr")),
+        "setattr": frozenset(("setattr", "delattr", "builtins_setattr", "builtins_delattr", "lambda_setattr")),
+        "call": frozenset(("helper_wrap", "lambda_wrap", "factory_lambda_call")),
+        "builtin": frozenset(("alias", "builtins_getattr_alias")),
+        "import": frozenset(("importlib_import_module", "builtins_import")),
     },
     "medium": {
-        "attr": (
-            "getattr",
-            "builtins_getattr",
-            "operator_attrgetter",
-            "lambda_getattr",
-            "globals_getattr",
+        "attr": frozenset(
+            (
+                "getattr",
+                "builtins_getattr",
+                "operator_attrgetter",
+                "lambda_getattr",
+                "globals_getattr",
+            )
         ),
-        "setattr": (
-            "setattr",
-            "delattr",
-            "builtins_setattr",
-            "builtins_delattr",
-            "lambda_setattr",
-            "lambda_delattr",
+        "setattr": frozenset(
+            (
+                "setattr",
+                "delattr",
+                "builtins_setattr",
+                "builtins_delattr",
+                "lambda_setattr",
+                "lambda_delattr",
+            )
         ),
-        "call": ("helper_wrap", "lambda_wrap", "factory_lambda_call", "thunk_wrap"),
-        "builtin": ("alias", "builtins_getattr_alias", "globals_lookup"),
-        "import": ("importlib_import_module", "builtins_import", "dunder_import_module"),
+        "call": frozenset(("helper_wrap", "lambda_wrap", "factory_lambda_call", "thunk_wrap")),
+        "builtin": frozenset(("alias", "builtins_getattr_alias", "globals_lookup")),
+        "import": frozenset(("importlib_import_module", "builtins_import", "dunder_import_module")),
     },
     "heavy": {
-        "attr": AVAILABLE_METHODS["attr"],
-        "setattr": AVAILABLE_METHODS["setattr"],
-        "call": AVAILABLE_METHODS["call"],
-        "builtin": AVAILABLE_METHODS["builtin"],
-        "import": AVAILABLE_METHODS["import"],
+        "attr": frozenset(AVAILABLE_METHODS["attr"]),
+        "setattr": frozenset(AVAILABLE_METHODS["setattr"]),
+        "call": frozenset(AVAILABLE_METHODS["call"]),
+        "builtin": frozenset(AVAILABLE_METHODS["builtin"]),
+        "import": frozenset(AVAILABLE_METHODS["import"]),
     },
 }
 
 
-@dataclass
+@dataclass(slots=True)
 class ObfuscationConfig:
     level: int
     profile: str
@@ -199,6 +280,7 @@ class ObfuscationConfig:
     flow_count: int
     string_chunk_min: int
     string_chunk_max: int
+    string_dedup: bool
     string_helpers: int
     call_helpers: int
     transform_order: tuple[str, ...]
@@ -211,6 +293,7 @@ class ObfuscationConfig:
     mt_workers: int
     emit_map: Path | None
     emit_meta: Path | None
+    cache_dir: Path | None
     meta_include_source: bool
     meta_minimal: bool
     meta_omit_rename_map: bool
@@ -220,7 +303,7 @@ class ObfuscationConfig:
     explain: bool
 
 
-@dataclass
+@dataclass(slots=True)
 class ObfuscationStats:
     renamed: int = 0
     strings: int = 0
@@ -240,224 +323,411 @@ class ObfuscationStats:
     builtins: int = 0
     redirects: int = 0
     junk_functions: int = 0
-    warnings: list[str] = field(default_factory=list)
+    warnings: list[str] | None = None
+
+    def warn(self, message: str) -> None:
+        if self.warnings is None:
+            self.warnings = []
+        self.warnings.append(message)
 
 
 class NameGenerator:
-    def __init__(self, used: Iterable[str], rng: random.Random | None = None) -> None:
-        self.used = set(used)
+    def __init__(self, used: set[str], rng: random.Random | None = None) -> None:
+        # Shared with the caller: minted names are added to the same set, so later
+        # generators built on it never hand them out again.
+        self.used = used
         self.counter = 0
         self.rng = rng
 
+    def reserve(self, name: str) -> None:
+        self.used.add(name)
+
     def _random_name(self) -> str:
         assert self.rng is not None
-        # Ambiguous mixed-shape names are harder to visually track.
-        first = self.rng.choice("lIOo")
-        size = self.rng.randint(6, 12)
-        tail = "".join(self.rng.choice("lIOo01") for _ in range(size))
-        return f"_{first}{tail}"
+        # Ambiguous mixed-shape names are harder to visually track. One 64-bit draw
+        # covers the whole name (at most 2 + log2(7 * 6**12) < 37 bits are used).
+        bits = self.rng.getrandbits(64)
+        first = "lIOo"[bits & 3]
+        bits, size = divmod(bits >> 2, 7)
+        tail = []
+        for _ in range(size + 6):
+            bits, digit = divmod(bits, 6)
+            tail.append("lIOo01"[digit])
+        return "_" + first + "".join(tail)
 
     def next_name(self) -> str:
+        used = self.used
         if self.rng is not None:
             for _ in range(2048):
                 name = self._random_name()
-                if name not in self.used and not keyword.iskeyword(name):
-                    self.used.add(name)
+                if name not in used and name not in _RESERVED:
+                    used.add(name)
                     return name
+        counter = self.counter
         while True:
-            name = f"_o{self.counter:x}"
-            self.counter += 1
-            if name not in self.used and not keyword.iskeyword(name):
-                self.used.add(name)
+            name = "_o%x" % counter
+            counter += 1
+            if name not in used and name not in _RESERVED:
+                self.counter = counter
+                used.add(name)
                 return name
 
 
+class BufferedRandom(random.Random):
+    # randint() for spans up to 2**16 served from per-range batches of pre-drawn values
+    # (rejection sampling keeps them unbiased); for generators that need many small
+    # integers from the same few ranges, such as the dead-code builders.
+    def __init__(self, seed: int) -> None:
+        random.Random.__init__(self, seed)
+        self._pools: dict[tuple[int, int], list[int]] = {}
+
+    def randint(self, a: int, b: int) -> int:
+        pool = self._pools.get((a, b))
+        if not pool:
+            span = b - a + 1
+            if span > 0x10000:
+                return random.Random.randint(self, a, b)
+            limit = 0x10000 - 0x10000 % span
+            raw = struct.unpack(">1024H", self.randbytes(2048))
+            pool = self._pools[(a, b)] = [a + value % span for value in raw if value < limit]
+        return pool.pop()
+
+
+class RateGate:
+    # Bernoulli(rate) accept/reject for per-node rewrites. Rejections are counted down
+    # from a geometric gap, so the RNG is drawn once per accepted node rather than per
+    # node, and not at all for rates of 0 or 1.
+    __slots__ = ("rng", "rate", "log_miss", "skip")
+
+    def __init__(self, rng: random.Random, rate: float) -> None:
+        self.rng = rng
+        self.rate = rate
+        self.skip = 0
+        if 0.0 < rate < 1.0:
+            self.log_miss = math.log1p(-rate)
+            self.skip = self._gap()
+
+    def _gap(self) -> int:
+        return int(math.log(1.0 - self.rng.random()) / self.log_miss)
+
+    def __call__(self) -> bool:
+        if self.skip:
+            self.skip -= 1
+            return False
+        rate = self.rate
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        self.skip = self._gap()
+        return True
+
+
+class DispatchTransformer(ast.NodeTransformer):
+    # NodeTransformer.visit builds "visit_" + the class name and getattr()s it for every
+    # node; here the resolved method is cached per node class, one table per subclass.
+    _visitors: dict[type, Callable[..., ast.AST | list[ast.AST] | None]] = {}
+
+    def __init_subclass__(cls) -> None:
+        cls._visitors = {}
+
+    def visit(self, node: ast.AST) -> ast.AST | list[ast.AST] | None:
+        kind = type(node)
+        method = self._visitors.get(kind)
+        if method is None:
+            cls = type(self)
+            method = self._visitors[kind] = getattr(cls, "visit_" + kind.__name__, cls.generic_visit)
+        return method(self, node)
+
+
+_GENERATED_TAIL = frozenset("lIOo01")
+
+
 def random_local_identifier(rng: random.Random, min_size: int = 5, max_size: int = 11) -> str:
     alphabet = "lIOoabcxyz"
     size = rng.randint(min_size, max_size)
     first = rng.choice("lIOoabcxyz_")
     tail = "".join(rng.choice(alphabet + "0123456789_") for _ in range(size))
     candidate = f"_{first}{tail}"
-    if candidate.isidentifier() and not keyword.iskeyword(candidate):
+    # NameGenerator shapes are left to NameGenerator: module-level names are checked
+    # against the used set only, never against locals minted here.
+    if candidate.isidentifier() and not keyword.iskeyword(candidate) and not (
+        first in "lIOo" and _GENERATED_TAIL.issuperset(tail)
+    ):
         return candidate
     return f"_v{rng.randint(1000, 999999)}"
 
 
-class RenameCollector(ast.NodeVisitor):
+class RenameVisitor(ast.NodeTransformer):
+    # Single walk: bindings are decided as they are met and sites of already-bound names
+    # are rewritten on the spot. A name can be loaded before the binding that makes it
+    # renamable is seen, so other sites are recorded and settled after the walk.
+    #
+    # Names bound directly in a class body (attributes, methods, nested classes) are
+    # never renamed, at any nesting depth, since they are reachable as attributes.
+    # Loads are renamed whatever the scope. Known limitation: a class-body load of a
+    # name the class itself rebinds (z = 5; class D: z = 2; w = z * 3) is renamed to
+    # the outer binding, so it reads the module-level z (D.w == 15, not 6).
     def __init__(self, preserve: set[str], generator: NameGenerator) -> None:
         self.preserve = preserve
         self.generator = generator
         self.mapping: dict[str, str] = {}
-        self.class_depth = 0
-        self.function_depth = 0
+        # Bound once: the mapping is only ever added to, never replaced.
+        self._lookup = self.mapping.get
+        self._allowed_cache: dict[str, bool] = {}
+        self.sites: list[tuple[ast.AST, str, str]] = []
+        self.scope_decls: list[ast.Global | ast.Nonlocal] = []
+        self.dispatch = {
+            ast.Name: self._visit_name,
+            ast.FunctionDef: self._visit_function,
+            ast.AsyncFunctionDef: self._visit_function,
+            ast.ClassDef: self._visit_class,
+            ast.arg: self._visit_arg,
+            ast.Global: self._visit_scope_decl,
+            ast.Nonlocal: self._visit_scope_decl,
+            ast.ExceptHandler: self._visit_handler,
+            ast.Import: self._visit_import,
+            ast.ImportFrom: self._visit_import,
+        }
 
     def _allowed(self, name: str) -> bool:
-        if (
-            not name
-            or name in self.preserve
-            or name in BUILTIN_NAMES
-            or keyword.iskeyword(name)
-            or (name.startswith("__") and name.endswith("__"))
-        ):
-            return False
-        return True
+        allowed = self._allowed_cache.get(name)
+        if allowed is None:
+            allowed = self._allowed_cache[name] = not (
+                not name
+                or name in self.preserve
+                or name in _RESERVED
+                or name[:2] == "__" == name[-2:]
+            )
+        return allowed
 
     def _bind(self, name: str) -> None:
-        if self._allowed(name) and name not in self.mapping:
+        if name not in self.mapping and self._allowed(name):
             self.mapping[name] = self.generator.next_name()
 
-    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
-        if self.class_depth == 0 or self.function_depth > 0:
-            self._bind(node.name)
-        self.function_depth += 1
-        self.visit(node.args)
-        for dec in node.decorator_list:
-            self.visit(dec)
-        for stmt in node.body:
-            self.visit(stmt)
-        if node.returns:
-            self.visit(node.returns)
-        self.function_depth -= 1
+    def _site(self, node: ast.AST, field_name: str, name: str) -> None:
+        new_name = self._lookup(name)
+        if new_name is not None:
+            setattr(node, field_name, new_name)
+        else:
+            self.sites.append((node, field_name, name))
+
+    def visit(self, node: ast.AST) -> ast.AST:
+        _walk_scoped(node, self.dispatch)
+        mapping = self.mapping
+        for site, field_name, name in self.sites:
+            new_name = mapping.get(name)
+            if new_name is not None:
+                setattr(site, field_name, new_name)
+        for decl in self.scope_decls:
+            decl.names = [mapping.get(name, name) for name in decl.names]
+        return node
 
-    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> None:
-        self.visit_FunctionDef(node)
+    def _visit_name(self, node: ast.Name, class_body: bool, stack: list) -> None:
+        if type(node.ctx) is not ast.Load:
+            if class_body:
+                return
+            self._bind(node.id)
+        new_name = self._lookup(node.id)
+        if new_name is not None:
+            node.id = new_name
+        else:
+            self.sites.append((node, "id", node.id))
 
-    def visit_ClassDef(self, node: ast.ClassDef) -> None:
-        if self.class_depth == 0 or self.function_depth > 0:
+    def _visit_function(self, node: ast.FunctionDef, class_body: bool, stack: list) -> None:
+        if not class_body:
             self._bind(node.name)
-        self.class_depth += 1
-        for base in node.bases:
-            self.visit(base)
-        for kw in node.keywords:
-            self.visit(kw)
-        for dec in node.decorator_list:
-            self.visit(dec)
-        for stmt in node.body:
-            self.visit(stmt)
-        self.class_depth -= 1
+            self._site(node, "name", node.name)
+        _push_children(node, False, stack)
 
-    def visit_arg(self, node: ast.arg) -> None:
+    def _visit_class(self, node: ast.ClassDef, class_body: bool, stack: list) -> None:
+        if not class_body:
+            self._bind(node.name)
+            self._site(node, "name", node.name)
+        # Decorators/bases execute in outer scope, not class local scope.
+        for field_name in _CHILD_FIELDS[ast.ClassDef]:
+            value = getattr(node, field_name, None)
+            if field_name == "body":
+                stack.extend((stmt, True) for stmt in value)
+            elif type(value) is list:
+                stack.extend((item, class_body) for item in value if type(item) in _RENAME_WALKED)
+            elif type(value) in _RENAME_WALKED:
+                stack.append((value, class_body))
+
+    def _visit_arg(self, node: ast.arg, class_body: bool, stack: list) -> None:
         self._bind(node.arg)
+        self._site(node, "arg", node.arg)
         if node.annotation:
-            self.visit(node.annotation)
+            stack.append((node.annotation, class_body))
 
-    def visit_Name(self, node: ast.Name) -> None:
-        if self.class_depth > 0 and self.function_depth == 0:
-            return
-        if isinstance(node.ctx, (ast.Store, ast.Del)):
-            self._bind(node.id)
+    def _visit_scope_decl(self, node: ast.Global | ast.Nonlocal, class_body: bool, stack: list) -> None:
+        self.scope_decls.append(node)
 
-    def visit_ExceptHandler(self, node: ast.ExceptHandler) -> None:
+    def _visit_handler(self, node: ast.ExceptHandler, class_body: bool, stack: list) -> None:
         if isinstance(node.name, str):
             self._bind(node.name)
-        if node.type:
-            self.visit(node.type)
-        for stmt in node.body:
-            self.visit(stmt)
+            self._site(node, "name", node.name)
+        _push_children(node, class_body, stack)
 
-    def visit_Import(self, node: ast.Import) -> None:
-        if self.class_depth > 0 and self.function_depth == 0:
-            return
-        for alias in node.names:
-            bound = alias.asname or alias.name.split(".")[0]
-            self._bind(bound)
-
-    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
-        if self.class_depth > 0 and self.function_depth == 0:
+    def _visit_import(self, node: ast.Import | ast.ImportFrom, class_body: bool, stack: list) -> None:
+        if class_body:
             return
+        from_import = type(node) is ast.ImportFrom
+        allowed = self._allowed
+        mapping = self.mapping
         for alias in node.names:
             if alias.name == "*":
                 continue
-            bound = alias.asname or alias.name
-            self._bind(bound)
+            bound = alias.asname or (alias.name if from_import else alias.name.split(".")[0])
+            # Unrenamable aliases (builtins, preserved names) never need a site.
+            if not allowed(bound):
+                continue
+            if bound not in mapping:
+                mapping[bound] = self.generator.next_name()
+            alias.asname = mapping[bound]
 
 
 class Renamer(ast.NodeTransformer):
+    # Applies a finished mapping (e.g. the reverse map when deobfuscating) in one walk,
+    # with RenameVisitor's class-body rules.
     def __init__(self, mapping: dict[str, str]) -> None:
         self.mapping = mapping
-        self.class_depth = 0
-        self.function_depth = 0
+        self._lookup = mapping.get
+        self.dispatch = {
+            ast.Name: self._rename_name,
+            ast.FunctionDef: self._rename_function,
+            ast.AsyncFunctionDef: self._rename_function,
+            ast.ClassDef: self._rename_class,
+            ast.arg: self._rename_arg,
+            ast.Global: self._rename_scope_names,
+            ast.Nonlocal: self._rename_scope_names,
+            ast.ExceptHandler: self._rename_handler,
+            ast.Import: self._rename_import,
+            ast.ImportFrom: self._rename_import,
+        }
 
     def _maybe(self, name: str) -> str:
-        return self.mapping.get(name, name)
+        return self._lookup(name, name)
 
-    def visit_FunctionDef(self, node: ast.FunctionDef) -> ast.AST:
-        if self.class_depth == 0 or self.function_depth > 0:
-            node.name = self._maybe(node.name)
-        self.function_depth += 1
-        self.generic_visit(node)
-        self.function_depth -= 1
+    def visit(self, node: ast.AST) -> ast.AST:
+        if not self.mapping:
+            return node
+        _walk_scoped(node, self.dispatch)
         return node
 
-    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> ast.AST:
-        if self.class_depth == 0 or self.function_depth > 0:
+    def _rename_name(self, node: ast.Name, class_body: bool, stack: list) -> None:
+        if class_body and type(node.ctx) is not ast.Load:
+            return
+        node.id = self._lookup(node.id, node.id)
+
+    def _rename_function(self, node: ast.FunctionDef, class_body: bool, stack: list) -> None:
+        if not class_body:
             node.name = self._maybe(node.name)
-        self.function_depth += 1
-        self.generic_visit(node)
-        self.function_depth -= 1
-        return node
+        _push_children(node, False, stack)
 
-    def visit_ClassDef(self, node: ast.ClassDef) -> ast.AST:
-        if self.class_depth == 0 or self.function_depth > 0:
+    def _rename_class(self, node: ast.ClassDef, class_body: bool, stack: list) -> None:
+        if not class_body:
             node.name = self._maybe(node.name)
         # Decorators/bases execute in outer scope, not class local scope.
-        node.bases = [self.visit(base) for base in node.bases]
-        node.keywords = [self.visit(kw) for kw in node.keywords]
-        node.decorator_list = [self.visit(dec) for dec in node.decorator_list]
-        self.class_depth += 1
-        node.body = [self.visit(stmt) for stmt in node.body]
-        self.class_depth -= 1
-        return node
-
-    def visit_arg(self, node: ast.arg) -> ast.AST:
+        for field in _CHILD_FIELDS[ast.ClassDef]:
+            value = getattr(node, field, None)
+            if field == "body":
+                stack.extend((stmt, True) for stmt in value)
+            elif type(value) is list:
+                stack.extend((item, class_body) for item in value if type(item) in _RENAME_WALKED)
+            elif type(value) in _RENAME_WALKED:
+                stack.append((value, class_body))
+
+    def _rename_arg(self, node: ast.arg, class_body: bool, stack: list) -> None:
         node.arg = self._maybe(node.arg)
-        self.generic_visit(node)
-        return node
-
-    def visit_Name(self, node: ast.Name) -> ast.AST:
-        if self.class_depth > 0 and self.function_depth == 0 and isinstance(node.ctx, (ast.Store, ast.Del)):
-            return node
-        node.id = self._maybe(node.id)
-        return node
-
-    def visit_Global(self, node: ast.Global) -> ast.AST:
-        node.names = [self._maybe(name) for name in node.names]
-        return node
+        if node.annotation:
+            stack.append((node.annotation, class_body))
 
-    def visit_Nonlocal(self, node: ast.Nonlocal) -> ast.AST:
+    def _rename_scope_names(self, node: ast.Global | ast.Nonlocal, class_body: bool, stack: list) -> None:
         node.names = [self._maybe(name) for name in node.names]
-        return node
 
-    def visit_ExceptHandler(self, node: ast.ExceptHandler) -> ast.AST:
+    def _rename_handler(self, node: ast.ExceptHandler, class_body: bool, stack: list) -> None:
         if isinstance(node.name, str):
             node.name = self._maybe(node.name)
-        self.generic_visit(node)
-        return node
+        _push_children(node, class_body, stack)
 
-    def visit_Import(self, node: ast.Import) -> ast.AST:
-        if self.class_depth > 0 and self.function_depth == 0:
-            return node
+    def _rename_import(self, node: ast.Import | ast.ImportFrom, class_body: bool, stack: list) -> None:
+        if class_body:
+            return
+        mapping = self.mapping
+        from_import = type(node) is ast.ImportFrom
         for alias in node.names:
-            bound = alias.asname or alias.name.split(".")[0]
-            obf = self.mapping.get(bound)
+            bound = alias.asname or (alias.name if from_import else alias.name.split(".")[0])
+            obf = mapping.get(bound)
             if obf:
                 alias.asname = obf
-        return node
 
-    def visit_ImportFrom(self, node: ast.ImportFrom) -> ast.AST:
-        if self.class_depth > 0 and self.function_depth == 0:
-            return node
-        for alias in node.names:
-            if alias.name == "*":
-                continue
-            bound = alias.asname or alias.name
-            obf = self.mapping.get(bound)
-            if obf:
-                alias.asname = obf
-        return node
+
+# Node types the rename walkers need to pop: anything that can hold child nodes, plus
+# the childless kinds they rename. Constants, aliases and the like are never pushed.
+_RENAME_WALKED = frozenset(cls for cls, fields in _CHILD_FIELDS.items() if fields) | {
+    ast.Name,
+    ast.Global,
+    ast.Nonlocal,
+}
+
+
+def _walk_scoped(root: ast.AST, dispatch: dict[type, Callable[[ast.AST, bool, list], None]]) -> None:
+    # Iterative walk for the rename passes; each stack entry carries whether it sits
+    # directly in a class body (a function body resets it, a class body sets it, so a
+    # class nested in a function is treated like any other). Handlers push the
+    # children they want visited.
+    walked = _RENAME_WALKED
+    child_fields = _CHILD_FIELDS
+    stack: list[tuple[ast.AST, bool]] = [(root, False)]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        current, class_body = pop()
+        handler = dispatch.get(type(current))
+        if handler is not None:
+            handler(current, class_body, stack)
+            continue
+        for field in child_fields.get(type(current), ()):
+            value = getattr(current, field, None)
+            if type(value) is list:
+                for item in value:
+                    if type(item) in walked:
+                        push((item, class_body))
+            elif type(value) in walked:
+                push((value, class_body))
+
+
+def _push_children(node: ast.AST, state: object, stack: list) -> None:
+    walked = _RENAME_WALKED
+    push = stack.append
+    for field in _CHILD_FIELDS.get(type(node), ()):
+        value = getattr(node, field, None)
+        if type(value) is list:
+            for item in value:
+                if type(item) in walked:
+                    push((item, state))
+        elif type(value) in walked:
+            push((value, state))
+
+
+_XOR_TABLES: dict[int, bytes] = {}
+
+
+def _xor_table(mask: int) -> bytes:
+    table = _XOR_TABLES.get(mask)
+    if table is None:
+        table = _XOR_TABLES[mask] = bytes(idx ^ mask for idx in range(256))
+    return table
+
+
+def _xor_bytes(data: bytes, mask: int) -> bytes:
+    return data.translate(_xor_table(mask))
 
 
 class StringObfuscator(ast.NodeTransformer):
+    kind = str
+
     def __init__(
         self,
         helper_specs: list[tuple[str, dict[str, int]]],
@@ -467,6 +737,8 @@ class StringObfuscator(ast.NodeTransformer):
         chunk_max: int,
         mode: str,
         value_salt: int = 0,
+        dedup: bool = False,
+        names: NameGenerator | None = None,
     ) -> None:
         self.helper_specs = helper_specs
         self.rng = rng
@@ -475,57 +747,148 @@ class StringObfuscator(ast.NodeTransformer):
         self.chunk_max = max(self.chunk_min, chunk_max)
         self.mode = mode
         self.value_salt = value_salt & 0xFF
+        self.dedup = dedup
+        self.names = names
+        self._cache: dict[str, ast.AST] = {}
+        self._hoisted: dict[str, str] = {}
+        # Module-level assignments for hoisted literals; the caller places them ahead of
+        # the code (and after the string helpers they call).
+        self.prelude: list[ast.stmt] = []
+        # Mode-tag Constants, shared across call sites like _name_load's Names: later
+        # passes replace them per site and never edit them.
+        self._tags: dict[int, ast.Constant] = {}
+        self._b85: dict[str, str] = {}
+        self._rand_buf = b""
+        self._rand_idx = 0
         self.changed = 0
 
+    def _rand_byte(self) -> int:
+        idx = self._rand_idx
+        if idx >= len(self._rand_buf):
+            self._rand_buf = self.rng.randbytes(1024)
+            idx = 0
+        self._rand_idx = idx + 1
+        return self._rand_buf[idx]
+
+    def _rand_small(self, lo: int, hi: int) -> int:
+        # randint() for spans up to 256, drawn from a pre-generated byte buffer
+        # (rejection sampling keeps it unbiased).
+        span = hi - lo + 1
+        if span > 256:
+            return self.rng.randint(lo, hi)
+        limit = 256 - 256 % span
+        while True:
+            value = self._rand_byte()
+            if value < limit:
+                return lo + value % span
+
+    def prepare(self, values: list[str]) -> None:
+        # One b85encode for every literal when all of them use it (the encoder has a
+        # fixed cost per call). 4-byte groups encode independently, so each literal's
+        # text is a slice of the whole, its last partial group trimmed as b85encode does.
+        if self.mode != "b85":
+            return
+        unique = [value for value in dict.fromkeys(values) if value]
+        raws = [value.encode("utf-8", "surrogatepass") for value in unique]
+        encoded = base64.b85encode(b"".join(raw + bytes(-len(raw) % 4) for raw in raws)).decode("ascii")
+        pos = 0
+        for value, raw in zip(unique, raws):
+            size = (len(raw) + 3) // 4 * 5
+            self._b85[value] = encoded[pos : pos + size - (-len(raw) % 4)]
+            pos += size
+
+    def _tag(self, value: int) -> ast.Constant:
+        node = self._tags.get(value)
+        if node is None:
+            node = self._tags[value] = ast.Constant(value)
+        return node
+
     def _pick_helper(self) -> tuple[str, dict[str, int]]:
         if self.helper_specs:
             return self.rng.choice(self.helper_specs)
         return ("_obf_str", {"xor": 0, "b85": 1, "reverse": 2})
 
-    def _encode_chunks(self, value: str) -> list[tuple[int, list[int]]]:
-        chunks: list[tuple[int, list[int]]] = []
+    def _encode_chunks(self, value: str) -> list[tuple[int, str]]:
+        # Chunks split on characters, so each chunk decodes on its own; lone surrogates
+        # (legal in str literals) pass through as in the helper decoder.
+        # Hex text rather than a bytes literal: unparse cannot emit backslash
+        # escapes inside f-string expressions (pre-3.12).
+        # ASCII text is encoded once and sliced, since byte and character offsets agree.
+        # Long literals make this the hot loop of the string pass, so the buffered
+        # draws of _rand_small/_rand_byte are inlined and the xor tables read directly.
+        chunks: list[tuple[int, str]] = []
+        data = value.encode("utf-8", "surrogatepass")
+        ascii_only = len(data) == len(value)
+        salt = self.value_salt
+        tables = _XOR_TABLES
+        chunk_min = self.chunk_min
+        chunk_max = self.chunk_max
+        buf = self._rand_buf
+        pos = self._rand_idx
+        size = len(value)
         idx = 0
-        while idx < len(value):
-            hi = min(self.chunk_max, len(value) - idx)
-            lo = min(self.chunk_min, hi)
-            step = self.rng.randint(lo, hi)
-            part = value[idx : idx + step]
-            key = self.rng.randint(1, 255)
-            chunks.append((key, [ord(ch) ^ key ^ self.value_salt for ch in part]))
+        while idx < size:
+            hi = min(chunk_max, size - idx)
+            lo = min(chunk_min, hi)
+            span = hi - lo + 1
+            if span > 256:
+                self._rand_buf, self._rand_idx = buf, pos
+                step = self._rand_small(lo, hi)
+                buf, pos = self._rand_buf, self._rand_idx
+            else:
+                limit = 256 - 256 % span
+                while True:
+                    if pos >= len(buf):
+                        buf = self.rng.randbytes(1024)
+                        pos = 0
+                    draw = buf[pos]
+                    pos += 1
+                    if draw < limit:
+                        break
+                step = lo + draw % span
+            part = data[idx : idx + step] if ascii_only else value[idx : idx + step].encode("utf-8", "surrogatepass")
+            # Key in 1..255: the byte draw rejects 255 and is shifted up by one.
+            while True:
+                if pos >= len(buf):
+                    buf = self.rng.randbytes(1024)
+                    pos = 0
+                key = buf[pos]
+                pos += 1
+                if key < 255:
+                    break
+            key += 1
+            mask = key ^ salt
+            table = tables.get(mask) or _xor_table(mask)
+            chunks.append((key, part.translate(table).hex()))
             idx += step
+        self._rand_buf = buf
+        self._rand_idx = pos
         return chunks
 
     def _xor_expr(self, value: str, helper_name: str, mode_tags: dict[str, int]) -> ast.AST:
-        chunks = self._encode_chunks(value)
+        # One flat (key, hex, key, hex, ...) tuple rather than a pair tuple per chunk.
         encoded_nodes: list[ast.expr] = []
-        for key, values in chunks:
-            encoded_nodes.append(
-                ast.Tuple(
-                    elts=[
-                        ast.Constant(key),
-                        ast.Tuple(elts=[ast.Constant(v) for v in values], ctx=ast.Load()),
-                    ],
-                    ctx=ast.Load(),
-                )
-            )
+        for key, data in self._encode_chunks(value):
+            encoded_nodes.append(ast.Constant(key))
+            encoded_nodes.append(ast.Constant(data))
         return ast.Call(
-            func=ast.Name(id=helper_name, ctx=ast.Load()),
-            args=[ast.Constant(mode_tags["xor"]), ast.Tuple(elts=encoded_nodes, ctx=ast.Load())],
+            func=_name_load(helper_name),
+            args=[self._tag(mode_tags["xor"]), ast.Tuple(elts=encoded_nodes, ctx=_LOAD)],
             keywords=[],
         )
 
     def _b85_expr(self, value: str, helper_name: str, mode_tags: dict[str, int]) -> ast.AST:
-        payload = base64.b85encode(value.encode("utf-8")).decode("ascii")
+        payload = self._b85.get(value) or base64.b85encode(value.encode("utf-8", "surrogatepass")).decode("ascii")
         return ast.Call(
-            func=ast.Name(id=helper_name, ctx=ast.Load()),
-            args=[ast.Constant(mode_tags["b85"]), ast.Constant(payload)],
+            func=_name_load(helper_name),
+            args=[self._tag(mode_tags["b85"]), ast.Constant(payload)],
             keywords=[],
         )
 
     def _reverse_expr(self, value: str, helper_name: str, mode_tags: dict[str, int]) -> ast.AST:
         return ast.Call(
-            func=ast.Name(id=helper_name, ctx=ast.Load()),
-            args=[ast.Constant(mode_tags["reverse"]), ast.Constant(value[::-1])],
+            func=_name_load(helper_name),
+            args=[self._tag(mode_tags["reverse"]), ast.Constant(value[::-1])],
             keywords=[],
         )
 
@@ -546,7 +909,7 @@ class StringObfuscator(ast.NodeTransformer):
         while remaining > 0:
             max_step = min(self.chunk_max, remaining)
             min_step = min(self.chunk_min, max_step)
-            step = self.rng.randint(min_step, max_step)
+            step = self._rand_small(min_step, max_step)
             parts.append(value[idx : idx + step])
             idx += step
             remaining -= step
@@ -564,13 +927,13 @@ class StringObfuscator(ast.NodeTransformer):
         restore_order = [order.index(idx) for idx in range(len(order))]
 
         lookup_style = self.rng.choice(("map", "gen"))
-        pieces_value = ast.Tuple(elts=shuffled_exprs, ctx=ast.Load())
-        order_expr = ast.Tuple(elts=[ast.Constant(idx) for idx in restore_order], ctx=ast.Load())
+        pieces_value = ast.Tuple(elts=shuffled_exprs, ctx=_LOAD)
+        order_expr = ast.Tuple(elts=[ast.Constant(idx) for idx in restore_order], ctx=_LOAD)
         if lookup_style == "map":
             values_expr: ast.expr = ast.Call(
-                func=ast.Name(id="map", ctx=ast.Load()),
+                func=_name_load("map"),
                 args=[
-                    ast.Attribute(value=pieces_value, attr="__getitem__", ctx=ast.Load()),
+                    ast.Attribute(value=pieces_value, attr="__getitem__", ctx=_LOAD),
                     order_expr,
                 ],
                 keywords=[],
@@ -580,12 +943,12 @@ class StringObfuscator(ast.NodeTransformer):
             values_expr = ast.GeneratorExp(
                 elt=ast.Subscript(
                     value=pieces_value,
-                    slice=ast.Name(id=index_name, ctx=ast.Load()),
-                    ctx=ast.Load(),
+                    slice=_name_load(index_name),
+                    ctx=_LOAD,
                 ),
                 generators=[
                     ast.comprehension(
-                        target=ast.Name(id=index_name, ctx=ast.Store()),
+                        target=ast.Name(id=index_name, ctx=_STORE),
                         iter=order_expr,
                         ifs=[],
                         is_async=0,
@@ -593,12 +956,30 @@ class StringObfuscator(ast.NodeTransformer):
                 ],
             )
         return ast.Call(
-            func=ast.Attribute(value=ast.Constant(""), attr="join", ctx=ast.Load()),
+            func=ast.Attribute(value=ast.Constant(""), attr="join", ctx=_LOAD),
             args=[values_expr],
             keywords=[],
         )
 
     def _obf_expr(self, value: str) -> ast.AST:
+        if self.dedup and len(value) < STRING_DEDUP_MAX_LEN:
+            cached = self._cache.get(value)
+            if cached is not None:
+                self.changed += 1
+                if self.names is None or len(value) < STRING_HOIST_MIN_LEN:
+                    return _clone(cached)
+                hoisted = self._hoisted.get(value)
+                if hoisted is None:
+                    hoisted = self._hoisted[value] = self.names.next_name()
+                    self.prelude.append(
+                        ast.Assign(targets=[ast.Name(id=hoisted, ctx=_STORE)], value=_clone(cached))
+                    )
+                return ast.Name(id=hoisted, ctx=_LOAD)
+            expr = self._cache[value] = self._encode_expr(value)
+            return expr
+        return self._encode_expr(value)
+
+    def _encode_expr(self, value: str) -> ast.AST:
         mode = self.mode
         if mode == "mixed":
             mode = self.rng.choice(("xor", "b85", "reverse", "split"))
@@ -609,28 +990,37 @@ class StringObfuscator(ast.NodeTransformer):
 
     def transform(self, tree: ast.AST, mt_workers: int = 1, seed_base: int = 0) -> ast.AST:
         if mt_workers <= 1:
-            return self.visit(tree)
+            return ConstantObfuscator([self], self.keep_docstrings).visit(tree)
 
         collector = StringLiteralCollector(self.keep_docstrings)
         collector.visit(tree)
         if not collector.targets:
             return tree
 
-        jobs = [
-            (
-                idx,
-                node.value,
-                id(node),
-                self.helper_specs,
-                self.keep_docstrings,
-                self.chunk_min,
-                self.chunk_max,
-                self.mode,
-                self.value_salt,
-                seed_base,
+        jobs = []
+        first_seen: dict[str, int] = {}
+        duplicates: list[tuple[int, int]] = []
+        for idx, node in enumerate(collector.targets):
+            if self.dedup and len(node.value) < STRING_DEDUP_MAX_LEN:
+                first_id = first_seen.get(node.value)
+                if first_id is not None:
+                    duplicates.append((id(node), first_id))
+                    continue
+                first_seen[node.value] = id(node)
+            jobs.append(
+                (
+                    idx,
+                    node.value,
+                    id(node),
+                    self.helper_specs,
+                    self.keep_docstrings,
+                    self.chunk_min,
+                    self.chunk_max,
+                    self.mode,
+                    self.value_salt,
+                    seed_base,
+                )
             )
-            for idx, node in enumerate(collector.targets)
-        ]
         replacements: dict[int, ast.AST]
         if len(jobs) < 48:
             replacements = dict(_string_obf_worker(item) for item in jobs)
@@ -638,148 +1028,85 @@ class StringObfuscator(ast.NodeTransformer):
             workers = max(1, min(mt_workers, len(jobs) // 32 or 1))
             with ThreadPoolExecutor(max_workers=workers) as pool:
                 replacements = dict(pool.map(_string_obf_worker, jobs))
+        for node_id, first_id in duplicates:
+            replacements[node_id] = replacements[first_id]
         self.changed += len(replacements)
         return StringReplacementApplier(replacements).visit(tree)
 
-    def _visit_body(self, body: list[ast.stmt]) -> list[ast.stmt]:
-        out: list[ast.stmt] = []
-        for idx, stmt in enumerate(body):
-            if (
-                idx == 0
-                and self.keep_docstrings
-                and isinstance(stmt, ast.Expr)
-                and isinstance(stmt.value, ast.Constant)
-                and isinstance(stmt.value.value, str)
-            ):
-                out.append(stmt)
-                continue
-            out.append(self.visit(stmt))
-        return out
-
-    def visit_Module(self, node: ast.Module) -> ast.AST:
-        if (
-            node.body
-            and isinstance(node.body[0], ast.Expr)
-            and isinstance(node.body[0].value, ast.Constant)
-            and isinstance(node.body[0].value.value, str)
-            and any(
-                isinstance(stmt, ast.ImportFrom) and stmt.level == 0 and stmt.module == "__future__"
-                for stmt in node.body[1:]
-            )
-        ):
-            # Preserve real module docstring when __future__ imports exist.
-            node.body = [node.body[0]] + [self.visit(stmt) for stmt in node.body[1:]]
-            return node
-        node.body = self._visit_body(node.body)
-        return node
-
-    def visit_FunctionDef(self, node: ast.FunctionDef) -> ast.AST:
-        node.decorator_list = [self.visit(dec) for dec in node.decorator_list]
-        if node.returns:
-            node.returns = self.visit(node.returns)
-        node.body = self._visit_body(node.body)
-        return node
-
-    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> ast.AST:
-        node.decorator_list = [self.visit(dec) for dec in node.decorator_list]
-        if node.returns:
-            node.returns = self.visit(node.returns)
-        node.body = self._visit_body(node.body)
-        return node
-
-    def visit_ClassDef(self, node: ast.ClassDef) -> ast.AST:
-        node.bases = [self.visit(base) for base in node.bases]
-        node.keywords = [self.visit(kw) for kw in node.keywords]
-        node.decorator_list = [self.visit(dec) for dec in node.decorator_list]
-        node.body = self._visit_body(node.body)
-        return node
-
     def visit_Constant(self, node: ast.Constant) -> ast.AST:
-        if isinstance(node.value, str) and node.value:
-            return ast.copy_location(self._obf_expr(node.value), node)
-        return node
-
-    def visit_JoinedStr(self, node: ast.JoinedStr) -> ast.AST:
-        # f-strings require literal text chunks inside JoinedStr.
-        node.values = [
-            self.visit(part) if isinstance(part, ast.FormattedValue) else part
-            for part in node.values
-        ]
+        if type(node.value) is str and node.value:
+            return _cl(self._obf_expr(node.value), node)
         return node
 
 
 class StringLiteralCollector(ast.NodeVisitor):
+    # Same sites as the fused string stage, gathered in one pre-order loop instead of
+    # per-field visit calls; the order matches the recursive walk, as the worker jobs
+    # are seeded by position.
     def __init__(self, keep_docstrings: bool) -> None:
         self.keep_docstrings = keep_docstrings
         self.targets: list[ast.Constant] = []
 
-    def _visit_body(self, body: list[ast.stmt], force_keep_docstring: bool = False) -> None:
-        for idx, stmt in enumerate(body):
-            if (
-                idx == 0
-                and (self.keep_docstrings or force_keep_docstring)
-                and isinstance(stmt, ast.Expr)
-                and isinstance(stmt.value, ast.Constant)
-                and isinstance(stmt.value.value, str)
-            ):
-                continue
-            self.visit(stmt)
-
-    def visit_Module(self, node: ast.Module) -> None:
-        force_keep_docstring = (
-            bool(node.body)
-            and isinstance(node.body[0], ast.Expr)
-            and isinstance(node.body[0].value, ast.Constant)
-            and isinstance(node.body[0].value.value, str)
-            and any(
-                isinstance(stmt, ast.ImportFrom) and stmt.level == 0 and stmt.module == "__future__"
-                for stmt in node.body[1:]
-            )
-        )
-        self._visit_body(node.body, force_keep_docstring)
-
-    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
-        for dec in node.decorator_list:
-            self.visit(dec)
-        if node.returns:
-            self.visit(node.returns)
-        self._visit_body(node.body)
-
-    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> None:
-        self.visit_FunctionDef(node)
-
-    def visit_ClassDef(self, node: ast.ClassDef) -> None:
-        for base in node.bases:
-            self.visit(base)
-        for kw in node.keywords:
-            self.visit(kw)
-        for dec in node.decorator_list:
-            self.visit(dec)
-        self._visit_body(node.body)
-
-    def visit_JoinedStr(self, node: ast.JoinedStr) -> None:
-        for part in node.values:
-            if isinstance(part, ast.FormattedValue):
-                self.visit(part)
-
-    def visit_Constant(self, node: ast.Constant) -> None:
-        if isinstance(node.value, str) and node.value:
-            self.targets.append(node)
-
+    def _body_start(self, node: ast.AST, body: list[ast.stmt]) -> int:
+        if _is_docstring_stmt(body[0]) and (
+            self.keep_docstrings or (isinstance(node, ast.Module) and _has_future_import(node))
+        ):
+            return 1
+        return 0
 
-class StringReplacementApplier(ast.NodeTransformer):
+    def visit(self, node: ast.AST) -> None:
+        constant = ast.Constant
+        joined = ast.JoinedStr
+        formatted = ast.FormattedValue
+        skip = _NO_CONSTANT_BELOW
+        fields_for = _STRING_STAGE_FIELDS
+        targets = self.targets
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            kind = type(node)
+            if kind is constant:
+                if type(node.value) is str and node.value:
+                    targets.append(node)
+                continue
+            children: list[ast.AST] = []
+            if kind is joined:
+                # Literal text parts stay put; only the interpolated expressions are walked.
+                children.extend(part for part in node.values if type(part) is formatted)
+            else:
+                for field in fields_for.get(kind) or _CHILD_FIELDS.get(kind, node._fields):
+                    value = getattr(node, field, None)
+                    if type(value) is list:
+                        start = 0
+                        if value and field == "body" and kind in _DOCSTRING_OWNERS:
+                            start = self._body_start(node, value)
+                        for idx in range(start, len(value)):
+                            item = value[idx]
+                            if isinstance(item, ast.AST) and type(item) not in skip:
+                                children.append(item)
+                    elif isinstance(value, ast.AST) and type(value) not in skip:
+                        children.append(value)
+            children.reverse()
+            stack.extend(children)
+
+
+class StringReplacementApplier(DispatchTransformer):
     def __init__(self, replacements: dict[int, ast.AST]) -> None:
         self.replacements = replacements
 
     def visit_JoinedStr(self, node: ast.JoinedStr) -> ast.AST:
-        node.values = [self.visit(part) if isinstance(part, ast.FormattedValue) else part for part in node.values]
+        values = node.values
+        formatted = ast.FormattedValue
+        for idx, part in enumerate(values):
+            if type(part) is formatted:
+                values[idx] = self.visit(part)
         return node
 
     def visit_Constant(self, node: ast.Constant) -> ast.AST:
         repl = self.replacements.get(id(node))
         if repl is None:
             return node
-        return ast.copy_location(copy.deepcopy(repl), node)
+        return _cl(_clone(repl), node)
 
 
 def _string_obf_worker(
@@ -810,7 +1137,161 @@ def _string_obf_worker(
     return node_id, obf._obf_expr(value)
 
 
+@functools.lru_cache(maxsize=256)
+def _name_load(name: str) -> ast.Name:
+    # Shared per name and process-wide: later passes only replace Name nodes, never
+    # edit them, but the rename pass rewrites .id in place. So only code built after
+    # renaming may use these; junk functions (built before it) must not, and nodes that
+    # get a location copied onto them (_cl) must be built directly as well.
+    return ast.Name(id=name, ctx=_LOAD)
+
+
+def _cl(new: ast.AST, old: ast.AST) -> ast.AST:
+    # ast.copy_location without the _attributes introspection; falls back for unplaced nodes.
+    try:
+        new.lineno = old.lineno
+    except AttributeError:
+        return ast.copy_location(new, old)
+    new.col_offset = old.col_offset
+    new.end_lineno = old.end_lineno
+    new.end_col_offset = old.end_col_offset
+    return new
+
+
+def _clone(node: ast.AST) -> ast.AST:
+    # copy.deepcopy for AST subtrees without the memo and __reduce_ex__ round trip per
+    # node; field-less contexts and operators are shared singletons and stay shared.
+    kind = type(node)
+    if not kind._fields:
+        return node
+    new = kind.__new__(kind)
+    attrs = new.__dict__
+    for key, value in node.__dict__.items():
+        if type(value) is list:
+            value = [_clone(item) if isinstance(item, ast.AST) else item for item in value]
+        elif isinstance(value, ast.AST):
+            value = _clone(value)
+        attrs[key] = value
+    return new
+
+
+def _iter_nodes(tree: ast.AST) -> Iterator[ast.AST]:
+    # Depth-first stand-in for ast.walk() where visit order does not matter: one explicit
+    # stack instead of the iter_child_nodes/iter_fields generator chain per node, and
+    # field-less nodes (expression contexts, operators) are never yielded.
+    stack = [tree]
+    pop = stack.pop
+    push = stack.append
+    node_type = ast.AST
+    child_fields = _CHILD_FIELDS
+    while stack:
+        node = pop()
+        yield node
+        for field in child_fields.get(type(node), node._fields):
+            value = getattr(node, field, None)
+            if type(value) is list:
+                for item in value:
+                    if isinstance(item, node_type) and item._fields:
+                        push(item)
+            elif isinstance(value, node_type) and value._fields:
+                push(value)
+
+
+def _strip_positions(tree: ast.AST) -> ast.AST:
+    # Templates are only ever copied through _patch; drop positions up front.
+    for node in _iter_nodes(tree):
+        for attr in ("lineno", "col_offset", "end_lineno", "end_col_offset"):
+            if hasattr(node, attr):
+                delattr(node, attr)
+    return tree
+
+
+def _expr_template(source: str) -> ast.expr:
+    return _strip_positions(ast.parse(source, mode="eval").body)
+
+
+def _stmt_template(source: str) -> ast.stmt:
+    return _strip_positions(ast.parse(source).body[0])
+
+
+def _patch_name(subs: dict[str, ast.AST | str | int], name: str, ctx: ast.expr_context) -> ast.AST:
+    sub = subs.get(name)
+    if sub is None:
+        # Fixed loads (getattr, __import__, lambda parameters) are shared like any
+        # other generated load (see _name_load: templates patched before the rename
+        # pass must pass their names as str subs); the root is never a bare Name.
+        if type(ctx) is ast.Load:
+            return _name_load(name)
+        return ast.Name(id=name, ctx=ctx)
+    if type(sub) is str:
+        return ast.Name(id=sub, ctx=ctx)
+    if type(sub) is int:
+        return ast.Constant(sub)
+    return sub
+
+
+def _patch_arg(subs: dict[str, ast.AST | str | int], name: str) -> ast.arg:
+    # Lambda parameters: a str sub renames them along with their Name uses.
+    sub = subs.get(name)
+    return ast.arg(arg=sub if type(sub) is str else name, annotation=None)
+
+
+def _compile_patcher(template: ast.AST) -> Callable[[dict[str, ast.AST | str | int]], ast.AST]:
+    # Turns a template into one Python function that rebuilds it with nested constructor
+    # calls, so _patch pays no per-node dispatch, field lookups or recursion.
+    refs: dict[str, object] = {"_n": _patch_name, "_a": _patch_arg}
+
+    def ref(value: object) -> str:
+        if value is None or type(value) in (str, int, bool):
+            return repr(value)
+        key = f"_r{len(refs)}"
+        refs[key] = value
+        return key
+
+    def emit(node: ast.AST) -> str:
+        kind = type(node)
+        if kind is ast.Name:
+            return f"_n(S, {node.id!r}, {ref(node.ctx)})"
+        if kind is ast.arg:
+            return f"_a(S, {node.arg!r})"
+        if kind in _NO_CONSTANT_BELOW:
+            return ref(node)
+        parts: list[str] = []
+        for field in kind._fields:
+            value = getattr(node, field, None)
+            if type(value) is list:
+                items = ", ".join(emit(item) if isinstance(item, ast.AST) else ref(item) for item in value)
+                parts.append(f"[{items}]")
+            elif isinstance(value, ast.AST):
+                parts.append(emit(value))
+            else:
+                parts.append(ref(value))
+        return f"{ref(kind)}({', '.join(parts)})"
+
+    exec(f"def patch(S):\n    return {emit(template)}\n", refs)
+    return refs["patch"]
+
+
+_PATCHERS: dict[ast.AST, Callable[[dict[str, ast.AST | str | int]], ast.AST]] = {}
+
+
+def _patch(template: ast.AST, subs: dict[str, ast.AST | str | int]) -> ast.AST:
+    # Fresh copy of a parsed template; Name placeholders found in subs are swapped in.
+    # A str sub renames the placeholder and an int sub becomes a fresh Constant, so
+    # either may be used at several sites; node subs are inserted as-is. Each template
+    # is compiled to a builder function on first use (templates live for the run).
+    patcher = _PATCHERS.get(template)
+    if patcher is None:
+        patcher = _PATCHERS[template] = _compile_patcher(template)
+    return patcher(subs)
+
+
 class IntObfuscator(ast.NodeTransformer):
+    kind = int
+    XOR_TEMPLATE = _expr_template("A ^ B")
+    ARITH_TEMPLATE = _expr_template("A - B")
+    SPLIT_TEMPLATE = _expr_template("A + B")
+
     def __init__(self, rng: random.Random, mode: str, value_salt: int = 0) -> None:
         self.rng = rng
         self.mode = mode
@@ -818,7 +1299,8 @@ class IntObfuscator(ast.NodeTransformer):
         self.changed = 0
 
     def visit_Constant(self, node: ast.Constant) -> ast.AST:
-        if isinstance(node.value, bool) or not isinstance(node.value, int):
+        # Exact type, as ConstantObfuscator dispatches on it; bool never reaches here.
+        if type(node.value) is not int:
             return node
 
         value = node.value
@@ -826,47 +1308,51 @@ class IntObfuscator(ast.NodeTransformer):
         if mode == "mixed":
             mode = self.rng.choice(("xor", "arith", "split"))
 
+        # getrandbits() over power-of-two spans: one C call where randint() goes through
+        # randrange/_randbelow; the keys only need to be nonzero and varied.
         if mode == "xor":
-            key = self.rng.randint(1, 2**15)
-            expr: ast.expr = ast.BinOp(
-                left=ast.Constant(value ^ key ^ self.value_salt),
-                op=ast.BitXor(),
-                right=ast.Constant(key ^ self.value_salt),
+            key = self.rng.getrandbits(15) + 1
+            expr: ast.expr = _patch(
+                self.XOR_TEMPLATE,
+                {"A": ast.Constant(value ^ key ^ self.value_salt), "B": ast.Constant(key ^ self.value_salt)},
             )
         elif mode == "arith":
-            key = self.rng.randint(1, 1000)
-            expr = ast.BinOp(
-                left=ast.BinOp(
-                    left=ast.Constant(value + key),
-                    op=ast.Sub(),
-                    right=ast.Constant(key),
-                ),
-                op=ast.Add(),
-                right=ast.Constant(0),
-            )
+            key = self.rng.getrandbits(10) + 1
+            expr = _patch(self.ARITH_TEMPLATE, {"A": ast.Constant(value + key), "B": ast.Constant(key)})
         else:
-            pivot = self.rng.randint(-5000, 5000)
-            expr = ast.BinOp(
-                left=ast.Constant(pivot),
-                op=ast.Add(),
-                right=ast.Constant(value - pivot),
-            )
+            pivot = self.rng.getrandbits(14) - 8192
+            expr = _patch(self.SPLIT_TEMPLATE, {"A": ast.Constant(pivot), "B": ast.Constant(value - pivot)})
 
         self.changed += 1
-        return ast.copy_location(expr, node)
+        return _cl(expr, node)
 
 
 class FloatObfuscator(ast.NodeTransformer):
+    kind = float
+    STRUCT_TEMPLATE = _expr_template("__import__('struct').unpack('!d', bytes.fromhex(HEX))[0]")
+    HEX_TEMPLATE = _expr_template("float.fromhex(HEX)")
+
     def __init__(self, rng: random.Random, mode: str) -> None:
         self.rng = rng
         self.mode = mode
         self.changed = 0
+        self._packed: dict[float, str] = {}
+
+    def prepare(self, values: list[float]) -> None:
+        # One struct.pack for every float in the tree instead of one per literal.
+        # Repeated values (0.0, 1.0, ...) are packed once.
+        if not values or self.mode == "hex":
+            return
+        unique = list(dict.fromkeys(values))
+        packed = struct.pack(f"!{len(unique)}d", *unique).hex()
+        for idx, value in enumerate(unique):
+            self._packed[value] = packed[idx * 16 : idx * 16 + 16]
 
     def visit_Constant(self, node: ast.Constant) -> ast.AST:
-        if not isinstance(node.value, float):
+        if type(node.value) is not float:
             return node
         value = node.value
-        if value != value or value in (float("inf"), float("-inf")):
+        if not math.isfinite(value):
             return node
 
         mode = self.mode
@@ -874,45 +1360,22 @@ class FloatObfuscator(ast.NodeTransformer):
             mode = self.rng.choice(("hex", "struct"))
 
         if mode == "struct":
-            hex_bytes = struct.pack("!d", value).hex()
-            mod = ast.Call(
-                func=ast.Name(id="__import__", ctx=ast.Load()),
-                args=[ast.Constant("struct")],
-                keywords=[],
-            )
-            unpack = ast.Call(
-                func=ast.Attribute(value=mod, attr="unpack", ctx=ast.Load()),
-                args=[
-                    ast.Constant("!d"),
-                    ast.Call(
-                        func=ast.Attribute(value=ast.Name(id="bytes", ctx=ast.Load()), attr="fromhex", ctx=ast.Load()),
-                        args=[ast.Constant(hex_bytes)],
-                        keywords=[],
-                    ),
-                ],
-                keywords=[],
-            )
-            expr: ast.expr = ast.Subscript(
-                value=unpack,
-                slice=ast.Constant(0),
-                ctx=ast.Load(),
-            )
+            hex_bytes = self._packed.get(value) or struct.pack("!d", value).hex()
+            expr: ast.expr = _patch(self.STRUCT_TEMPLATE, {"HEX": ast.Constant(hex_bytes)})
         else:
-            expr = ast.Call(
-                func=ast.Attribute(
-                    value=ast.Name(id="float", ctx=ast.Load()),
-                    attr="fromhex",
-                    ctx=ast.Load(),
-                ),
-                args=[ast.Constant(value.hex())],
-                keywords=[],
-            )
+            expr = _patch(self.HEX_TEMPLATE, {"HEX": ast.Constant(value.hex())})
 
         self.changed += 1
-        return ast.copy_location(expr, node)
+        return _cl(expr, node)
 
 
 class BytesObfuscator(ast.NodeTransformer):
+    kind = bytes
+    XOR_TEMPLATE = _expr_template("(int(HEX, 16) ^ MASK).to_bytes(SIZE, 'big')")
+    # One hex Constant instead of a Constant per byte; it holds the data minus a random
+    # offset, so the plain bytes never appear (byte literals are not revisited later).
+    LIST_TEMPLATE = _expr_template("(int(HEX, 16) + OFFSET).to_bytes(SIZE, 'big')")
+
     def __init__(self, rng: random.Random, mode: str, value_salt: int = 0) -> None:
         self.rng = rng
         self.mode = mode
@@ -921,29 +1384,28 @@ class BytesObfuscator(ast.NodeTransformer):
 
     def _leaf_expr(self, data: bytes, mode: str) -> ast.expr:
         if mode == "list":
-            values = [ast.Constant(v) for v in data]
-            expr: ast.expr = ast.Call(
-                func=ast.Name(id="bytes", ctx=ast.Load()),
-                args=[ast.Tuple(elts=values, ctx=ast.Load())],
-                keywords=[],
+            size = len(data)
+            value = int.from_bytes(data, "big")
+            offset = self.rng.randrange(value + 1)
+            expr: ast.expr = _patch(
+                self.LIST_TEMPLATE,
+                {
+                    "HEX": ast.Constant((value - offset).to_bytes(size, "big").hex() or "0"),
+                    "OFFSET": ast.Constant(offset),
+                    "SIZE": ast.Constant(size),
+                },
             )
         else:
-            key = self.rng.randint(1, 255)
-            encoded = [ast.Constant(v ^ key ^ self.value_salt) for v in data]
-            target = ast.Name(id="_b", ctx=ast.Store())
-            source = ast.Tuple(elts=encoded, ctx=ast.Load())
-            gen = ast.GeneratorExp(
-                elt=ast.BinOp(
-                    left=ast.Name(id="_b", ctx=ast.Load()),
-                    op=ast.BitXor(),
-                    right=ast.Constant(key ^ self.value_salt),
-                ),
-                generators=[ast.comprehension(target=target, iter=source, ifs=[], is_async=0)],
-            )
-            expr = ast.Call(
-                func=ast.Name(id="bytes", ctx=ast.Load()),
-                args=[gen],
-                keywords=[],
+            # One big-int xor instead of a per-byte generator.
+            mask = self.rng.randint(1, 255) ^ self.value_salt
+            size = len(data)
+            expr = _patch(
+                self.XOR_TEMPLATE,
+                {
+                    "HEX": ast.Constant(_xor_bytes(data, mask).hex() or "0"),
+                    "MASK": ast.Constant(int.from_bytes(bytes((mask,)) * size, "big")),
+                    "SIZE": ast.Constant(size),
+                },
             )
         return expr
 
@@ -966,13 +1428,15 @@ class BytesObfuscator(ast.NodeTransformer):
         for piece in pieces:
             leaf_mode = self.rng.choice(("xor", "list"))
             exprs.append(self._leaf_expr(piece, leaf_mode))
-        out: ast.expr = exprs[0]
-        for nxt in exprs[1:]:
-            out = ast.BinOp(left=out, op=ast.Add(), right=nxt)
-        return out
+        # One b"".join over a flat tuple rather than a left-nested chain of `+`.
+        return ast.Call(
+            func=ast.Attribute(value=ast.Constant(b""), attr="join", ctx=_LOAD),
+            args=[ast.Tuple(elts=exprs, ctx=_LOAD)],
+            keywords=[],
+        )
 
     def visit_Constant(self, node: ast.Constant) -> ast.AST:
-        if not isinstance(node.value, bytes):
+        if type(node.value) is not bytes:
             return node
 
         mode = self.mode
@@ -984,10 +1448,12 @@ class BytesObfuscator(ast.NodeTransformer):
             expr = self._leaf_expr(node.value, mode)
 
         self.changed += 1
-        return ast.copy_location(expr, node)
+        return _cl(expr, node)
 
 
 class NoneObfuscator(ast.NodeTransformer):
+    kind = type(None)
+
     def __init__(self, rng: random.Random, mode: str) -> None:
         self.rng = rng
         self.mode = mode
@@ -1002,12 +1468,12 @@ class NoneObfuscator(ast.NodeTransformer):
             mode = self.rng.choice(("lambda", "ifexpr"))
 
         if mode == "ifexpr":
-            a = self.rng.randint(10, 999)
-            b = a + self.rng.randint(1, 20)
+            a = self.rng.getrandbits(10) + 10
+            b = a + self.rng.getrandbits(4) + 1
             expr: ast.expr = ast.IfExp(
                 test=ast.Compare(
                     left=ast.Constant(a),
-                    ops=[ast.Eq()],
+                    ops=[_EQ],
                     comparators=[ast.Constant(b)],
                 ),
                 body=ast.Constant(0),
@@ -1030,17 +1496,19 @@ class NoneObfuscator(ast.NodeTransformer):
             )
 
         self.changed += 1
-        return ast.copy_location(expr, node)
+        return _cl(expr, node)
 
 
 class BoolObfuscator(ast.NodeTransformer):
+    kind = bool
+
     def __init__(self, rng: random.Random, mode: str) -> None:
         self.rng = rng
         self.mode = mode
         self.changed = 0
 
     def visit_Constant(self, node: ast.Constant) -> ast.AST:
-        if not isinstance(node.value, bool):
+        if type(node.value) is not bool:
             return node
 
         mode = self.mode
@@ -1048,33 +1516,159 @@ class BoolObfuscator(ast.NodeTransformer):
             mode = self.rng.choice(("compare", "xor"))
 
         if mode == "xor":
-            left = self.rng.randint(10, 10000)
+            left = self.rng.getrandbits(13) + 10
             right = left ^ (1 if node.value else 0)
             expr: ast.expr = ast.Call(
-                func=ast.Name(id="bool", ctx=ast.Load()),
+                func=_name_load("bool"),
                 args=[
                     ast.BinOp(
                         left=ast.Constant(left),
-                        op=ast.BitXor(),
+                        op=_BITXOR,
                         right=ast.Constant(right),
                     )
                 ],
                 keywords=[],
             )
         else:
-            a = self.rng.randint(10, 9999)
+            a = self.rng.getrandbits(13) + 10
             if node.value:
                 b = a
             else:
-                b = a + self.rng.randint(1, 100)
+                b = a + self.rng.getrandbits(7) + 1
             expr = ast.Compare(
                 left=ast.Constant(a),
-                ops=[ast.Eq()],
+                ops=[_EQ],
                 comparators=[ast.Constant(b)],
             )
 
         self.changed += 1
-        return ast.copy_location(expr, node)
+        return _cl(expr, node)
+
+
+def _is_docstring_stmt(stmt: ast.stmt) -> bool:
+    return isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant) and isinstance(stmt.value.value, str)
+
+
+def _has_future_import(node: ast.Module) -> bool:
+    return any(
+        isinstance(stmt, ast.ImportFrom) and stmt.level == 0 and stmt.module == "__future__"
+        for stmt in node.body[1:]
+    )
+
+
+# Node types that never hold a Constant below them; walkers skip descending into these.
+_NO_CONSTANT_BELOW = frozenset(
+    {
+        ast.Name,
+        *ast.expr_context.__subclasses__(),
+        *ast.operator.__subclasses__(),
+        *ast.unaryop.__subclasses__(),
+        *ast.cmpop.__subclasses__(),
+        *ast.boolop.__subclasses__(),
+    }
+)
+_DOCSTRING_OWNERS = (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+# String stage leaves function signatures alone (annotations/defaults stay literal).
+_STRING_STAGE_FIELDS: dict[type, tuple[str, ...]] = {
+    ast.FunctionDef: ("decorator_list", "returns", "body"),
+    ast.AsyncFunctionDef: ("decorator_list", "returns", "body"),
+    ast.ClassDef: ("bases", "keywords", "decorator_list", "body"),
+}
+
+
+class ConstantObfuscator(ast.NodeTransformer):
+    # One walk for a run of per-kind handlers; a handler's output is still fed
+    # to the handlers after it, same as running them as separate passes.
+    def __init__(self, handlers: list[ast.NodeTransformer], keep_docstrings: bool = True) -> None:
+        self.handlers = handlers
+        self.keep_docstrings = keep_docstrings
+        self.dispatch = {handler.kind: idx for idx, handler in enumerate(handlers)}
+        self.strings = str in self.dispatch
+        self.fields: dict[type, tuple[str, ...]] = _STRING_STAGE_FIELDS if self.strings else {}
+        # Kinds whose handler encodes in bulk: their sites are collected during the
+        # walk and rewritten after one prepare() call.
+        self.batched = frozenset(handler.kind for handler in handlers if hasattr(handler, "prepare"))
+        self._tails: dict[int, ConstantObfuscator] = {}
+
+    def _body_start(self, node: ast.AST, body: list[ast.stmt]) -> int:
+        if (
+            self.strings
+            and _is_docstring_stmt(body[0])
+            and (self.keep_docstrings or (isinstance(node, ast.Module) and _has_future_import(node)))
+        ):
+            # Preserve real module docstring when __future__ imports exist.
+            return 1
+        return 0
+
+    def visit(self, node: ast.AST) -> ast.AST:
+        constant = ast.Constant
+        if type(node) is constant:
+            return self.visit_Constant(node)
+        skip = _NO_CONSTANT_BELOW
+        joined = ast.JoinedStr
+        formatted = ast.FormattedValue
+        fields_for = self.fields
+        batched = self.batched
+        deferred: list[tuple[list | ast.AST, int | str, ast.Constant]] = []
+        root = node
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            kind = type(node)
+            if kind is joined:
+                # f-strings require literal text chunks inside JoinedStr.
+                for part in node.values:
+                    if type(part) is formatted:
+                        stack.append(part)
+                continue
+            for field in fields_for.get(kind) or _CHILD_FIELDS.get(kind, node._fields):
+                value = getattr(node, field, None)
+                if type(value) is list:
+                    start = 0
+                    if value and field == "body" and kind in _DOCSTRING_OWNERS:
+                        start = self._body_start(node, value)
+                    for idx in range(start, len(value)):
+                        item = value[idx]
+                        if type(item) is constant:
+                            if type(item.value) in batched:
+                                deferred.append((value, idx, item))
+                            else:
+                                value[idx] = self.visit_Constant(item)
+                        elif isinstance(item, ast.AST) and type(item) not in skip:
+                            stack.append(item)
+                elif type(value) is constant:
+                    if type(value.value) in batched:
+                        deferred.append((node, field, value))
+                    else:
+                        setattr(node, field, self.visit_Constant(value))
+                elif isinstance(value, ast.AST) and type(value) not in skip:
+                    stack.append(value)
+        if deferred:
+            self._flush(deferred)
+        return root
+
+    def _flush(self, deferred: list[tuple[list | ast.AST, int | str, ast.Constant]]) -> None:
+        for handler in self.handlers:
+            if handler.kind in self.batched:
+                handler.prepare([item.value for _, _, item in deferred if type(item.value) is handler.kind])
+        for container, key, item in deferred:
+            out = self.visit_Constant(item)
+            if type(container) is list:
+                container[key] = out
+            else:
+                setattr(container, key, out)
+
+    def visit_Constant(self, node: ast.Constant) -> ast.AST:
+        idx = self.dispatch.get(type(node.value))
+        if idx is None:
+            return node
+        out = self.handlers[idx].visit_Constant(node)
+        if out is node or idx + 1 == len(self.handlers):
+            return out
+        tail = self._tails.get(idx)
+        if tail is None:
+            tail = self._tails[idx] = ConstantObfuscator(self.handlers[idx + 1 :], self.keep_docstrings)
+        return tail.visit(out)
 
 
 def _split_text_chunks(text: str, rng: random.Random, min_size: int = 1, max_size: int = 4) -> list[str]:
@@ -1092,6 +1686,10 @@ def _split_text_chunks(text: str, rng: random.Random, min_size: int = 1, max_siz
     return pieces
 
 
+_TEXT_HEX_TEMPLATE = _expr_template("bytes.fromhex(HEX).decode('utf-8')")
+_TEXT_BYTES_TEMPLATE = _expr_template("bytes(CODES).decode()")
+
+
 def build_text_expr(text: str, rng: random.Random) -> ast.expr:
     styles = ["join", "concat", "hex", "format"]
     if text and len(text) > 1:
@@ -1101,30 +1699,18 @@ def build_text_expr(text: str, rng: random.Random) -> ast.expr:
     style = rng.choice(styles)
     if style == "join":
         return ast.Call(
-            func=ast.Attribute(value=ast.Constant(""), attr="join", ctx=ast.Load()),
-            args=[ast.Tuple(elts=[ast.Constant(part) for part in _split_text_chunks(text, rng)], ctx=ast.Load())],
+            func=ast.Attribute(value=ast.Constant(""), attr="join", ctx=_LOAD),
+            args=[ast.Tuple(elts=[ast.Constant(part) for part in _split_text_chunks(text, rng)], ctx=_LOAD)],
             keywords=[],
         )
     if style == "concat" and len(text) > 1:
         parts = _split_text_chunks(text, rng)
         expr: ast.expr = ast.Constant(parts[0])
         for part in parts[1:]:
-            expr = ast.BinOp(left=expr, op=ast.Add(), right=ast.Constant(part))
+            expr = ast.BinOp(left=expr, op=_ADD, right=ast.Constant(part))
         return expr
     if style == "hex":
-        return ast.Call(
-            func=ast.Attribute(
-                value=ast.Call(
-                    func=ast.Attribute(value=ast.Name(id="bytes", ctx=ast.Load()), attr="fromhex", ctx=ast.Load()),
-                    args=[ast.Constant(text.encode("utf-8").hex())],
-                    keywords=[],
-                ),
-                attr="decode",
-                ctx=ast.Load(),
-            ),
-            args=[ast.Constant("utf-8")],
-            keywords=[],
-        )
+        return _patch(_TEXT_HEX_TEMPLATE, {"HEX": ast.Constant(text.encode("utf-8").hex())})
     if style == "format" and len(text) > 1:
         parts = _split_text_chunks(text, rng, 1, 3)
         shuffled = list(range(len(parts)))
@@ -1133,115 +1719,119 @@ def build_text_expr(text: str, rng: random.Random) -> ast.expr:
         fmt = "".join(f"{{{pos_map[idx]}}}" for idx in range(len(parts)))
         args = [parts[idx] for idx in shuffled]
         return ast.Call(
-            func=ast.Attribute(value=ast.Constant(fmt), attr="format", ctx=ast.Load()),
+            func=ast.Attribute(value=ast.Constant(fmt), attr="format", ctx=_LOAD),
             args=[ast.Constant(part) for part in args],
             keywords=[],
         )
     if style == "chr_join":
-        codes = [ord(ch) for ch in text]
-        return ast.Call(
-            func=ast.Attribute(value=ast.Constant(""), attr="join", ctx=ast.Load()),
-            args=[
-                ast.GeneratorExp(
-                    elt=ast.Call(
-                        func=ast.Name(id="chr", ctx=ast.Load()),
-                        args=[ast.Name(id="_c", ctx=ast.Load())],
-                        keywords=[],
-                    ),
-                    generators=[
-                        ast.comprehension(
-                            target=ast.Name(id="_c", ctx=ast.Store()),
-                            iter=ast.Tuple(elts=[ast.Constant(code) for code in codes], ctx=ast.Load()),
-                            ifs=[],
-                            is_async=0,
-                        )
-                    ],
-                )
-            ],
-            keywords=[],
-        )
+        # Pre-encoded byte values, always as int Constants: a bytes literal would leave
+        # the name readable, and text built after the passes is never revisited.
+        codes = ast.Tuple(elts=[ast.Constant(b) for b in text.encode("utf-8")], ctx=_LOAD)
+        return _patch(_TEXT_BYTES_TEMPLATE, {"CODES": codes})
     return ast.Constant(text)
 
 
-def decode_obf_text_expr(node: ast.AST) -> str | None:
-    if isinstance(node, ast.Constant) and isinstance(node.value, str):
-        return node.value
-
-    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
-        left = decode_obf_text_expr(node.left)
-        right = decode_obf_text_expr(node.right)
-        if left is not None and right is not None:
-            return left + right
-        return None
+def _decode_text_constant(node: ast.Constant) -> str | None:
+    return node.value if type(node.value) is str else None
 
-    if (
-        isinstance(node, ast.Call)
-        and isinstance(node.func, ast.Attribute)
-        and isinstance(node.func.value, ast.Constant)
-        and isinstance(node.func.value.value, str)
-        and node.func.attr == "join"
-        and len(node.args) == 1
-    ):
-        seq = node.args[0]
-        if isinstance(seq, ast.Tuple):
-            parts: list[str] = []
-            for item in seq.elts:
-                part = decode_obf_text_expr(item)
-                if part is None:
-                    return None
-                parts.append(part)
-            return "".join(parts)
-        if (
-            isinstance(seq, ast.GeneratorExp)
-            and len(seq.generators) == 1
-            and isinstance(seq.elt, ast.Call)
-            and isinstance(seq.elt.func, ast.Name)
-            and seq.elt.func.id == "chr"
-            and len(seq.elt.args) == 1
-            and isinstance(seq.elt.args[0], ast.Name)
-            and isinstance(seq.generators[0].target, ast.Name)
-            and seq.generators[0].target.id == seq.elt.args[0].id
-            and isinstance(seq.generators[0].iter, ast.Tuple)
-        ):
-            chars: list[str] = []
-            for item in seq.generators[0].iter.elts:
-                if not isinstance(item, ast.Constant) or not isinstance(item.value, int):
-                    return None
-                chars.append(chr(item.value))
-            return "".join(chars)
+
+def _decode_text_concat(node: ast.BinOp) -> str | None:
+    if type(node.op) is not ast.Add:
         return None
+    # The whole `+` chain is flattened with an explicit stack and joined once, rather
+    # than one recursive call and one concatenation per operator.
+    pieces: list[str] = []
+    pending: list[ast.AST] = [node]
+    while pending:
+        item = pending.pop()
+        if type(item) is ast.BinOp and type(item.op) is ast.Add:
+            pending.append(item.right)
+            pending.append(item.left)
+            continue
+        piece = decode_obf_text_expr(item)
+        if piece is None:
+            return None
+        pieces.append(piece)
+    return "".join(pieces)
+
 
+def _decode_text_join(node: ast.Call) -> str | None:
+    if len(node.args) != 1:
+        return None
+    seq = node.args[0]
+    if type(seq) is ast.Tuple:
+        parts: list[str] = []
+        for item in seq.elts:
+            part = decode_obf_text_expr(item)
+            if part is None:
+                return None
+            parts.append(part)
+        return "".join(parts)
     if (
-        isinstance(node, ast.Call)
-        and isinstance(node.func, ast.Attribute)
-        and isinstance(node.func.value, ast.Constant)
-        and isinstance(node.func.value.value, str)
-        and node.func.attr == "format"
+        type(seq) is ast.GeneratorExp
+        and len(seq.generators) == 1
+        and isinstance(seq.elt, ast.Call)
+        and isinstance(seq.elt.func, ast.Name)
+        and seq.elt.func.id == "chr"
+        and len(seq.elt.args) == 1
+        and isinstance(seq.elt.args[0], ast.Name)
+        and isinstance(seq.generators[0].target, ast.Name)
+        and seq.generators[0].target.id == seq.elt.args[0].id
+        and isinstance(seq.generators[0].iter, ast.Tuple)
     ):
-        fmt = node.func.value.value
-        args: list[str] = []
-        for arg in node.args:
-            val = decode_obf_text_expr(arg)
-            if val is None:
+        chars: list[str] = []
+        for item in seq.generators[0].iter.elts:
+            if not isinstance(item, ast.Constant) or not isinstance(item.value, int):
                 return None
-            args.append(val)
-        try:
-            return fmt.format(*args)
-        except Exception:
+            chars.append(chr(item.value))
+        return "".join(chars)
+    return None
+
+
+def _decode_text_format(node: ast.Call) -> str | None:
+    fmt = node.func.value.value
+    args: list[str] = []
+    for arg in node.args:
+        val = decode_obf_text_expr(arg)
+        if val is None:
             return None
+        args.append(val)
+    try:
+        return fmt.format(*args)
+    except Exception:
+        return None
 
+
+def _decode_text_bytes(node: ast.Call) -> str | None:
+    data = node.func.value
+    if not node.args:
+        if type(data) is ast.Constant and type(data.value) is bytes:
+            raw = data.value
+        elif (
+            type(data) is ast.Call
+            and isinstance(data.func, ast.Name)
+            and data.func.id == "bytes"
+            and len(data.args) == 1
+            and isinstance(data.args[0], ast.Tuple)
+            and all(isinstance(item, ast.Constant) and type(item.value) is int for item in data.args[0].elts)
+        ):
+            raw = bytes(item.value & 0xFF for item in data.args[0].elts)
+        else:
+            raw = None
+        if raw is not None:
+            try:
+                return raw.decode("utf-8")
+            except UnicodeDecodeError:
+                return None
     if (
-        isinstance(node, ast.Call)
-        and isinstance(node.func, ast.Attribute)
-        and node.func.attr == "decode"
-        and isinstance(node.func.value, ast.Call)
-        and isinstance(node.func.value.func, ast.Attribute)
-        and isinstance(node.func.value.func.value, ast.Name)
-        and node.func.value.func.value.id == "bytes"
-        and node.func.value.func.attr == "fromhex"
-        and len(node.func.value.args) == 1
-        and isinstance(node.func.value.args[0], ast.Constant)
-        and isinstance(node.func.value.args[0].value, str)
+        type(data) is ast.Call
+        and isinstance(data.func, ast.Attribute)
+        and isinstance(data.func.value, ast.Name)
+        and data.func.value.id == "bytes"
+        and data.func.attr == "fromhex"
+        and len(data.args) == 1
+        and isinstance(data.args[0], ast.Constant)
+        and isinstance(data.args[0].value, str)
     ):
         codec = "utf-8"
         if node.args:
@@ -1249,145 +1839,99 @@ def decode_obf_text_expr(node: ast.AST) -> str | None:
                 return None
             codec = node.args[0].value
         try:
-            return bytes.fromhex(node.func.value.args[0].value).decode(codec)
+            return bytes.fromhex(data.args[0].value).decode(codec)
         except Exception:
             return None
+    return None
+
 
+def _decode_text_call(node: ast.Call) -> str | None:
+    func = node.func
+    if type(func) is not ast.Attribute:
+        return None
+    attr = func.attr
+    if attr == "decode":
+        return _decode_text_bytes(node)
+    if attr in _DECODE_TEXT_STR_METHODS and type(func.value) is ast.Constant and type(func.value.value) is str:
+        return _DECODE_TEXT_STR_METHODS[attr](node)
     return None
 
 
+_DECODE_TEXT_STR_METHODS: dict[str, Callable[[ast.Call], str | None]] = {
+    "join": _decode_text_join,
+    "format": _decode_text_format,
+}
+_DECODE_TEXT_HANDLERS: dict[type, Callable[..., str | None]] = {
+    ast.Constant: _decode_text_constant,
+    ast.BinOp: _decode_text_concat,
+    ast.Call: _decode_text_call,
+}
+
+
+def decode_obf_text_expr(node: ast.AST) -> str | None:
+    # One lookup on the node type picks the only shape that can match.
+    handler = _DECODE_TEXT_HANDLERS.get(type(node))
+    return handler(node) if handler is not None else None
+
+
+# Dead-code skeletons, rebuilt per use by _patch: only the drawn ints (fresh Constants)
+# and the lambda parameter differ, everything else comes from the compiled builder.
+_DEAD_NOOP_TEMPLATES = {
+    "tuple_pick": _expr_template("(L, R)[0 if L == R else 1]"),
+    "bool_chain": _expr_template("A == B or C != C"),
+    "lambda_call": _expr_template("(lambda _n: _n ^ K)(V)"),
+    "ifexp": _expr_template("X if X == Y else Y"),
+    "arith": _expr_template("(A ^ B) + Z"),
+}
+_DEAD_TEST_TEMPLATES = {
+    "xor_compare": _expr_template("A ^ K ^ 0 == T"),
+    "len_negative": _expr_template("len(VALUES) < 0"),
+    "tuple_order": _expr_template("(A, B)[0] > (A, B)[1]"),
+    "contra_bool": _expr_template("A == A and B != B"),
+    "lambda_none": _expr_template("(lambda ARG: ARG is None)(object())"),
+}
+
+
 def build_dead_noop_expr(rng: random.Random) -> ast.expr:
     style = rng.choice(("arith", "tuple_pick", "bool_chain", "lambda_call", "ifexp"))
+    template = _DEAD_NOOP_TEMPLATES[style]
     if style == "tuple_pick":
         left = rng.randint(1000, 9000)
-        right = left + rng.randint(7, 133)
-        return ast.Subscript(
-            value=ast.Tuple(elts=[ast.Constant(left), ast.Constant(right)], ctx=ast.Load()),
-            slice=ast.IfExp(
-                test=ast.Compare(
-                    left=ast.Constant(left),
-                    ops=[ast.Eq()],
-                    comparators=[ast.Constant(right)],
-                ),
-                body=ast.Constant(0),
-                orelse=ast.Constant(1),
-            ),
-            ctx=ast.Load(),
-        )
+        return _patch(template, {"L": left, "R": left + rng.randint(7, 133)})
     if style == "bool_chain":
         a = rng.randint(100, 900)
         b = a + rng.randint(1, 91)
-        c = rng.randint(100, 900)
-        return ast.BoolOp(
-            op=ast.Or(),
-            values=[
-                ast.Compare(left=ast.Constant(a), ops=[ast.Eq()], comparators=[ast.Constant(b)]),
-                ast.Compare(left=ast.Constant(c), ops=[ast.NotEq()], comparators=[ast.Constant(c)]),
-            ],
-        )
+        return _patch(template, {"A": a, "B": b, "C": rng.randint(100, 900)})
     if style == "lambda_call":
         key = rng.randint(5, 250)
         val = rng.randint(1000, 9999)
-        return ast.Call(
-            func=ast.Lambda(
-                args=ast.arguments(
-                    posonlyargs=[],
-                    args=[ast.arg(arg="_n")],
-                    kwonlyargs=[],
-                    kw_defaults=[],
-                    defaults=[],
-                ),
-                body=ast.BinOp(
-                    left=ast.Name(id="_n", ctx=ast.Load()),
-                    op=ast.BitXor(),
-                    right=ast.Constant(key),
-                ),
-            ),
-            args=[ast.Constant(val ^ key)],
-            keywords=[],
-        )
+        return _patch(template, {"K": key, "V": val ^ key})
     if style == "ifexp":
         x = rng.randint(100, 400)
-        y = x + rng.randint(1, 30)
-        return ast.IfExp(
-            test=ast.Compare(left=ast.Constant(x), ops=[ast.Eq()], comparators=[ast.Constant(y)]),
-            body=ast.Constant(x),
-            orelse=ast.Constant(y),
-        )
+        return _patch(template, {"X": x, "Y": x + rng.randint(1, 30)})
     a = rng.randint(1000, 9999)
     b = rng.randint(100, 999)
     c = rng.randint(1, 50)
-    return ast.BinOp(
-        left=ast.BinOp(left=ast.Constant(a ^ b), op=ast.BitXor(), right=ast.Constant(b)),
-        op=ast.Add(),
-        right=ast.Constant(c - c),
-    )
+    return _patch(template, {"A": a ^ b, "B": b, "Z": c - c})
 
 
 def build_always_false_test(rng: random.Random) -> ast.expr:
     style = rng.choice(("xor_compare", "len_negative", "tuple_order", "contra_bool", "lambda_none"))
+    template = _DEAD_TEST_TEMPLATES[style]
     if style == "xor_compare":
         base = rng.randint(1000, 9000)
         key = rng.randint(1, 255)
-        gap = rng.randint(1, 19)
-        return ast.Compare(
-            left=ast.BinOp(
-                left=ast.BinOp(left=ast.Constant(base ^ key), op=ast.BitXor(), right=ast.Constant(key)),
-                op=ast.BitXor(),
-                right=ast.Constant(0),
-            ),
-            ops=[ast.Eq()],
-            comparators=[ast.Constant(base + gap)],
-        )
+        return _patch(template, {"A": base ^ key, "K": key, "T": base + rng.randint(1, 19)})
     if style == "len_negative":
         values = [ast.Constant(rng.randint(10, 999)) for _ in range(rng.randint(2, 5))]
-        return ast.Compare(
-            left=ast.Call(
-                func=ast.Name(id="len", ctx=ast.Load()),
-                args=[ast.Tuple(elts=values, ctx=ast.Load())],
-                keywords=[],
-            ),
-            ops=[ast.Lt()],
-            comparators=[ast.Constant(0)],
-        )
+        return _patch(template, {"VALUES": ast.Tuple(elts=values, ctx=_LOAD)})
     if style == "tuple_order":
         base = rng.randint(50, 500)
-        delta = rng.randint(1, 25)
-        pair = ast.Tuple(elts=[ast.Constant(base), ast.Constant(base + delta)], ctx=ast.Load())
-        return ast.Compare(
-            left=ast.Subscript(value=pair, slice=ast.Constant(0), ctx=ast.Load()),
-            ops=[ast.Gt()],
-            comparators=[ast.Subscript(value=copy.deepcopy(pair), slice=ast.Constant(1), ctx=ast.Load())],
-        )
+        return _patch(template, {"A": base, "B": base + rng.randint(1, 25)})
     if style == "contra_bool":
         a = rng.randint(200, 1200)
-        b = rng.randint(5000, 9500)
-        return ast.BoolOp(
-            op=ast.And(),
-            values=[
-                ast.Compare(left=ast.Constant(a), ops=[ast.Eq()], comparators=[ast.Constant(a)]),
-                ast.Compare(left=ast.Constant(b), ops=[ast.NotEq()], comparators=[ast.Constant(b)]),
-            ],
-        )
-    arg_name = random_local_identifier(rng)
-    return ast.Call(
-        func=ast.Lambda(
-            args=ast.arguments(
-                posonlyargs=[],
-                args=[ast.arg(arg=arg_name)],
-                kwonlyargs=[],
-                kw_defaults=[],
-                defaults=[],
-            ),
-            body=ast.Compare(
-                left=ast.Name(id=arg_name, ctx=ast.Load()),
-                ops=[ast.Is()],
-                comparators=[ast.Constant(None)],
-            ),
-        ),
-        args=[ast.Call(func=ast.Name(id="object", ctx=ast.Load()), args=[], keywords=[])],
-        keywords=[],
-    )
+        return _patch(template, {"A": a, "B": rng.randint(5000, 9500)})
+    return _patch(template, {"ARG": random_local_identifier(rng)})
 
 
 def _is_object_call(node: ast.AST) -> bool:
@@ -1535,7 +2079,65 @@ def build_dead_noop_body(rng: random.Random) -> list[ast.stmt]:
     return body
 
 
-class AttributeLoadObfuscator(ast.NodeTransformer):
+_STATEMENT_NODES = (ast.stmt, ast.excepthandler, ast.match_case)
+
+
+def _fill_statement_locations(tree: ast.AST) -> None:
+    # Stand-in for ast.fix_missing_locations before ast.unparse, which only reads lineno
+    # on statements (for type comments). Generated expressions stay unplaced, so just the
+    # statement lists are walked; unplaced statements take their parent's position.
+    stack: list[tuple[ast.AST, ast.AST | None]] = [(tree, None)]
+    while stack:
+        node, parent = stack.pop()
+        if parent is not None and not hasattr(node, "lineno") and "lineno" in node._attributes:
+            node.lineno = getattr(parent, "lineno", 1)
+            node.col_offset = getattr(parent, "col_offset", 0)
+            node.end_lineno = getattr(parent, "end_lineno", node.lineno)
+            node.end_col_offset = getattr(parent, "end_col_offset", node.col_offset)
+        for field in _CHILD_FIELDS.get(type(node), ()):
+            items = getattr(node, field, None)
+            if type(items) is list and items and isinstance(items[0], _STATEMENT_NODES):
+                stack.extend((item, node) for item in items)
+
+
+class StatementTransformer(DispatchTransformer):
+    # For passes whose targets are statements: expression subtrees can never hold
+    # a statement, so generic_visit only descends through statement lists.
+    def generic_visit(self, node: ast.AST) -> ast.AST:
+        for field_name in node._fields:
+            items = getattr(node, field_name, None)
+            if type(items) is not list or not items or not isinstance(items[0], _STATEMENT_NODES):
+                continue
+            new_items: list[ast.AST] = []
+            for item in items:
+                value = self.visit(item)
+                if value is None:
+                    continue
+                if isinstance(value, list):
+                    new_items.extend(value)
+                else:
+                    new_items.append(value)
+            items[:] = new_items
+        return node
+
+
+class AttributeLoadObfuscator(DispatchTransformer):
+    TEMPLATES = {
+        "getattr": _expr_template("getattr(OBJ, ATTR)"),
+        "builtins_getattr": _expr_template("__import__('builtins').getattr(OBJ, ATTR)"),
+        "operator_attrgetter": _expr_template("__import__('operator').attrgetter(ATTR)(OBJ)"),
+        "lambda_getattr": _expr_template("(lambda _o, _n: getattr(_o, _n))(OBJ, ATTR)"),
+        "globals_getattr": _expr_template("globals().get('getattr', getattr)(OBJ, ATTR)"),
+        # Local dict fallback form; ultimately resolves to builtin getattr.
+        "locals_getattr": _expr_template("(locals().get('getattr') or getattr)(OBJ, ATTR)"),
+    }
+    EXPLICIT_METHODS = {
+        "getattr": "getattr",
+        "builtins": "builtins_getattr",
+        "attrgetter": "operator_attrgetter",
+        "lambda": "lambda_getattr",
+    }
+
     def __init__(
         self,
         rng: random.Random,
@@ -1546,126 +2148,69 @@ class AttributeLoadObfuscator(ast.NodeTransformer):
     ) -> None:
         self.rng = rng
         self.preserve_attrs = preserve_attrs
+        self.skip_attrs = _COMMON_DUNDERS | frozenset(preserve_attrs)
+        # Per attribute name: preserved or dunder, decided once per run.
+        self._skipped: dict[str, bool] = {}
         self.mode = mode
         self.rate = max(0.0, min(1.0, rate))
+        self.gate = RateGate(rng, self.rate)
         self.methods = methods
+        self.explicit = self.EXPLICIT_METHODS.get(mode)
         self.changed = 0
 
     def _attr_name_expr(self, attr: str) -> ast.expr:
         return build_text_expr(attr, self.rng)
 
     def _pick_method(self) -> str:
-        explicit_map = {
-            "getattr": "getattr",
-            "builtins": "builtins_getattr",
-            "attrgetter": "operator_attrgetter",
-            "lambda": "lambda_getattr",
-        }
-        if self.mode in explicit_map:
-            return explicit_map[self.mode]
+        if self.explicit is not None:
+            return self.explicit
         if self.methods:
             return self.rng.choice(self.methods)
         return "getattr"
 
     def _build_expr(self, obj: ast.expr, attr: str) -> ast.expr:
         method = self._pick_method()
-
-        attr_expr = self._attr_name_expr(attr)
-        if method == "builtins_getattr":
-            builtins_mod = ast.Call(
-                func=ast.Name(id="__import__", ctx=ast.Load()),
-                args=[ast.Constant("builtins")],
-                keywords=[],
-            )
-            return ast.Call(
-                func=ast.Attribute(value=builtins_mod, attr="getattr", ctx=ast.Load()),
-                args=[obj, attr_expr],
-                keywords=[],
-            )
-        if method == "operator_attrgetter":
-            op_mod = ast.Call(
-                func=ast.Name(id="__import__", ctx=ast.Load()),
-                args=[ast.Constant("operator")],
-                keywords=[],
-            )
-            getter = ast.Call(
-                func=ast.Attribute(value=op_mod, attr="attrgetter", ctx=ast.Load()),
-                args=[attr_expr],
-                keywords=[],
-            )
-            return ast.Call(func=getter, args=[obj], keywords=[])
-        if method == "lambda_getattr":
-            lam = ast.Lambda(
-                args=ast.arguments(
-                    posonlyargs=[],
-                    args=[ast.arg(arg="_o"), ast.arg(arg="_n")],
-                    kwonlyargs=[],
-                    kw_defaults=[],
-                    defaults=[],
-                ),
-                body=ast.Call(
-                    func=ast.Name(id="getattr", ctx=ast.Load()),
-                    args=[ast.Name(id="_o", ctx=ast.Load()), ast.Name(id="_n", ctx=ast.Load())],
-                    keywords=[],
-                ),
-            )
-            return ast.Call(func=lam, args=[obj, attr_expr], keywords=[])
-        if method == "globals_getattr":
-            return ast.Call(
-                func=ast.Call(
-                    func=ast.Attribute(
-                        value=ast.Call(func=ast.Name(id="globals", ctx=ast.Load()), args=[], keywords=[]),
-                        attr="get",
-                        ctx=ast.Load(),
-                    ),
-                    args=[ast.Constant("getattr"), ast.Name(id="getattr", ctx=ast.Load())],
-                    keywords=[],
-                ),
-                args=[obj, attr_expr],
-                keywords=[],
-            )
-        if method == "locals_getattr":
-            # Local dict fallback form; ultimately resolves to builtin getattr.
-            local_getattr = ast.Call(
-                func=ast.Attribute(
-                    value=ast.Call(func=ast.Name(id="locals", ctx=ast.Load()), args=[], keywords=[]),
-                    attr="get",
-                    ctx=ast.Load(),
-                ),
-                args=[ast.Constant("getattr")],
-                keywords=[],
-            )
-            return ast.Call(
-                func=ast.BoolOp(
-                    op=ast.Or(),
-                    values=[local_getattr, ast.Name(id="getattr", ctx=ast.Load())],
-                ),
-                args=[obj, attr_expr],
-                keywords=[],
-            )
-        return ast.Call(
-            func=ast.Name(id="getattr", ctx=ast.Load()),
-            args=[obj, attr_expr],
-            keywords=[],
-        )
+        template = self.TEMPLATES.get(method, self.TEMPLATES["getattr"])
+        return _patch(template, {"OBJ": obj, "ATTR": self._attr_name_expr(attr)})
 
     def visit_Attribute(self, node: ast.Attribute) -> ast.AST:
         self.generic_visit(node)
-        if not isinstance(node.ctx, ast.Load):
-            return node
-        if node.attr in self.preserve_attrs:
-            return node
-        if node.attr.startswith("__") and node.attr.endswith("__"):
+        return self.rewrite_Attribute(node)
+
+    def rewrite_Attribute(self, node: ast.Attribute) -> ast.AST:
+        if type(node.ctx) is not ast.Load:
             return node
-        if self.rng.random() > self.rate:
+        attr = node.attr
+        skipped = self._skipped.get(attr)
+        if skipped is None:
+            skipped = self._skipped[attr] = attr in self.skip_attrs or attr[:2] == "__" == attr[-2:]
+        if skipped or not self.gate():
             return node
 
         self.changed += 1
-        replaced = self._build_expr(node.value, node.attr)
-        return ast.copy_location(replaced, node)
+        return _cl(self._build_expr(node.value, attr), node)
 
 
-class SetAttrRewriter(ast.NodeTransformer):
+class SetAttrRewriter(StatementTransformer):
+    TEMPLATES = {
+        "setattr": _expr_template("setattr(OBJ, ATTR, VALUE)"),
+        "builtins_setattr": _expr_template("__import__('builtins').setattr(OBJ, ATTR, VALUE)"),
+        "lambda_setattr": _expr_template("(lambda O, N, V: setattr(O, N, V))(OBJ, ATTR, VALUE)"),
+        "delattr": _expr_template("delattr(OBJ, ATTR)"),
+        "builtins_delattr": _expr_template("__import__('builtins').delattr(OBJ, ATTR)"),
+        "lambda_delattr": _expr_template("(lambda O, N: delattr(O, N))(OBJ, ATTR)"),
+    }
+    EXPLICIT_SET_METHODS = {
+        "setattr": "setattr",
+        "builtins": "builtins_setattr",
+        "lambda": "lambda_setattr",
+    }
+    EXPLICIT_DEL_METHODS = {
+        "setattr": "delattr",
+        "builtins": "builtins_delattr",
+        "lambda": "lambda_delattr",
+    }
+
     def __init__(
         self,
         rng: random.Random,
@@ -1676,163 +2221,125 @@ class SetAttrRewriter(ast.NodeTransformer):
     ) -> None:
         self.rng = rng
         self.preserve_attrs = preserve_attrs
+        self.skip_attrs = _COMMON_DUNDERS | frozenset(preserve_attrs)
+        # Per attribute name: preserved or dunder, decided once per run.
+        self._skipped: dict[str, bool] = {}
         self.mode = mode
         self.rate = max(0.0, min(1.0, rate))
+        self.gate = RateGate(rng, self.rate)
         self.methods = methods
+        self.explicit_set = self.EXPLICIT_SET_METHODS.get(mode)
+        self.explicit_del = self.EXPLICIT_DEL_METHODS.get(mode)
+        self.set_pool = tuple(m for m in methods if m.endswith("setattr"))
+        self.del_pool = tuple(m for m in methods if m.endswith("delattr"))
         self.changed = 0
 
     def _allowed(self, attr: str) -> bool:
-        if attr in self.preserve_attrs:
-            return False
-        if attr.startswith("__") and attr.endswith("__"):
-            return False
-        return True
+        skipped = self._skipped.get(attr)
+        if skipped is None:
+            skipped = self._skipped[attr] = attr in self.skip_attrs or attr[:2] == "__" == attr[-2:]
+        return not skipped
 
     def _pick_set_method(self) -> str:
-        explicit_map = {
-            "setattr": "setattr",
-            "builtins": "builtins_setattr",
-            "lambda": "lambda_setattr",
-        }
-        if self.mode in explicit_map:
-            return explicit_map[self.mode]
-        choices = [m for m in self.methods if m.endswith("setattr")]
-        if choices:
-            return self.rng.choice(choices)
+        if self.explicit_set is not None:
+            return self.explicit_set
+        if self.set_pool:
+            return self.rng.choice(self.set_pool)
         return "setattr"
 
     def _attr_name_expr(self, attr_name: str) -> ast.expr:
         return build_text_expr(attr_name, self.rng)
 
     def _pick_del_method(self) -> str:
-        explicit_map = {
-            "setattr": "delattr",
-            "builtins": "builtins_delattr",
-            "lambda": "lambda_delattr",
-        }
-        if self.mode in explicit_map:
-            return explicit_map[self.mode]
-        choices = [m for m in self.methods if m.endswith("delattr")]
-        if choices:
-            return self.rng.choice(choices)
+        if self.explicit_del is not None:
+            return self.explicit_del
+        if self.del_pool:
+            return self.rng.choice(self.del_pool)
         return "delattr"
 
     def _set_expr(self, obj: ast.expr, attr_name: str, value: ast.expr) -> ast.expr:
         method = self._pick_set_method()
-        attr_expr = self._attr_name_expr(attr_name)
-        if method == "builtins_setattr":
-            return ast.Call(
-                func=ast.Attribute(
-                    value=ast.Call(func=ast.Name(id="__import__", ctx=ast.Load()), args=[ast.Constant("builtins")], keywords=[]),
-                    attr="setattr",
-                    ctx=ast.Load(),
-                ),
-                args=[obj, attr_expr, value],
-                keywords=[],
-            )
+        subs: dict[str, ast.AST | str | int] = {
+            "OBJ": obj,
+            "ATTR": self._attr_name_expr(attr_name),
+            "VALUE": value,
+        }
         if method == "lambda_setattr":
-            obj_name = random_local_identifier(self.rng)
-            attr_name_id = random_local_identifier(self.rng)
-            value_name = random_local_identifier(self.rng)
-            lam = ast.Lambda(
-                args=ast.arguments(
-                    posonlyargs=[],
-                    args=[ast.arg(arg=obj_name), ast.arg(arg=attr_name_id), ast.arg(arg=value_name)],
-                    kwonlyargs=[],
-                    kw_defaults=[],
-                    defaults=[],
-                ),
-                body=ast.Call(
-                    func=ast.Name(id="setattr", ctx=ast.Load()),
-                    args=[
-                        ast.Name(id=obj_name, ctx=ast.Load()),
-                        ast.Name(id=attr_name_id, ctx=ast.Load()),
-                        ast.Name(id=value_name, ctx=ast.Load()),
-                    ],
-                    keywords=[],
-                ),
-            )
-            return ast.Call(func=lam, args=[obj, attr_expr, value], keywords=[])
-        return ast.Call(
-            func=ast.Name(id="setattr", ctx=ast.Load()),
-            args=[obj, attr_expr, value],
-            keywords=[],
-        )
+            subs["O"] = random_local_identifier(self.rng)
+            subs["N"] = random_local_identifier(self.rng)
+            subs["V"] = random_local_identifier(self.rng)
+        template = self.TEMPLATES.get(method, self.TEMPLATES["setattr"])
+        return _patch(template, subs)
 
     def _del_expr(self, obj: ast.expr, attr_name: str) -> ast.expr:
         method = self._pick_del_method()
-        attr_expr = self._attr_name_expr(attr_name)
-        if method == "builtins_delattr":
-            return ast.Call(
-                func=ast.Attribute(
-                    value=ast.Call(func=ast.Name(id="__import__", ctx=ast.Load()), args=[ast.Constant("builtins")], keywords=[]),
-                    attr="delattr",
-                    ctx=ast.Load(),
-                ),
-                args=[obj, attr_expr],
-                keywords=[],
-            )
+        subs: dict[str, ast.AST | str | int] = {"OBJ": obj, "ATTR": self._attr_name_expr(attr_name)}
         if method == "lambda_delattr":
-            obj_name = random_local_identifier(self.rng)
-            attr_name_id = random_local_identifier(self.rng)
-            lam = ast.Lambda(
-                args=ast.arguments(
-                    posonlyargs=[],
-                    args=[ast.arg(arg=obj_name), ast.arg(arg=attr_name_id)],
-                    kwonlyargs=[],
-                    kw_defaults=[],
-                    defaults=[],
-                ),
-                body=ast.Call(
-                    func=ast.Name(id="delattr", ctx=ast.Load()),
-                    args=[ast.Name(id=obj_name, ctx=ast.Load()), ast.Name(id=attr_name_id, ctx=ast.Load())],
-                    keywords=[],
-                ),
-            )
-            return ast.Call(func=lam, args=[obj, attr_expr], keywords=[])
-        return ast.Call(
-            func=ast.Name(id="delattr", ctx=ast.Load()),
-            args=[obj, attr_expr],
-            keywords=[],
-        )
+            subs["O"] = random_local_identifier(self.rng)
+            subs["N"] = random_local_identifier(self.rng)
+        template = self.TEMPLATES.get(method, self.TEMPLATES["delattr"])
+        return _patch(template, subs)
 
     def visit_Assign(self, node: ast.Assign) -> ast.AST:
         self.generic_visit(node)
-        if self.rng.random() > self.rate:
+        return self.rewrite_Assign(node)
+
+    def visit_Delete(self, node: ast.Delete) -> ast.AST:
+        self.generic_visit(node)
+        return self.rewrite_Delete(node)
+
+    def rewrite_Assign(self, node: ast.Assign) -> ast.AST:
+        if not self.gate():
             return node
-        if len(node.targets) != 1:
+        targets = node.targets
+        if len(targets) != 1:
             return node
-        target = node.targets[0]
-        if not isinstance(target, ast.Attribute):
+        target = targets[0]
+        if type(target) is not ast.Attribute:
             return node
-        if not self._allowed(target.attr):
+        attr = target.attr
+        if not self._allowed(attr):
             return node
 
         self.changed += 1
-        call = self._set_expr(target.value, target.attr, node.value)
-        return ast.copy_location(ast.Expr(value=call), node)
+        call = self._set_expr(target.value, attr, node.value)
+        return _cl(ast.Expr(value=call), node)
 
-    def visit_Delete(self, node: ast.Delete) -> ast.AST:
-        self.generic_visit(node)
-        if self.rng.random() > self.rate:
-            return node
-        if not node.targets:
+    def rewrite_Delete(self, node: ast.Delete) -> ast.AST:
+        if not self.gate():
             return node
-        if not all(isinstance(target, ast.Attribute) for target in node.targets):
+        targets = node.targets
+        if not targets:
             return node
-
-        out: list[ast.stmt] = []
-        for target in node.targets:
-            assert isinstance(target, ast.Attribute)
-            if not self._allowed(target.attr):
+        allowed = self._allowed
+        for target in targets:
+            if type(target) is not ast.Attribute or not allowed(target.attr):
                 return node
-            self.changed += 1
-            call = self._del_expr(target.value, target.attr)
-            out.append(ast.copy_location(ast.Expr(value=call), node))
+
+        # Checked up front so a rejected target never leaves counters or RNG draws behind.
+        del_expr = self._del_expr
+        out: list[ast.stmt] = [_cl(ast.Expr(value=del_expr(target.value, target.attr)), node) for target in targets]
+        self.changed += len(out)
         return out
 
 
-class CallObfuscator(ast.NodeTransformer):
+class CallObfuscator(DispatchTransformer):
+    TEMPLATES = {
+        "lambda_wrap": _expr_template("(lambda F, A, K: F(*A, **K))(FUNC, ARGS, KWARGS)"),
+        "builtins_eval_call": _expr_template("eval(TEXT)(FUNC, ARGS, KWARGS)"),
+        "factory_lambda_call": _expr_template(
+            "(lambda F, A, K: (lambda *VA, **VK: F(*VA, **VK))(*A, **K))(FUNC, ARGS, KWARGS)"
+        ),
+        "thunk_wrap": _expr_template("(lambda T: T())(lambda: CALL)"),
+    }
+    EXPLICIT_METHODS = {
+        "wrap": "helper_wrap",
+        "lambda": "lambda_wrap",
+        "eval": "builtins_eval_call",
+        "factory": "factory_lambda_call",
+        "thunk": "thunk_wrap",
+    }
+
     def __init__(
         self,
         rng: random.Random,
@@ -1845,12 +2352,14 @@ class CallObfuscator(ast.NodeTransformer):
         self.helper_names = helper_names
         self.mode = mode
         self.rate = max(0.0, min(1.0, rate))
+        self.gate = RateGate(rng, self.rate)
         self.methods = methods
+        self.explicit = self.EXPLICIT_METHODS.get(mode)
         self.changed = 0
         self.used_helpers: set[str] = set()
 
     def _contains_zero_arg_super(self, node: ast.AST) -> bool:
-        for child in ast.walk(node):
+        for child in _iter_nodes(node):
             if (
                 isinstance(child, ast.Call)
                 and isinstance(child.func, ast.Name)
@@ -1869,122 +2378,72 @@ class CallObfuscator(ast.NodeTransformer):
                 names.append(candidate)
         return names[0], names[1], names[2]
 
+    def _args_tuple(self, args: list[ast.expr]) -> ast.Tuple:
+        if not args:
+            return _EMPTY_TUPLE
+        return ast.Tuple(elts=args, ctx=_LOAD)
+
     def _kwargs_dict(self, keywords: list[ast.keyword]) -> ast.Dict:
+        if not keywords:
+            return _EMPTY_DICT
         keys: list[ast.expr] = []
         values: list[ast.expr] = []
         for kw in keywords:
             if kw.arg is None:
-                return ast.Dict(keys=[], values=[])
+                return _EMPTY_DICT
             keys.append(ast.Constant(kw.arg))
             values.append(kw.value)
         return ast.Dict(keys=keys, values=values)
 
     def _lambda_wrap(self, func: ast.expr, args: list[ast.expr], keywords: list[ast.keyword]) -> ast.expr:
-        args_tuple = ast.Tuple(elts=args, ctx=ast.Load())
+        args_tuple = self._args_tuple(args)
         kwargs_dict = self._kwargs_dict(keywords)
         fn_name, args_name, kwargs_name = self._triple_names()
-        lam = ast.Lambda(
-            args=ast.arguments(
-                posonlyargs=[],
-                args=[ast.arg(arg=fn_name), ast.arg(arg=args_name), ast.arg(arg=kwargs_name)],
-                kwonlyargs=[],
-                kw_defaults=[],
-                defaults=[],
-            ),
-            body=ast.Call(
-                func=ast.Name(id=fn_name, ctx=ast.Load()),
-                args=[ast.Starred(value=ast.Name(id=args_name, ctx=ast.Load()), ctx=ast.Load())],
-                keywords=[ast.keyword(arg=None, value=ast.Name(id=kwargs_name, ctx=ast.Load()))],
-            ),
+        return _patch(
+            self.TEMPLATES["lambda_wrap"],
+            {"F": fn_name, "A": args_name, "K": kwargs_name, "FUNC": func, "ARGS": args_tuple, "KWARGS": kwargs_dict},
         )
-        return ast.Call(func=lam, args=[func, args_tuple, kwargs_dict], keywords=[])
 
     def _eval_wrap(self, func: ast.expr, args: list[ast.expr], keywords: list[ast.keyword]) -> ast.expr:
-        args_tuple = ast.Tuple(elts=args, ctx=ast.Load())
+        args_tuple = self._args_tuple(args)
         kwargs_dict = self._kwargs_dict(keywords)
-        expr = ast.BinOp(
-            left=build_text_expr("lambda f,a,k: f(*a, **k)", self.rng),
-            op=ast.Add(),
-            right=ast.Constant(""),
-        )
-        compiled_lam = ast.Call(
-            func=ast.Name(id="eval", ctx=ast.Load()),
-            args=[expr],
-            keywords=[],
+        return _patch(
+            self.TEMPLATES["builtins_eval_call"],
+            {
+                "TEXT": build_text_expr("lambda f,a,k: f(*a, **k)", self.rng),
+                "FUNC": func,
+                "ARGS": args_tuple,
+                "KWARGS": kwargs_dict,
+            },
         )
-        return ast.Call(func=compiled_lam, args=[func, args_tuple, kwargs_dict], keywords=[])
 
     def _factory_lambda_wrap(self, func: ast.expr, args: list[ast.expr], keywords: list[ast.keyword]) -> ast.expr:
-        args_tuple = ast.Tuple(elts=args, ctx=ast.Load())
+        args_tuple = self._args_tuple(args)
         kwargs_dict = self._kwargs_dict(keywords)
         fn_name, args_name, kwargs_name = self._triple_names()
-        varargs_name = random_local_identifier(self.rng)
-        varkw_name = random_local_identifier(self.rng)
-        factory = ast.Lambda(
-            args=ast.arguments(
-                posonlyargs=[],
-                args=[ast.arg(arg=fn_name), ast.arg(arg=args_name), ast.arg(arg=kwargs_name)],
-                kwonlyargs=[],
-                kw_defaults=[],
-                defaults=[],
-            ),
-            body=ast.Call(
-                func=ast.Lambda(
-                    args=ast.arguments(
-                        posonlyargs=[],
-                        args=[],
-                        vararg=ast.arg(arg=varargs_name),
-                        kwonlyargs=[],
-                        kw_defaults=[],
-                        kwarg=ast.arg(arg=varkw_name),
-                        defaults=[],
-                    ),
-                    body=ast.Call(
-                        func=ast.Name(id=fn_name, ctx=ast.Load()),
-                        args=[ast.Starred(value=ast.Name(id=varargs_name, ctx=ast.Load()), ctx=ast.Load())],
-                        keywords=[ast.keyword(arg=None, value=ast.Name(id=varkw_name, ctx=ast.Load()))],
-                    ),
-                ),
-                args=[ast.Starred(value=ast.Name(id=args_name, ctx=ast.Load()), ctx=ast.Load())],
-                keywords=[ast.keyword(arg=None, value=ast.Name(id=kwargs_name, ctx=ast.Load()))],
-            ),
+        return _patch(
+            self.TEMPLATES["factory_lambda_call"],
+            {
+                "F": fn_name,
+                "A": args_name,
+                "K": kwargs_name,
+                "VA": random_local_identifier(self.rng),
+                "VK": random_local_identifier(self.rng),
+                "FUNC": func,
+                "ARGS": args_tuple,
+                "KWARGS": kwargs_dict,
+            },
         )
-        return ast.Call(func=factory, args=[func, args_tuple, kwargs_dict], keywords=[])
 
     def _thunk_wrap(self, func: ast.expr, args: list[ast.expr], keywords: list[ast.keyword]) -> ast.expr:
-        thunk_name = random_local_identifier(self.rng)
-        invoker = ast.Lambda(
-            args=ast.arguments(
-                posonlyargs=[],
-                args=[ast.arg(arg=thunk_name)],
-                kwonlyargs=[],
-                kw_defaults=[],
-                defaults=[],
-            ),
-            body=ast.Call(func=ast.Name(id=thunk_name, ctx=ast.Load()), args=[], keywords=[]),
+        return _patch(
+            self.TEMPLATES["thunk_wrap"],
+            {"T": random_local_identifier(self.rng), "CALL": ast.Call(func=func, args=args, keywords=keywords)},
         )
-        thunk = ast.Lambda(
-            args=ast.arguments(
-                posonlyargs=[],
-                args=[],
-                kwonlyargs=[],
-                kw_defaults=[],
-                defaults=[],
-            ),
-            body=ast.Call(func=func, args=args, keywords=keywords),
-        )
-        return ast.Call(func=invoker, args=[thunk], keywords=[])
 
     def _pick_method(self) -> str:
-        explicit_map = {
-            "wrap": "helper_wrap",
-            "lambda": "lambda_wrap",
-            "eval": "builtins_eval_call",
-            "factory": "factory_lambda_call",
-            "thunk": "thunk_wrap",
-        }
-        if self.mode in explicit_map:
-            return explicit_map[self.mode]
+        if self.explicit is not None:
+            return self.explicit
         if self.methods:
             return self.rng.choice(self.methods)
         return "helper_wrap"
@@ -1996,15 +2455,29 @@ class CallObfuscator(ast.NodeTransformer):
 
     def visit_Call(self, node: ast.Call) -> ast.AST:
         self.generic_visit(node)
-        if self.rng.random() > self.rate:
+        return self.rewrite_Call(node)
+
+    def rewrite_Call(self, node: ast.Call) -> ast.AST:
+        if not self.gate():
             return node
-        if isinstance(node.func, ast.Name) and node.func.id in self.helper_names:
+        func = node.func
+        if type(func) is ast.Name and func.id in self.helper_names:
             return node
 
+        args = node.args
+        keywords = node.keywords
         method = self._pick_method()
-        has_starred = any(isinstance(arg, ast.Starred) for arg in node.args)
-        has_unpack_kwargs = any(kw.arg is None for kw in node.keywords)
-        if (has_starred or has_unpack_kwargs) and method != "thunk_wrap":
+        unpacks = False
+        for arg in args:
+            if type(arg) is ast.Starred:
+                unpacks = True
+                break
+        else:
+            for kw in keywords:
+                if kw.arg is None:
+                    unpacks = True
+                    break
+        if unpacks and method != "thunk_wrap":
             if "thunk_wrap" in self.methods or self.mode == "thunk":
                 method = "thunk_wrap"
             else:
@@ -2013,46 +2486,60 @@ class CallObfuscator(ast.NodeTransformer):
             return node
 
         if method == "lambda_wrap":
-            replaced = self._lambda_wrap(node.func, node.args, node.keywords)
+            replaced = self._lambda_wrap(func, args, keywords)
         elif method == "builtins_eval_call":
-            replaced = self._eval_wrap(node.func, node.args, node.keywords)
+            replaced = self._eval_wrap(func, args, keywords)
         elif method == "factory_lambda_call":
-            replaced = self._factory_lambda_wrap(node.func, node.args, node.keywords)
+            replaced = self._factory_lambda_wrap(func, args, keywords)
         elif method == "thunk_wrap":
-            replaced = self._thunk_wrap(node.func, node.args, node.keywords)
+            replaced = self._thunk_wrap(func, args, keywords)
         else:
             helper_name = self._pick_helper_name()
             self.used_helpers.add(helper_name)
             replaced = ast.Call(
-                func=ast.Name(id=helper_name, ctx=ast.Load()),
+                func=_name_load(helper_name),
                 args=[
-                    node.func,
-                    ast.Tuple(elts=node.args, ctx=ast.Load()),
-                    self._kwargs_dict(node.keywords),
+                    func,
+                    self._args_tuple(args),
+                    self._kwargs_dict(keywords),
                 ],
                 keywords=[],
             )
         self.changed += 1
-        return ast.copy_location(replaced, node)
+        return _cl(replaced, node)
 
 
-class BuiltinAliasTransformer(ast.NodeTransformer):
+class BuiltinAliasTransformer(DispatchTransformer):
     def __init__(self, mapping: dict[str, str], rate: float, rng: random.Random) -> None:
         self.mapping = mapping
         self.rate = max(0.0, min(1.0, rate))
+        self.gate = RateGate(rng, self.rate)
         self.rng = rng
         self.changed = 0
 
-    def visit_Name(self, node: ast.Name) -> ast.AST:
-        if isinstance(node.ctx, ast.Load):
-            alias = self.mapping.get(node.id)
-            if alias and self.rng.random() <= self.rate:
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        alias = self.mapping.get(node.id)
+        if alias and type(node.ctx) is ast.Load and self.gate():
+            self.changed += 1
+            return _cl(ast.Name(id=alias, ctx=_LOAD), node)
+        return node
+
+    def apply_sites(self, sites: list[tuple[ast.AST | list, str | int, ast.Name]]) -> None:
+        # Same decisions as visit() over sites from collect_builtin_load_sites. Names
+        # may be shared between sites, so the slot is replaced, never the node edited.
+        mapping = self.mapping
+        for container, key, node in sites:
+            alias = mapping.get(node.id)
+            if alias and self.gate():
                 self.changed += 1
-                return ast.copy_location(ast.Name(id=alias, ctx=ast.Load()), node)
-        return node
+                new = _cl(ast.Name(id=alias, ctx=_LOAD), node)
+                if type(key) is int:
+                    container[key] = new
+                else:
+                    setattr(container, key, new)
 
 
-class FlowObfuscator(ast.NodeTransformer):
+class FlowObfuscator(StatementTransformer):
     def __init__(
         self,
         rng: random.Random,
@@ -2063,18 +2550,23 @@ class FlowObfuscator(ast.NodeTransformer):
         self.rng = rng
         self.keep_docstrings = keep_docstrings
         self.rate = max(0.0, min(1.0, rate))
+        self.gate = RateGate(rng, self.rate)
         self.max_count = max(1, max_count)
+        # Dead blocks draw their many small constants from a derived buffered stream.
+        self.dead_rng = BufferedRandom(rng.getrandbits(64))
         self.changed = 0
 
     def _dead_if(self) -> ast.If:
-        return ast.If(
-            test=build_always_false_test(self.rng),
-            body=build_dead_noop_body(self.rng),
+        dead = ast.If(
+            test=build_always_false_test(self.dead_rng),
+            body=build_dead_noop_body(self.dead_rng),
             orelse=[],
         )
+        dead._obf_dead = True
+        return dead
 
     def _inject(self, body: list[ast.stmt]) -> list[ast.stmt]:
-        if self.rng.random() > self.rate:
+        if not self.gate():
             return body
 
         insert_at = 0
@@ -2086,37 +2578,140 @@ class FlowObfuscator(ast.NodeTransformer):
             and isinstance(body[0].value.value, str)
         ):
             insert_at = 1
-        amount = self.rng.randint(1, self.max_count)
-        for _ in range(amount):
-            body.insert(insert_at, self._dead_if())
-            self.changed += 1
+        amount = self.dead_rng.randint(1, self.max_count)
+        dead = [self._dead_if() for _ in range(amount)]
+        # Reversed to keep the order repeated inserts at one index used to give.
+        dead.reverse()
+        body[insert_at:insert_at] = dead
+        self.changed += amount
         return body
 
     def visit_FunctionDef(self, node: ast.FunctionDef) -> ast.AST:
         self.generic_visit(node)
-        node.body = self._inject(node.body)
-        return node
+        return self.rewrite_FunctionDef(node)
 
     def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> ast.AST:
         self.generic_visit(node)
+        return self.rewrite_FunctionDef(node)
+
+    def rewrite_FunctionDef(self, node: ast.FunctionDef | ast.AsyncFunctionDef) -> ast.AST:
         node.body = self._inject(node.body)
         return node
 
+    rewrite_AsyncFunctionDef = rewrite_FunctionDef
+
+
+class FusedRewriter(ast.NodeTransformer):
+    # Adjacent rewrite passes (attrs/setattrs/calls/flow) in one walk. A node is handed to
+    # each pass in order once its children are done, and whatever a pass builds is walked
+    # by the passes after it, matching what separate whole-tree walks would have seen.
+    def __init__(self, stages: list[ast.NodeTransformer]) -> None:
+        self.last = len(stages) - 1
+        self.rewriters: dict[type, list[tuple[int, Callable[[ast.AST], ast.AST | list[ast.AST]]]]] = {}
+        for index, stage in enumerate(stages):
+            for attr in dir(type(stage)):
+                if attr.startswith("rewrite_"):
+                    self.rewriters.setdefault(getattr(ast, attr[8:]), []).append((index, getattr(stage, attr)))
+
+    def visit(self, node: ast.AST) -> ast.AST | list[ast.AST]:
+        return self._walk(node, 0, None)
+
+    def _walk(self, root: ast.AST, start: int, done: dict[int, ast.AST] | None) -> ast.AST | list[ast.AST]:
+        # Post-order over an explicit stack; children are visited in generic_visit order so
+        # the rng is consumed exactly as the recursive walk did. Enter frames are
+        # (node, out) and exit frames (node, out, slots); each slot collects the results
+        # for one field and is only written back when something changed.
+        rewriters = self.rewriters
+        child_fields = _CHILD_FIELDS
+        top: list[ast.AST | list[ast.AST]] = []
+        stack: list[tuple] = [(root, top)]
+        while stack:
+            frame = stack.pop()
+            node = frame[0]
+            if len(frame) == 3:
+                for field, old, new in frame[2]:
+                    if type(old) is list:
+                        flat: list = []
+                        for value in new:
+                            if type(value) is list:
+                                flat.extend(value)
+                            else:
+                                flat.append(value)
+                        if len(flat) != len(old) or any(a is not b for a, b in zip(flat, old)):
+                            old[:] = flat
+                    elif new[0] is not old:
+                        setattr(node, field, new[0])
+                frame[1].append(self._rewrite(node, start) if type(node) in rewriters else node)
+                continue
+            out = frame[1]
+            if not isinstance(node, ast.AST) or (done is not None and id(node) in done):
+                out.append(node)
+                continue
+            slots: list[tuple[str, ast.AST | list, list]] = []
+            children: list[tuple[ast.AST, list]] = []
+            for field in child_fields.get(type(node), node._fields):
+                old = getattr(node, field, None)
+                if type(old) is list:
+                    new = []
+                    slots.append((field, old, new))
+                    children.extend((item, new) for item in old)
+                elif isinstance(old, ast.AST) and (old._fields or type(old) in rewriters):
+                    new = []
+                    slots.append((field, old, new))
+                    children.append((old, new))
+            if not children:
+                out.append(self._rewrite(node, start) if type(node) in rewriters else node)
+                continue
+            stack.append((node, out, slots))
+            stack.extend(reversed(children))
+        return top[0]
+
+    def _rewrite(self, node: ast.AST, start: int) -> ast.AST | list[ast.AST]:
+        for index, rewrite in self.rewriters.get(type(node), ()):
+            if index < start:
+                continue
+            if index == self.last:
+                return rewrite(node)
+            # Held by reference so ids cannot be reused by nodes the rewrite allocates.
+            done = {id(child): child for child in ast.iter_child_nodes(node)}
+            result = rewrite(node)
+            # Whatever the rewrite built is handed to the later passes, skipping the
+            # subtrees that were already done.
+            if isinstance(result, list):
+                out: list[ast.AST] = []
+                for item in result:
+                    value = self._walk(item, index + 1, done)
+                    if isinstance(value, list):
+                        out.extend(value)
+                    else:
+                        out.append(value)
+                return out
+            return self._walk(result, index + 1, done)
+        return node
+
+
+class ImportObfuscator(StatementTransformer):
+    EXPLICIT_METHODS = {
+        "importlib": "importlib_import_module",
+        "builtins": "builtins_import",
+        "dunder": "dunder_import_module",
+    }
 
-class ImportObfuscator(ast.NodeTransformer):
     def __init__(
         self,
         rng: random.Random,
         mode: str,
         rate: float,
         methods: tuple[str, ...],
-        used_names: set[str],
+        generator: NameGenerator,
     ) -> None:
         self.rng = rng
         self.mode = mode
         self.rate = max(0.0, min(1.0, rate))
+        self.gate = RateGate(rng, self.rate)
         self.methods = methods
-        self.generator = NameGenerator(used_names, rng)
+        self.explicit = self.EXPLICIT_METHODS.get(mode)
+        self.generator = generator
         self.changed = 0
         self.class_depth = 0
 
@@ -2127,13 +2722,8 @@ class ImportObfuscator(ast.NodeTransformer):
         return node
 
     def _pick_method(self) -> str:
-        explicit_map = {
-            "importlib": "importlib_import_module",
-            "builtins": "builtins_import",
-            "dunder": "dunder_import_module",
-        }
-        if self.mode in explicit_map:
-            return explicit_map[self.mode]
+        if self.explicit is not None:
+            return self.explicit
         if self.methods:
             return self.rng.choice(self.methods)
         return "importlib_import_module"
@@ -2143,36 +2733,36 @@ class ImportObfuscator(ast.NodeTransformer):
         module_expr = build_text_expr(module_name, self.rng)
         if method == "builtins_import":
             return ast.Call(
-                func=ast.Name(id="__import__", ctx=ast.Load()),
+                func=_name_load("__import__"),
                 args=[
                     module_expr,
-                    ast.Call(func=ast.Name(id="globals", ctx=ast.Load()), args=[], keywords=[]),
-                    ast.Call(func=ast.Name(id="locals", ctx=ast.Load()), args=[], keywords=[]),
-                    ast.Tuple(elts=[ast.Constant("_")], ctx=ast.Load()),
+                    ast.Call(func=_name_load("globals"), args=[], keywords=[]),
+                    ast.Call(func=_name_load("locals"), args=[], keywords=[]),
+                    ast.Tuple(elts=[ast.Constant("_")], ctx=_LOAD),
                     ast.Constant(0),
                 ],
                 keywords=[],
             )
         importlib_mod = ast.Call(
-            func=ast.Name(id="__import__", ctx=ast.Load()),
+            func=_name_load("__import__"),
             args=[ast.Constant("importlib")],
             keywords=[],
         )
         if method == "dunder_import_module":
             importer: ast.expr = ast.Call(
-                func=ast.Name(id="getattr", ctx=ast.Load()),
+                func=_name_load("getattr"),
                 args=[importlib_mod, build_text_expr("import_module", self.rng)],
                 keywords=[],
             )
             return ast.Call(func=importer, args=[module_expr], keywords=[])
         return ast.Call(
-            func=ast.Attribute(value=importlib_mod, attr="import_module", ctx=ast.Load()),
+            func=ast.Attribute(value=importlib_mod, attr="import_module", ctx=_LOAD),
             args=[module_expr],
             keywords=[],
         )
 
     def visit_Import(self, node: ast.Import) -> ast.AST:
-        if self.class_depth > 0 or self.rng.random() > self.rate:
+        if self.class_depth > 0 or not self.gate():
             return node
         passthrough: list[ast.alias] = []
         out: list[ast.stmt] = []
@@ -2183,19 +2773,19 @@ class ImportObfuscator(ast.NodeTransformer):
                 continue
             bind_name = alias.asname or alias.name.split(".")[0]
             assign = ast.Assign(
-                targets=[ast.Name(id=bind_name, ctx=ast.Store())],
+                targets=[ast.Name(id=bind_name, ctx=_STORE)],
                 value=self._import_module_expr(alias.name),
             )
-            out.append(ast.copy_location(assign, node))
+            out.append(_cl(assign, node))
             self.changed += 1
         if passthrough:
-            out.insert(0, ast.copy_location(ast.Import(names=passthrough), node))
+            out.insert(0, _cl(ast.Import(names=passthrough), node))
         if not out:
             return node
         return out
 
     def visit_ImportFrom(self, node: ast.ImportFrom) -> ast.AST:
-        if self.class_depth > 0 or self.rng.random() > self.rate:
+        if self.class_depth > 0 or not self.gate():
             return node
         if node.level != 0 or node.module is None:
             return node
@@ -2206,29 +2796,33 @@ class ImportObfuscator(ast.NodeTransformer):
 
         module_ref = self.generator.next_name()
         module_assign = ast.Assign(
-            targets=[ast.Name(id=module_ref, ctx=ast.Store())],
+            targets=[ast.Name(id=module_ref, ctx=_STORE)],
             value=self._import_module_expr(node.module),
         )
-        out: list[ast.stmt] = [ast.copy_location(module_assign, node)]
+        out: list[ast.stmt] = [_cl(module_assign, node)]
         for alias in node.names:
             bind_name = alias.asname or alias.name
             attr_expr = ast.Call(
-                func=ast.Name(id="getattr", ctx=ast.Load()),
-                args=[ast.Name(id=module_ref, ctx=ast.Load()), build_text_expr(alias.name, self.rng)],
+                func=_name_load("getattr"),
+                args=[_name_load(module_ref), build_text_expr(alias.name, self.rng)],
                 keywords=[],
             )
-            assign = ast.Assign(targets=[ast.Name(id=bind_name, ctx=ast.Store())], value=attr_expr)
-            out.append(ast.copy_location(assign, node))
+            assign = ast.Assign(targets=[ast.Name(id=bind_name, ctx=_STORE)], value=attr_expr)
+            out.append(_cl(assign, node))
             self.changed += 1
         return out
 
 
-class ConditionObfuscator(ast.NodeTransformer):
+class ConditionObfuscator(DispatchTransformer):
     def __init__(self, rng: random.Random, mode: str, rate: float, branch_rate: float) -> None:
         self.rng = rng
         self.mode = mode
         self.rate = max(0.0, min(1.0, rate))
+        self.gate = RateGate(rng, self.rate)
         self.branch_rate = max(0.0, min(1.0, branch_rate))
+        self.branch_gate = RateGate(rng, self.branch_rate)
+        # Dead branches draw from a derived buffered stream, as in FlowObfuscator.
+        self.dead_rng = BufferedRandom(rng.getrandbits(64))
         self.changed = 0
         self.branch_extended = 0
 
@@ -2240,11 +2834,11 @@ class ConditionObfuscator(ast.NodeTransformer):
     def _encode_test(self, test: ast.expr) -> ast.expr:
         mode = self._pick_mode()
         if mode == "double_not":
-            return ast.UnaryOp(op=ast.Not(), operand=ast.UnaryOp(op=ast.Not(), operand=test))
+            return ast.UnaryOp(op=_NOT, operand=ast.UnaryOp(op=_NOT, operand=test))
         if mode == "ifexp":
             return ast.Compare(
                 left=ast.IfExp(test=test, body=ast.Constant(1), orelse=ast.Constant(0)),
-                ops=[ast.Eq()],
+                ops=[_EQ],
                 comparators=[ast.Constant(1)],
             )
         if mode == "lambda_call":
@@ -2258,8 +2852,8 @@ class ConditionObfuscator(ast.NodeTransformer):
                         defaults=[],
                     ),
                     body=ast.Call(
-                        func=ast.Name(id="bool", ctx=ast.Load()),
-                        args=[ast.Name(id="_v", ctx=ast.Load())],
+                        func=_name_load("bool"),
+                        args=[_name_load("_v")],
                         keywords=[],
                     ),
                 ),
@@ -2268,19 +2862,23 @@ class ConditionObfuscator(ast.NodeTransformer):
             )
         if mode == "tuple_pick":
             return ast.Subscript(
-                value=ast.Tuple(elts=[ast.Constant(False), ast.Constant(True)], ctx=ast.Load()),
+                value=ast.Tuple(elts=[ast.Constant(False), ast.Constant(True)], ctx=_LOAD),
                 slice=ast.IfExp(test=test, body=ast.Constant(1), orelse=ast.Constant(0)),
-                ctx=ast.Load(),
+                ctx=_LOAD,
             )
-        return ast.Call(func=ast.Name(id="bool", ctx=ast.Load()), args=[test], keywords=[])
+        return ast.Call(func=_name_load("bool"), args=[test], keywords=[])
 
     def _maybe_encode(self, test: ast.expr) -> ast.expr:
-        if self.rng.random() > self.rate:
+        if not self.gate():
             return test
         self.changed += 1
         return self._encode_test(test)
 
     def _looks_like_injected_dead_if(self, node: ast.If) -> bool:
+        # Generated dead ifs are tagged when built (the tag is not an AST field, so
+        # unparse and dump ignore it); the structural match covers untagged ones.
+        if getattr(node, "_obf_dead", False):
+            return True
         return (
             bool(node.body)
             and all(isinstance(stmt, ast.Expr) for stmt in node.body)
@@ -2288,15 +2886,16 @@ class ConditionObfuscator(ast.NodeTransformer):
         )
 
     def _extend_branch(self, node: ast.If) -> None:
-        if self.rng.random() > self.branch_rate:
+        if not self.branch_gate():
             return
         if node.orelse and isinstance(node.orelse[0], ast.If) and self._looks_like_injected_dead_if(node.orelse[0]):
             return
         dead = ast.If(
-            test=build_always_false_test(self.rng),
-            body=build_dead_noop_body(self.rng),
+            test=build_always_false_test(self.dead_rng),
+            body=build_dead_noop_body(self.dead_rng),
             orelse=node.orelse,
         )
+        dead._obf_dead = True
         node.orelse = [dead]
         self.branch_extended += 1
 
@@ -2322,12 +2921,13 @@ class ConditionObfuscator(ast.NodeTransformer):
         return node
 
 
-class LoopEncoder(ast.NodeTransformer):
-    def __init__(self, rng: random.Random, mode: str, rate: float, used_names: set[str]) -> None:
+class LoopEncoder(StatementTransformer):
+    def __init__(self, rng: random.Random, mode: str, rate: float, generator: NameGenerator) -> None:
         self.rng = rng
         self.mode = mode
         self.rate = max(0.0, min(1.0, rate))
-        self.generator = NameGenerator(used_names, rng)
+        self.gate = RateGate(rng, self.rate)
+        self.generator = generator
         self.changed = 0
 
     def _use_guard_mode(self) -> bool:
@@ -2351,7 +2951,7 @@ class LoopEncoder(ast.NodeTransformer):
 
     def visit_While(self, node: ast.While) -> ast.AST:
         self.generic_visit(node)
-        if self.rng.random() > self.rate:
+        if not self.gate():
             return node
         if not self._use_guard_mode():
             return node
@@ -2361,18 +2961,18 @@ class LoopEncoder(ast.NodeTransformer):
             return node
 
         guard = ast.If(
-            test=ast.UnaryOp(op=ast.Not(), operand=node.test),
+            test=ast.UnaryOp(op=_NOT, operand=node.test),
             body=[ast.Break()],
             orelse=[],
         )
         node.test = ast.Constant(True)
-        node.body = [guard, *node.body]
+        node.body.insert(0, guard)
         self.changed += 1
         return node
 
     def visit_For(self, node: ast.For) -> ast.AST:
         self.generic_visit(node)
-        if self.rng.random() > self.rate:
+        if not self.gate():
             return node
         if self._use_guard_mode():
             return node
@@ -2384,33 +2984,33 @@ class LoopEncoder(ast.NodeTransformer):
         value_name = self.generator.next_name()
 
         sentinel_assign = ast.Assign(
-            targets=[ast.Name(id=sentinel_name, ctx=ast.Store())],
-            value=ast.Call(func=ast.Name(id="object", ctx=ast.Load()), args=[], keywords=[]),
+            targets=[ast.Name(id=sentinel_name, ctx=_STORE)],
+            value=ast.Call(func=_name_load("object"), args=[], keywords=[]),
         )
         iter_assign = ast.Assign(
-            targets=[ast.Name(id=iter_name, ctx=ast.Store())],
-            value=ast.Call(func=ast.Name(id="iter", ctx=ast.Load()), args=[node.iter], keywords=[]),
+            targets=[ast.Name(id=iter_name, ctx=_STORE)],
+            value=ast.Call(func=_name_load("iter"), args=[node.iter], keywords=[]),
         )
         pull_assign = ast.Assign(
-            targets=[ast.Name(id=value_name, ctx=ast.Store())],
+            targets=[ast.Name(id=value_name, ctx=_STORE)],
             value=ast.Call(
-                func=ast.Name(id="next", ctx=ast.Load()),
-                args=[ast.Name(id=iter_name, ctx=ast.Load()), ast.Name(id=sentinel_name, ctx=ast.Load())],
+                func=_name_load("next"),
+                args=[_name_load(iter_name), _name_load(sentinel_name)],
                 keywords=[],
             ),
         )
         stop_if = ast.If(
             test=ast.Compare(
-                left=ast.Name(id=value_name, ctx=ast.Load()),
-                ops=[ast.Is()],
-                comparators=[ast.Name(id=sentinel_name, ctx=ast.Load())],
+                left=_name_load(value_name),
+                ops=[_IS],
+                comparators=[_name_load(sentinel_name)],
             ),
             body=[ast.Break()],
             orelse=[],
         )
         assign_target = ast.Assign(
-            targets=[copy.deepcopy(node.target)],
-            value=ast.Name(id=value_name, ctx=ast.Load()),
+            targets=[_clone(node.target)],
+            value=_name_load(value_name),
         )
         while_node = ast.While(
             test=ast.Constant(True),
@@ -2419,16 +3019,24 @@ class LoopEncoder(ast.NodeTransformer):
         )
         self.changed += 1
         return [
-            ast.copy_location(sentinel_assign, node),
-            ast.copy_location(iter_assign, node),
-            ast.copy_location(while_node, node),
+            _cl(sentinel_assign, node),
+            _cl(iter_assign, node),
+            _cl(while_node, node),
         ]
 
 
-def parse_args() -> argparse.Namespace:
+@functools.cache
+def _build_parser() -> argparse.ArgumentParser:
+    # Built once per process; drivers calling main() for many files reuse it.
     parser = argparse.ArgumentParser(description="AST-based Python obfuscator")
-    parser.add_argument("input", type=Path, help="Input .py file")
-    parser.add_argument("-o", "--output", type=Path, required=True, help="Output .py file")
+    parser.add_argument("input", type=Path, nargs="+", help="Input .py file(s)")
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        required=True,
+        help="Output .py file (output directory when several inputs are given)",
+    )
     parser.add_argument("--level", type=int, choices=(1, 2, 3, 4, 5), default=2)
     parser.add_argument(
         "--profile",
@@ -2578,6 +3186,15 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--flow-count", type=int, default=1, help="Max dead blocks per function per pass")
     parser.add_argument("--string-chunk-min", type=int, default=1, help="Minimum string chunk size")
     parser.add_argument("--string-chunk-max", type=int, default=6, help="Maximum string chunk size")
+    parser.add_argument(
+        "--dedup",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help=(
+            "Reuse one encoding for repeated short string literals (identical literals share ciphertext; "
+            "from the second occurrence on they read a shared module-level name)"
+        ),
+    )
     parser.add_argument("--string-helpers", type=int, default=1, help="Number of string decode helpers to emit")
     parser.add_argument("--call-helpers", type=int, default=1, help="Number of call wrapper helpers to emit")
     parser.add_argument(
@@ -2643,8 +3260,26 @@ def parse_args() -> argparse.Namespace:
         default=1,
         help="Parallel worker threads for selected heavy stages (>=1)",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=0,
+        help="Worker processes when obfuscating several files (0 = CPU count, 1 = serial)",
+    )
     parser.add_argument("--emit-map", type=Path, default=None, help="Write rename map as JSON")
     parser.add_argument("--emit-meta", type=Path, default=None, help="Write obfumeta JSON metadata")
+    parser.add_argument(
+        "--cache",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Reuse output for unchanged source+config (requires --seed)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=Path.home() / ".cache" / "ast_obfuscator",
+        help="Output cache directory used with --cache",
+    )
     parser.add_argument(
         "--meta-include-source",
         action=argparse.BooleanOptionalAction,
@@ -2680,8 +3315,11 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--force", action="store_true", help="Ignore hash mismatches during deobfuscation")
     parser.add_argument("--check", action="store_true", help="Compile output after generation")
     parser.add_argument("--explain", action="store_true", help="Print resolved config details")
+    return parser
 
-    return parser.parse_args()
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    return _build_parser().parse_args(argv)
 
 
 def default_features(level: int) -> dict[str, int | bool]:
@@ -2921,31 +3559,38 @@ def profile_defaults(profile: str) -> dict[str, int | bool | float | str]:
     return profiles[profile]
 
 
-def parse_dynamic_tokens(raw: str) -> list[tuple[str | None, str]]:
-    tokens = [part.strip() for part in raw.split(",") if part.strip()]
+@functools.cache
+def parse_dynamic_tokens(raw: str) -> tuple[tuple[str | None, str], ...]:
+    # Cached: batch runs resolve the same --dynamic-allow/--dynamic-deny strings per file.
     parsed: list[tuple[str | None, str]] = []
-    for token in tokens:
+    for part in raw.split(","):
+        token = part.strip()
+        if not token:
+            continue
         if ":" in token:
             family, method = token.split(":", 1)
             parsed.append((family.strip(), method.strip()))
         else:
             parsed.append((None, token))
-    return parsed
+    return tuple(parsed)
 
 
 def apply_dynamic_overrides(
-    methods: dict[str, set[str]],
-    allow_tokens: list[tuple[str | None, str]],
-    deny_tokens: list[tuple[str | None, str]],
+    methods: dict[str, frozenset[str]],
+    allow_tokens: Iterable[tuple[str | None, str]],
+    deny_tokens: Iterable[tuple[str | None, str]],
 ) -> set[tuple[str, str]]:
+    available = AVAILABLE_METHODS
+
     def _resolve_targets(family: str | None, method: str) -> list[str]:
         if family is not None:
-            if family not in AVAILABLE_METHODS:
+            names = available.get(family)
+            if names is None:
                 raise ValueError(f"Unknown dynamic method family: {family}")
-            if method not in AVAILABLE_METHODS[family]:
+            if method not in names:
                 raise ValueError(f"Unknown dynamic method {family}:{method}")
             return [family]
-        targets = [fam for fam, names in AVAILABLE_METHODS.items() if method in names]
+        targets = [fam for fam, names in available.items() if method in names]
         if not targets:
             raise ValueError(f"Unknown dynamic method: {method}")
         return targets
@@ -2953,15 +3598,15 @@ def apply_dynamic_overrides(
     explicit_allow: set[tuple[str, str]] = set()
     for family, method in allow_tokens:
         for fam in _resolve_targets(family, method):
-            methods[fam].add(method)
+            methods[fam] = methods[fam] | {method}
             explicit_allow.add((fam, method))
     for family, method in deny_tokens:
         for fam in _resolve_targets(family, method):
-            methods[fam].discard(method)
+            methods[fam] = methods[fam] - {method}
     return explicit_allow
 
 
-def sanitize_dynamic_methods(methods: dict[str, set[str]]) -> dict[str, tuple[str, ...]]:
+def sanitize_dynamic_methods(methods: dict[str, frozenset[str]]) -> dict[str, tuple[str, ...]]:
     out: dict[str, tuple[str, ...]] = {}
     for family in METHOD_FAMILIES:
         names = [name for name in AVAILABLE_METHODS[family] if name in methods[family]]
@@ -2971,7 +3616,7 @@ def sanitize_dynamic_methods(methods: dict[str, set[str]]) -> dict[str, tuple[st
     return out
 
 
-def apply_explicit_method_mode(config_methods: dict[str, set[str]], args: argparse.Namespace) -> None:
+def apply_explicit_method_mode(config_methods: dict[str, frozenset[str]], args: argparse.Namespace) -> None:
     attr_map = {
         "getattr": ("getattr",),
         "builtins": ("builtins_getattr",),
@@ -2979,7 +3624,7 @@ def apply_explicit_method_mode(config_methods: dict[str, set[str]], args: argpar
         "lambda": ("lambda_getattr",),
     }
     if args.attr_mode in attr_map:
-        config_methods["attr"] = set(attr_map[args.attr_mode])
+        config_methods["attr"] = frozenset(attr_map[args.attr_mode])
 
     setattr_map = {
         "setattr": ("setattr", "delattr"),
@@ -2987,7 +3632,7 @@ def apply_explicit_method_mode(config_methods: dict[str, set[str]], args: argpar
         "lambda": ("lambda_setattr", "lambda_delattr"),
     }
     if args.setattr_mode in setattr_map:
-        config_methods["setattr"] = set(setattr_map[args.setattr_mode])
+        config_methods["setattr"] = frozenset(setattr_map[args.setattr_mode])
 
     call_map = {
         "wrap": ("helper_wrap",),
@@ -2997,7 +3642,7 @@ def apply_explicit_method_mode(config_methods: dict[str, set[str]], args: argpar
         "eval": ("builtins_eval_call",),
     }
     if args.call_mode in call_map:
-        config_methods["call"] = set(call_map[args.call_mode])
+        config_methods["call"] = frozenset(call_map[args.call_mode])
 
     builtin_map = {
         "alias": ("alias",),
@@ -3005,7 +3650,7 @@ def apply_explicit_method_mode(config_methods: dict[str, set[str]], args: argpar
         "globals": ("globals_lookup",),
     }
     if args.builtin_mode in builtin_map:
-        config_methods["builtin"] = set(builtin_map[args.builtin_mode])
+        config_methods["builtin"] = frozenset(builtin_map[args.builtin_mode])
 
     import_map = {
         "importlib": ("importlib_import_module",),
@@ -3013,9 +3658,10 @@ def apply_explicit_method_mode(config_methods: dict[str, set[str]], args: argpar
         "dunder": ("dunder_import_module",),
     }
     if args.import_mode in import_map:
-        config_methods["import"] = set(import_map[args.import_mode])
+        config_methods["import"] = frozenset(import_map[args.import_mode])
 
 
+@functools.cache
 def parse_transform_order(raw: str) -> tuple[str, ...]:
     parsed = tuple(part.strip() for part in raw.split(",") if part.strip())
     if not parsed:
@@ -3039,46 +3685,43 @@ def parse_redirect_kinds(raw: str) -> set[str]:
     return parts
 
 
-def resolve_config(args: argparse.Namespace) -> ObfuscationConfig:
+def resolve_config(args: argparse.Namespace, argv: list[str] | None = None) -> ObfuscationConfig:
+    if argv is None:
+        argv = sys.argv[1:]
+    # Long options given on the command line, "--flag=value" spelling included.
+    explicit = {arg.partition("=")[0] for arg in argv if arg.startswith("--")}
     base = default_features(args.level)
     prof = profile_defaults(args.profile)
-
-    passes_default = int(prof.get("passes", base["passes"]))
-    junk_default = int(prof.get("junk", base["junk"]))
-    wrap_default = bool(prof.get("wrap", base["wrap"]))
-
-    passes = passes_default if args.passes <= 0 else args.passes
-    junk = junk_default if args.junk < 0 else args.junk
-
-    rename = bool(prof.get("rename", base["rename"]) if args.rename is None else args.rename)
-    strings = bool(prof.get("strings", base["strings"]) if args.strings is None else args.strings)
-    ints = bool(prof.get("ints", base["ints"]) if args.ints is None else args.ints)
-    floats = bool(prof.get("floats", base["floats"]) if args.floats is None else args.floats)
-    bytes_ = bool(prof.get("bytes_", base["bytes_"]) if args.bytes_ is None else args.bytes_)
-    none_values = bool(
-        prof.get("none_values", base["none_values"]) if args.none_values is None else args.none_values
-    )
-    bools = bool(prof.get("bools", base["bools"]) if args.bools is None else args.bools)
-    flow = bool(prof.get("flow", base["flow"]) if args.flow is None else args.flow)
-    imports = bool(prof.get("imports", base["imports"]) if args.imports is None else args.imports)
-    conditions = bool(
-        prof.get("conditions", base["conditions"]) if args.conditions is None else args.conditions
-    )
-    loops = bool(prof.get("loops", base["loops"]) if args.loops is None else args.loops)
-    attrs = bool(prof.get("attrs", base["attrs"]) if args.attrs is None else args.attrs)
-    setattrs = bool(prof.get("setattrs", base["setattrs"]) if args.setattrs is None else args.setattrs)
-    calls = bool(prof.get("calls", base["calls"]) if args.calls is None else args.calls)
-    builtins_rename = bool(
-        prof.get("builtins", base["builtins"]) if args.builtins is None else args.builtins
-    )
-    wrap = bool(wrap_default if args.wrap is None else args.wrap)
+    # Profile values win over level defaults; explicit CLI toggles win over both.
+    merged = {**base, **prof}
+
+    def pick(key: str, value: bool | None) -> bool:
+        return bool(merged[key] if value is None else value)
+
+    passes = int(merged["passes"]) if args.passes <= 0 else args.passes
+    junk = int(merged["junk"]) if args.junk < 0 else args.junk
+
+    rename = pick("rename", args.rename)
+    strings = pick("strings", args.strings)
+    ints = pick("ints", args.ints)
+    floats = pick("floats", args.floats)
+    bytes_ = pick("bytes_", args.bytes_)
+    none_values = pick("none_values", args.none_values)
+    bools = pick("bools", args.bools)
+    flow = pick("flow", args.flow)
+    imports = pick("imports", args.imports)
+    conditions = pick("conditions", args.conditions)
+    loops = pick("loops", args.loops)
+    attrs = pick("attrs", args.attrs)
+    setattrs = pick("setattrs", args.setattrs)
+    calls = pick("calls", args.calls)
+    builtins_rename = pick("builtins", args.builtins)
+    wrap = pick("wrap", args.wrap)
     frontline_redirects = bool(
-        prof.get("frontline_redirects", base.get("frontline_redirects", False))
-        if args.frontline_redirects is None
-        else args.frontline_redirects
+        merged.get("frontline_redirects", False) if args.frontline_redirects is None else args.frontline_redirects
     )
     redirect_all = bool(args.redirect_all)
-    if "--redirect-all" not in sys.argv and "--no-redirect-all" not in sys.argv:
+    if "--redirect-all" not in explicit and "--no-redirect-all" not in explicit:
         redirect_all = bool(prof.get("redirect_all", redirect_all))
 
     preserve_names = {name.strip() for name in args.preserve.split(",") if name.strip()}
@@ -3123,43 +3766,43 @@ def resolve_config(args: argparse.Namespace) -> ObfuscationConfig:
     call_helpers = int(prof.get("call_helpers", args.call_helpers))
 
     # Explicit numeric CLI flags override profile defaults.
-    if "--import-rate" in sys.argv:
+    if "--import-rate" in explicit:
         import_rate = args.import_rate
-    if "--condition-rate" in sys.argv:
+    if "--condition-rate" in explicit:
         condition_rate = args.condition_rate
-    if "--branch-rate" in sys.argv:
+    if "--branch-rate" in explicit:
         branch_rate = args.branch_rate
-    if "--loop-rate" in sys.argv:
+    if "--loop-rate" in explicit:
         loop_rate = args.loop_rate
-    if "--attr-rate" in sys.argv:
+    if "--attr-rate" in explicit:
         attr_rate = args.attr_rate
-    if "--setattr-rate" in sys.argv:
+    if "--setattr-rate" in explicit:
         setattr_rate = args.setattr_rate
-    if "--call-rate" in sys.argv:
+    if "--call-rate" in explicit:
         call_rate = args.call_rate
-    if "--builtin-rate" in sys.argv:
+    if "--builtin-rate" in explicit:
         builtin_rate = args.builtin_rate
-    if "--flow-rate" in sys.argv:
+    if "--flow-rate" in explicit:
         flow_rate = args.flow_rate
-    if "--flow-count" in sys.argv:
+    if "--flow-count" in explicit:
         flow_count = args.flow_count
-    if "--redirect-rate" in sys.argv:
+    if "--redirect-rate" in explicit:
         redirect_rate = args.redirect_rate
-    if "--redirect-max" in sys.argv:
+    if "--redirect-max" in explicit:
         redirect_max = args.redirect_max
-    if "--redirect-kinds" in sys.argv:
+    if "--redirect-kinds" in explicit:
         redirect_kinds = parse_redirect_kinds(args.redirect_kinds)
-    if "--redirect-class-mode" in sys.argv:
+    if "--redirect-class-mode" in explicit:
         redirect_class_mode = args.redirect_class_mode
-    if "--redirect-function-mode" in sys.argv:
+    if "--redirect-function-mode" in explicit:
         redirect_function_mode = args.redirect_function_mode
-    if "--redirect-variable-mode" in sys.argv:
+    if "--redirect-variable-mode" in explicit:
         redirect_variable_mode = args.redirect_variable_mode
-    if "--string-helpers" in sys.argv:
+    if "--string-helpers" in explicit:
         string_helpers = args.string_helpers
-    if "--call-helpers" in sys.argv:
+    if "--call-helpers" in explicit:
         call_helpers = args.call_helpers
-    if "--dynamic-level" in sys.argv:
+    if "--dynamic-level" in explicit:
         dynamic_level = args.dynamic_level
 
     if import_rate < 0.0 or import_rate > 1.0:
@@ -3192,6 +3835,8 @@ def resolve_config(args: argparse.Namespace) -> ObfuscationConfig:
         raise ValueError("--call-helpers must be >= 1")
     if args.mt_workers <= 0:
         raise ValueError("--mt-workers must be >= 1")
+    if args.jobs < 0:
+        raise ValueError("--jobs must be >= 0")
     if args.string_chunk_min <= 0 or args.string_chunk_max <= 0:
         raise ValueError("--string chunk sizes must be >= 1")
     if args.string_chunk_min > args.string_chunk_max:
@@ -3209,17 +3854,15 @@ def resolve_config(args: argparse.Namespace) -> ObfuscationConfig:
     if dynamic_level not in DYNAMIC_LEVEL_DEFAULTS:
         raise ValueError(f"Unknown dynamic level: {dynamic_level}")
 
-    dynamic_methods: dict[str, set[str]] = {
-        family: set(DYNAMIC_LEVEL_DEFAULTS[dynamic_level][family]) for family in METHOD_FAMILIES
-    }
+    dynamic_methods = dict(DYNAMIC_LEVEL_DEFAULTS[dynamic_level])
     allow_tokens = parse_dynamic_tokens(args.dynamic_allow)
     deny_tokens = parse_dynamic_tokens(args.dynamic_deny)
     explicit_allow = apply_dynamic_overrides(dynamic_methods, allow_tokens, deny_tokens)
     # Risky methods are opt-in only through explicit allow tokens.
     for family, risky in RISKY_METHODS.items():
-        for method in list(dynamic_methods[family]):
-            if method in risky and (family, method) not in explicit_allow:
-                dynamic_methods[family].discard(method)
+        opt_out = {method for method in risky if (family, method) not in explicit_allow}
+        if not opt_out.isdisjoint(dynamic_methods[family]):
+            dynamic_methods[family] = dynamic_methods[family] - opt_out
     apply_explicit_method_mode(dynamic_methods, args)
     resolved_dynamic_methods = sanitize_dynamic_methods(dynamic_methods)
 
@@ -3280,6 +3923,7 @@ def resolve_config(args: argparse.Namespace) -> ObfuscationConfig:
         flow_count=flow_count,
         string_chunk_min=args.string_chunk_min,
         string_chunk_max=args.string_chunk_max,
+        string_dedup=args.dedup,
         string_helpers=string_helpers,
         call_helpers=call_helpers,
         transform_order=transform_order,
@@ -3292,6 +3936,7 @@ def resolve_config(args: argparse.Namespace) -> ObfuscationConfig:
         mt_workers=args.mt_workers,
         emit_map=args.emit_map,
         emit_meta=args.emit_meta,
+        cache_dir=(args.cache_dir if args.cache else None),
         meta_include_source=args.meta_include_source,
         meta_minimal=args.meta_minimal,
         meta_omit_rename_map=(args.meta_omit_rename_map or args.meta_minimal),
@@ -3302,82 +3947,119 @@ def resolve_config(args: argparse.Namespace) -> ObfuscationConfig:
     )
 
 
+class _IdentifierScan:
+    # One pass for the name facts the pipeline asks about: every identifier, and
+    # keyword-argument names at call sites.
+    __slots__ = ("ids", "keyword_args")
+
+    def __init__(self, tree: ast.AST) -> None:
+        ids: set[str] = set()
+        keyword_args: set[str] = set()
+        for node in _iter_nodes(tree):
+            kind = type(node)
+            if kind is ast.Name:
+                ids.add(node.id)
+            elif kind is ast.Call:
+                for kw in node.keywords:
+                    if isinstance(kw.arg, str) and kw.arg.isidentifier() and not keyword.iskeyword(kw.arg):
+                        keyword_args.add(kw.arg)
+            elif kind is ast.arg:
+                ids.add(node.arg)
+            elif kind is ast.FunctionDef or kind is ast.AsyncFunctionDef or kind is ast.ClassDef:
+                ids.add(node.name)
+        self.ids = ids
+        self.keyword_args = keyword_args
+
+
 def collect_identifiers(tree: ast.AST) -> set[str]:
-    ids: set[str] = set()
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Name):
-            ids.add(node.id)
-        elif isinstance(node, ast.FunctionDef):
-            ids.add(node.name)
-        elif isinstance(node, ast.AsyncFunctionDef):
-            ids.add(node.name)
-        elif isinstance(node, ast.ClassDef):
-            ids.add(node.name)
-        elif isinstance(node, ast.arg):
-            ids.add(node.arg)
-    return ids
-
-
-def collect_bound_identifiers(tree: ast.AST) -> set[str]:
+    return _IdentifierScan(tree).ids
+
+
+def collect_transform_sites(tree: ast.AST) -> set[str]:
+    # Transforms with at least one target in the tree. Only input code holds attribute
+    # stores/deletes, function defs and float literals (no pass or template emits them),
+    # so a transform missing here has nothing to do in any pass.
+    found: set[str] = set()
+    for node in _iter_nodes(tree):
+        kind = type(node)
+        if kind is ast.FunctionDef or kind is ast.AsyncFunctionDef:
+            found.add("flow")
+        elif kind is ast.Assign:
+            if len(node.targets) == 1 and type(node.targets[0]) is ast.Attribute:
+                found.add("setattrs")
+        elif kind is ast.Delete:
+            if node.targets and all(type(target) is ast.Attribute for target in node.targets):
+                found.add("setattrs")
+        elif kind is ast.Constant:
+            if type(node.value) is float:
+                found.add("floats")
+        else:
+            continue
+        if len(found) == 3:
+            break
+    return found
+
+
+def collect_builtin_load_sites(
+    tree: ast.AST,
+    preserve_names: set[str],
+) -> tuple[list[str], list[tuple[ast.AST | list, str | int, ast.Name]]]:
+    # The builtins loaded but never bound or preserved (sorted), and every load of a
+    # builtin name as (container, field or index, node) in generic_visit order, so the
+    # aliasing pass can swap them in place instead of walking the tree again.
     bound: set[str] = set()
-    for node in ast.walk(tree):
-        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
-            bound.add(node.name)
-        elif isinstance(node, ast.arg):
+    sites: list[tuple[ast.AST | list, str | int, ast.Name]] = []
+    builtin_names = _BUILTIN_NAMES_NOT_DUNDER
+    child_fields = _CHILD_FIELDS
+    stack: list[tuple[ast.AST, ast.AST | list | None, str | int]] = [(tree, None, 0)]
+    while stack:
+        node, container, key = stack.pop()
+        kind = type(node)
+        if kind is ast.Name:
+            if type(node.ctx) is not ast.Load:
+                bound.add(node.id)
+            elif node.id in builtin_names:
+                assert container is not None
+                sites.append((container, key, node))
+            continue
+        if kind is ast.arg:
             bound.add(node.arg)
-        elif isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
-            bound.add(node.id)
-        elif isinstance(node, ast.ExceptHandler) and isinstance(node.name, str):
+        elif kind is ast.FunctionDef or kind is ast.AsyncFunctionDef or kind is ast.ClassDef:
             bound.add(node.name)
-        elif isinstance(node, ast.Import):
+        elif kind is ast.ExceptHandler:
+            if isinstance(node.name, str):
+                bound.add(node.name)
+        elif kind is ast.Import:
             for alias in node.names:
                 bound.add(alias.asname or alias.name.split(".")[0])
-        elif isinstance(node, ast.ImportFrom):
+        elif kind is ast.ImportFrom:
             for alias in node.names:
                 if alias.name != "*":
                     bound.add(alias.asname or alias.name)
-    return bound
-
-
-def collect_keyword_argument_names(tree: ast.AST) -> set[str]:
-    names: set[str] = set()
-    for node in ast.walk(tree):
-        if not isinstance(node, ast.Call):
-            continue
-        for kw in node.keywords:
-            if isinstance(kw.arg, str) and kw.arg.isidentifier() and not keyword.iskeyword(kw.arg):
-                names.add(kw.arg)
-    return names
-
-
-def collect_builtin_loads(tree: ast.AST, preserve_names: set[str]) -> list[str]:
-    bound_names = collect_bound_identifiers(tree) | preserve_names
-    found: set[str] = set()
-
-    class BuiltinLoadVisitor(ast.NodeVisitor):
-        def visit_Name(self, node: ast.Name) -> None:
-            if (
-                isinstance(node.ctx, ast.Load)
-                and node.id in BUILTIN_NAMES
-                and node.id not in bound_names
-                and not (node.id.startswith("__") and node.id.endswith("__"))
-            ):
-                found.add(node.id)
-
-    BuiltinLoadVisitor().visit(tree)
-    return sorted(found)
+        children: list[tuple[ast.AST, ast.AST | list, str | int]] = []
+        for field in child_fields.get(kind, ()):
+            value = getattr(node, field, None)
+            if type(value) is list:
+                children.extend(
+                    (item, value, index) for index, item in enumerate(value) if isinstance(item, ast.AST) and item._fields
+                )
+            elif isinstance(value, ast.AST) and value._fields:
+                children.append((value, node, field))
+        children.reverse()
+        stack.extend(children)
+    found = {site[2].id for site in sites}
+    found -= bound
+    found -= preserve_names
+    return sorted(found), sites
 
 
 def _is_redirectable_symbol(name: str, preserve_names: set[str]) -> bool:
-    if (
+    return not (
         not name
         or name in preserve_names
-        or keyword.iskeyword(name)
-        or name in BUILTIN_NAMES
-        or (name.startswith("__") and name.endswith("__"))
-    ):
-        return False
-    return True
+        or name in _RESERVED
+        or name[:2] == "__" == name[-2:]
+    )
 
 
 def collect_frontline_redirect_candidates(
@@ -3425,7 +4107,7 @@ def pick_redirect_mode(kind: str, config: ObfuscationConfig, rng: random.Random)
 def build_redirect_resolver(alias_name: str, target_name: str, mode: str, rng: random.Random) -> ast.Assign:
     globals_name = random_local_identifier(rng)
     name_name = random_local_identifier(rng)
-    globals_call = ast.Call(func=ast.Name(id=globals_name, ctx=ast.Load()), args=[], keywords=[])
+    globals_call = ast.Call(func=_name_load(globals_name), args=[], keywords=[])
     target_name_expr = build_text_expr(target_name, rng)
 
     if mode == "itemgetter":
@@ -3433,12 +4115,12 @@ def build_redirect_resolver(alias_name: str, target_name: str, mode: str, rng: r
             func=ast.Call(
                 func=ast.Attribute(
                     value=ast.Call(
-                        func=ast.Name(id="__import__", ctx=ast.Load()),
+                        func=_name_load("__import__"),
                         args=[build_text_expr("operator", rng)],
                         keywords=[],
                     ),
                     attr="itemgetter",
-                    ctx=ast.Load(),
+                    ctx=_LOAD,
                 ),
                 args=[target_name_expr],
                 keywords=[],
@@ -3448,7 +4130,7 @@ def build_redirect_resolver(alias_name: str, target_name: str, mode: str, rng: r
         )
     elif mode == "dict_get":
         resolver_body = ast.Call(
-            func=ast.Attribute(value=globals_call, attr="get", ctx=ast.Load()),
+            func=ast.Attribute(value=globals_call, attr="get", ctx=_LOAD),
             args=[target_name_expr],
             keywords=[],
         )
@@ -3456,11 +4138,11 @@ def build_redirect_resolver(alias_name: str, target_name: str, mode: str, rng: r
         resolver_body = ast.Subscript(
             value=globals_call,
             slice=target_name_expr,
-            ctx=ast.Load(),
+            ctx=_LOAD,
         )
     else:
         resolver_body = ast.Call(
-            func=ast.Attribute(value=globals_call, attr="get", ctx=ast.Load()),
+            func=ast.Attribute(value=globals_call, attr="get", ctx=_LOAD),
             args=[target_name_expr],
             keywords=[],
         )
@@ -3485,14 +4167,14 @@ def build_redirect_resolver(alias_name: str, target_name: str, mode: str, rng: r
                 body=ast.Call(
                     func=ast.Attribute(
                         value=ast.Call(
-                            func=ast.Name(id=globals_name, ctx=ast.Load()),
+                            func=_name_load(globals_name),
                             args=[],
                             keywords=[],
                         ),
                         attr="get",
-                        ctx=ast.Load(),
+                        ctx=_LOAD,
                     ),
-                    args=[ast.Name(id=name_name, ctx=ast.Load())],
+                    args=[_name_load(name_name)],
                     keywords=[],
                 ),
             ),
@@ -3518,11 +4200,11 @@ def build_redirect_resolver(alias_name: str, target_name: str, mode: str, rng: r
             ),
         )
 
-    helper_args: list[ast.expr] = [ast.Name(id="globals", ctx=ast.Load())]
+    helper_args: list[ast.expr] = [_name_load("globals")]
     if mode == "lambda":
         helper_args.append(build_text_expr(target_name, rng))
     return ast.Assign(
-        targets=[ast.Name(id=alias_name, ctx=ast.Store())],
+        targets=[ast.Name(id=alias_name, ctx=_STORE)],
         value=ast.Call(
             func=helper_factory,
             args=helper_args,
@@ -3592,7 +4274,7 @@ def collect_function_blocked_names(node: ast.AST) -> set[str]:
     return blocked
 
 
-class GlobalNameRedirector(ast.NodeTransformer):
+class GlobalNameRedirector(DispatchTransformer):
     def __init__(self, redirect_map: dict[str, str]) -> None:
         self.redirect_map = redirect_map
         self.scope_blocked_stack: list[set[str]] = [set()]
@@ -3609,9 +4291,9 @@ class GlobalNameRedirector(ast.NodeTransformer):
             and node.id in self.redirect_map
             and not self._is_blocked(node.id)
         ):
-            return ast.copy_location(
+            return _cl(
                 ast.Call(
-                    func=ast.Name(id=self.redirect_map[node.id], ctx=ast.Load()),
+                    func=_name_load(self.redirect_map[node.id]),
                     args=[],
                     keywords=[],
                 ),
@@ -3619,23 +4301,21 @@ class GlobalNameRedirector(ast.NodeTransformer):
             )
         return node
 
+    def _visit_in_place(self, items: list[ast.AST]) -> None:
+        for idx, item in enumerate(items):
+            items[idx] = self.visit(item)
+
     def visit_FunctionDef(self, node: ast.FunctionDef) -> ast.AST:
-        node.decorator_list = [self.visit(dec) for dec in node.decorator_list]
+        self._visit_in_place(node.decorator_list)
         if node.returns:
             node.returns = self.visit(node.returns)
         self.scope_blocked_stack.append(collect_function_blocked_names(node))
-        node.body = [self.visit(stmt) for stmt in node.body]
+        self._visit_in_place(node.body)
         self.scope_blocked_stack.pop()
         return node
 
     def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> ast.AST:
-        node.decorator_list = [self.visit(dec) for dec in node.decorator_list]
-        if node.returns:
-            node.returns = self.visit(node.returns)
-        self.scope_blocked_stack.append(collect_function_blocked_names(node))
-        node.body = [self.visit(stmt) for stmt in node.body]
-        self.scope_blocked_stack.pop()
-        return node
+        return self.visit_FunctionDef(node)
 
     def visit_Lambda(self, node: ast.Lambda) -> ast.AST:
         self.scope_blocked_stack.append(collect_function_blocked_names(node))
@@ -3644,16 +4324,13 @@ class GlobalNameRedirector(ast.NodeTransformer):
         return node
 
     def visit_ClassDef(self, node: ast.ClassDef) -> ast.AST:
-        node.bases = [self.visit(base) for base in node.bases]
-        node.keywords = [self.visit(kw) for kw in node.keywords]
-        node.decorator_list = [self.visit(dec) for dec in node.decorator_list]
-        new_body: list[ast.stmt] = []
-        for stmt in node.body:
+        self._visit_in_place(node.bases)
+        self._visit_in_place(node.keywords)
+        self._visit_in_place(node.decorator_list)
+        body = node.body
+        for idx, stmt in enumerate(body):
             if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
-                new_body.append(self.visit(stmt))
-            else:
-                new_body.append(stmt)
-        node.body = new_body
+                body[idx] = self.visit(stmt)
         return node
 
 
@@ -3661,6 +4338,7 @@ def apply_frontline_redirects(
     tree: ast.AST,
     config: ObfuscationConfig,
     rng: random.Random,
+    generator: NameGenerator,
 ) -> tuple[ast.AST, int]:
     if not config.frontline_redirects or not isinstance(tree, ast.Module):
         return tree, 0
@@ -3680,7 +4358,6 @@ def apply_frontline_redirects(
     if not selected:
         return tree, 0
 
-    generator = NameGenerator(collect_identifiers(tree) | config.preserve_names, rng)
     redirect_map = {name: generator.next_name() for name, _, _ in selected}
     redirector = GlobalNameRedirector(redirect_map)
     tree = redirector.visit(tree)
@@ -3688,9 +4365,13 @@ def apply_frontline_redirects(
 
     resolver_items = [(name, kind, redirect_map[name]) for name, kind, _ in selected]
     rng.shuffle(resolver_items)
+    resolvers: list[ast.stmt] = []
     for target_name, kind, alias_name in resolver_items:
         mode = pick_redirect_mode(kind, config, rng)
-        insert_after_docstring(tree, build_redirect_resolver(alias_name, target_name, mode, rng))
+        resolvers.append(build_redirect_resolver(alias_name, target_name, mode, rng))
+    # Built in draw order; each one used to be inserted above the previous one.
+    resolvers.reverse()
+    insert_block_after_docstring(tree, resolvers)
     return tree, len(redirect_map)
 
 
@@ -3710,6 +4391,43 @@ def build_mask_expr(value: int, rng: random.Random) -> str:
     return str(value)
 
 
+# Parsed once; build_string_helper only copies them and fills in the per-file names.
+# XOR chunks are undone as one big-int XOR against the key byte repeated over the
+# chunk, so the generated decoder never loops per byte in Python; the decoded bytes
+# are joined and decoded once.
+_STRING_HELPER_TEMPLATES = {
+    "dispatch": _stmt_template(
+        "def NAME(MODE, PAYLOAD):\n"
+        "    import base64\n"
+        "    SALT = MASK\n"
+        "    MODE_COPY = MODE\n"
+        "    PAYLOAD_COPY = PAYLOAD\n"
+        "    TABLE = {\n"
+        "        TAG_XOR: lambda _p: b\"\".join(\n"
+        "            (int(data, 16) ^ (key ^ SALT) * int(\"01\" * (len(data) >> 1), 16)).to_bytes(len(data) >> 1, \"big\")\n"
+        "            for key, data in zip(_p[::2], _p[1::2])\n"
+        "        ).decode(\"utf-8\", \"surrogatepass\"),\n"
+        "        TAG_B85: lambda _p: base64.b85decode(_p.encode(\"ascii\")).decode(\"utf-8\", \"surrogatepass\"),\n"
+        "        TAG_REVERSE: lambda _p: _p[::-1],\n"
+        "    }\n"
+        "    return TABLE.get(MODE_COPY, TABLE[TAG_REVERSE])(PAYLOAD_COPY)\n"
+    ),
+    "if_chain": _stmt_template(
+        "def NAME(MODE, PAYLOAD):\n"
+        "    SALT = MASK\n"
+        "    if MODE == TAG_XOR:\n"
+        "        return b\"\".join(\n"
+        "            (int(data, 16) ^ (key ^ SALT) * int(\"01\" * (len(data) >> 1), 16)).to_bytes(len(data) >> 1, \"big\")\n"
+        "            for key, data in zip(PAYLOAD[::2], PAYLOAD[1::2])\n"
+        "        ).decode(\"utf-8\", \"surrogatepass\")\n"
+        "    if MODE == TAG_B85:\n"
+        "        import base64\n"
+        "        return base64.b85decode(PAYLOAD.encode(\"ascii\")).decode(\"utf-8\", \"surrogatepass\")\n"
+        "    return PAYLOAD[::-1]\n"
+    ),
+}
+
+
 def build_string_helper(
     name: str,
     mode_tags: dict[str, int],
@@ -3718,93 +4436,67 @@ def build_string_helper(
 ) -> ast.FunctionDef:
     mode_arg = random_local_identifier(rng)
     payload_arg = random_local_identifier(rng)
-    salt_name = random_local_identifier(rng)
-    salt_expr = build_mask_expr(value_salt, rng)
+    subs: dict[str, ast.AST | str | int] = {
+        "MODE": mode_arg,
+        "PAYLOAD": payload_arg,
+        "SALT": random_local_identifier(rng),
+        "MASK": ast.parse(build_mask_expr(value_salt, rng), mode="eval").body,
+        "TAG_XOR": mode_tags["xor"],
+        "TAG_B85": mode_tags["b85"],
+        "TAG_REVERSE": mode_tags["reverse"],
+    }
     variant = rng.choice(("if_chain", "dispatch"))
     if variant == "dispatch":
-        mode_copy = random_local_identifier(rng)
-        payload_copy = random_local_identifier(rng)
-        table_name = random_local_identifier(rng)
-        helper_source = (
-            f"def {name}({mode_arg}, {payload_arg}):\n"
-            "    import base64\n"
-            f"    {salt_name} = {salt_expr}\n"
-            f"    {mode_copy} = {mode_arg}\n"
-            f"    {payload_copy} = {payload_arg}\n"
-            f"    {table_name} = {{\n"
-            f"        {mode_tags['xor']}: lambda _p: \"\".join(\"\".join(chr(c ^ key ^ {salt_name}) for c in data) for key, data in _p),\n"
-            f"        {mode_tags['b85']}: lambda _p: base64.b85decode(_p.encode(\"ascii\")).decode(\"utf-8\"),\n"
-            f"        {mode_tags['reverse']}: lambda _p: _p[::-1],\n"
-            "    }\n"
-            f"    return {table_name}.get({mode_copy}, {table_name}[{mode_tags['reverse']}])({payload_copy})\n"
-        )
-    else:
-        helper_source = (
-            f"def {name}({mode_arg}, {payload_arg}):\n"
-            f"    {salt_name} = {salt_expr}\n"
-            f"    if {mode_arg} == {mode_tags['xor']}:\n"
-            f"        return \"\".join(\"\".join(chr(c ^ key ^ {salt_name}) for c in data) for key, data in payload)\n"
-            f"    if {mode_arg} == {mode_tags['b85']}:\n"
-            "        import base64\n"
-            f"        return base64.b85decode({payload_arg}.encode(\"ascii\")).decode(\"utf-8\")\n"
-            f"    return {payload_arg}[::-1]\n"
-        )
-    module = ast.parse(helper_source)
-    fn = module.body[0]
+        subs["MODE_COPY"] = random_local_identifier(rng)
+        subs["PAYLOAD_COPY"] = random_local_identifier(rng)
+        subs["TABLE"] = random_local_identifier(rng)
+    fn = _patch(_STRING_HELPER_TEMPLATES[variant], subs)
     assert isinstance(fn, ast.FunctionDef)
-    # Replace unbound payload identifier from source template if randomized.
-    class _PayloadFixer(ast.NodeTransformer):
-        def visit_Name(self, node: ast.Name) -> ast.AST:
-            if node.id == "payload":
-                return ast.copy_location(ast.Name(id=payload_arg, ctx=node.ctx), node)
-            return node
-
-    fn = _PayloadFixer().visit(fn)
-    ast.fix_missing_locations(fn)
+    fn.name = name
+    fn.args.args[0].arg = mode_arg
+    fn.args.args[1].arg = payload_arg
     return fn
 
 
+_CALL_HELPER_TEMPLATES = {
+    "direct": _stmt_template("def NAME(F, A, K):\n    return F(*A, **K)\n"),
+    "lambda": _stmt_template("def NAME(F, A, K):\n    return (lambda _f, _a, _k: _f(*_a, **_k))(F, A, K)\n"),
+    "staged": _stmt_template(
+        "def NAME(F, A, K):\n"
+        "    COPY_F = F\n"
+        "    COPY_A = A\n"
+        "    COPY_K = K\n"
+        "    return COPY_F(*COPY_A, **COPY_K)\n"
+    ),
+}
+
+
 def build_call_helper(name: str, rng: random.Random) -> ast.FunctionDef:
-    fn_arg = random_local_identifier(rng)
-    args_arg = random_local_identifier(rng)
-    kwargs_arg = random_local_identifier(rng)
+    subs: dict[str, ast.AST | str | int] = {
+        "F": random_local_identifier(rng),
+        "A": random_local_identifier(rng),
+        "K": random_local_identifier(rng),
+    }
     variant = rng.choice(("direct", "lambda", "staged"))
-    if variant == "lambda":
-        helper_source = (
-            f"def {name}({fn_arg}, {args_arg}, {kwargs_arg}):\n"
-            f"    return (lambda _f, _a, _k: _f(*_a, **_k))({fn_arg}, {args_arg}, {kwargs_arg})\n"
-        )
-    elif variant == "staged":
-        copy_fn = random_local_identifier(rng)
-        copy_args = random_local_identifier(rng)
-        copy_kwargs = random_local_identifier(rng)
-        helper_source = (
-            f"def {name}({fn_arg}, {args_arg}, {kwargs_arg}):\n"
-            f"    {copy_fn} = {fn_arg}\n"
-            f"    {copy_args} = {args_arg}\n"
-            f"    {copy_kwargs} = {kwargs_arg}\n"
-            f"    return {copy_fn}(*{copy_args}, **{copy_kwargs})\n"
-        )
-    else:
-        helper_source = (
-            f"def {name}({fn_arg}, {args_arg}, {kwargs_arg}):\n"
-            f"    return {fn_arg}(*{args_arg}, **{kwargs_arg})\n"
-        )
-    module = ast.parse(helper_source)
-    fn = module.body[0]
+    if variant == "staged":
+        subs["COPY_F"] = random_local_identifier(rng)
+        subs["COPY_A"] = random_local_identifier(rng)
+        subs["COPY_K"] = random_local_identifier(rng)
+    fn = _patch(_CALL_HELPER_TEMPLATES[variant], subs)
     assert isinstance(fn, ast.FunctionDef)
+    fn.name = name
     return fn
 
 
 def build_builtin_alias(alias_name: str, builtin_name: str, mode: str, rng: random.Random) -> ast.Assign:
     builtin_name_expr = build_text_expr(builtin_name, rng)
     builtins_module_expr = ast.Call(
-        func=ast.Name(id="__import__", ctx=ast.Load()),
+        func=_name_load("__import__"),
         args=[build_text_expr("builtins", rng)],
         keywords=[],
     )
     builtins_getattr_expr = ast.Call(
-        func=ast.Name(id="getattr", ctx=ast.Load()),
+        func=_name_load("getattr"),
         args=[builtins_module_expr, builtin_name_expr],
         keywords=[],
     )
@@ -3814,9 +4506,9 @@ def build_builtin_alias(alias_name: str, builtin_name: str, mode: str, rng: rand
     elif mode == "globals_lookup":
         value = ast.Call(
             func=ast.Attribute(
-                value=ast.Call(func=ast.Name(id="globals", ctx=ast.Load()), args=[], keywords=[]),
+                value=ast.Call(func=_name_load("globals"), args=[], keywords=[]),
                 attr="get",
-                ctx=ast.Load(),
+                ctx=_LOAD,
             ),
             args=[build_text_expr(builtin_name, rng), builtins_getattr_expr],
             keywords=[],
@@ -3826,9 +4518,9 @@ def build_builtin_alias(alias_name: str, builtin_name: str, mode: str, rng: rand
         if alias_style == "dict_get":
             value = ast.Call(
                 func=ast.Attribute(
-                    value=ast.Attribute(value=builtins_module_expr, attr="__dict__", ctx=ast.Load()),
+                    value=ast.Attribute(value=builtins_module_expr, attr="__dict__", ctx=_LOAD),
                     attr="get",
-                    ctx=ast.Load(),
+                    ctx=_LOAD,
                 ),
                 args=[build_text_expr(builtin_name, rng), builtins_getattr_expr],
                 keywords=[],
@@ -3846,8 +4538,8 @@ def build_builtin_alias(alias_name: str, builtin_name: str, mode: str, rng: rand
                         defaults=[],
                     ),
                     body=ast.Call(
-                        func=ast.Name(id="getattr", ctx=ast.Load()),
-                        args=[ast.Name(id=obj_name, ctx=ast.Load()), ast.Name(id=name_name, ctx=ast.Load())],
+                        func=_name_load("getattr"),
+                        args=[_name_load(obj_name), _name_load(name_name)],
                         keywords=[],
                     ),
                 ),
@@ -3856,7 +4548,7 @@ def build_builtin_alias(alias_name: str, builtin_name: str, mode: str, rng: rand
             )
         else:
             value = builtins_getattr_expr
-    return ast.Assign(targets=[ast.Name(id=alias_name, ctx=ast.Store())], value=value)
+    return ast.Assign(targets=[ast.Name(id=alias_name, ctx=_STORE)], value=value)
 
 
 def _is_future_import(stmt: ast.stmt) -> bool:
@@ -3877,22 +4569,27 @@ def module_preamble_insert_index(body: list[ast.stmt]) -> int:
     return idx
 
 
-def insert_after_docstring(module: ast.Module, stmt: ast.stmt) -> None:
-    module.body.insert(module_preamble_insert_index(module.body), stmt)
+def insert_block_after_docstring(module: ast.Module, stmts: list[ast.stmt]) -> None:
+    # One splice for a run of helpers; they keep the given order.
+    index = module_preamble_insert_index(module.body)
+    module.body[index:index] = stmts
+
+
+_JUNK_FUNCTION_TEMPLATE = _stmt_template(
+    "def NAME(x=SEED):\n"
+    "    y = ((x ^ 1337) + 97) - 97\n"
+    "    if y == -1:\n"
+    "        return y\n"
+    "    return y ^ 0\n"
+)
 
 
 def build_junk_function(name: str, rng: random.Random) -> ast.FunctionDef:
-    seed = rng.randint(100, 9999)
-    body_src = (
-        f"def {name}(x={seed}):\n"
-        "    y = ((x ^ 1337) + 97) - 97\n"
-        "    if y == -1:\n"
-        "        return y\n"
-        "    return y ^ 0\n"
-    )
-    module = ast.parse(body_src)
-    fn = module.body[0]
+    # Built before the rename pass, which renames x/y in place: str subs give fresh
+    # Names rather than the shared _name_load nodes.
+    fn = _patch(_JUNK_FUNCTION_TEMPLATE, {"SEED": rng.randint(100, 9999), "x": "x", "y": "y"})
     assert isinstance(fn, ast.FunctionDef)
+    fn.name = name
     return fn
 
 
@@ -3900,19 +4597,28 @@ def docstring_insert_index(body: list[ast.stmt]) -> int:
     return module_preamble_insert_index(body)
 
 
-def inject_junk_functions(tree: ast.AST, rng: random.Random, count: int, position: str) -> int:
+def inject_junk_functions(
+    tree: ast.AST,
+    rng: random.Random,
+    count: int,
+    position: str,
+    used: set[str] | None = None,
+) -> int:
     if count <= 0 or not isinstance(tree, ast.Module):
         return 0
 
-    used = collect_identifiers(tree)
+    if used is None:
+        used = collect_identifiers(tree)
     inserted = 0
-    for idx in range(count):
-        base = f"_junk_{idx:x}"
-        name = base
-        suffix = 0
+    top: list[ast.stmt] = []
+    # Names are _junk_0, _junk_1, ...; indices already taken in the tree are skipped.
+    serial = 0
+    for _ in range(count):
+        name = f"_junk_{serial:x}"
         while name in used:
-            suffix += 1
-            name = f"{base}_{suffix:x}"
+            serial += 1
+            name = f"_junk_{serial:x}"
+        serial += 1
         used.add(name)
         stmt = build_junk_function(name, rng)
         if position == "bottom":
@@ -3922,17 +4628,21 @@ def inject_junk_functions(tree: ast.AST, rng: random.Random, count: int, positio
             idx = rng.randint(start, len(tree.body))
             tree.body.insert(idx, stmt)
         else:
-            insert_after_docstring(tree, stmt)
+            top.append(stmt)
         inserted += 1
+    if top:
+        top.reverse()
+        insert_block_after_docstring(tree, top)
 
     return inserted
 
 
 def preserve_shebang(source: str, output: str) -> str:
-    lines = source.splitlines()
-    if lines and lines[0].startswith("#!"):
-        return lines[0] + "\n" + output
-    return output
+    if not source.startswith("#!"):
+        return output
+    end = source.find("\n")
+    shebang = source if end < 0 else source[:end]
+    return shebang.rstrip("\r") + "\n" + output
 
 
 def resolve_effective_value_salt(source: str, config: ObfuscationConfig) -> int:
@@ -3965,7 +4675,7 @@ def wrap_source(source: str, rng: random.Random) -> str:
         encode_steps: list[tuple[str, int]] = []
 
         xor_key = rng.randint(1, 255)
-        encoded = bytes((byte ^ xor_key) for byte in encoded)
+        encoded = _xor_bytes(encoded, xor_key)
         encode_steps.append(("xor", xor_key))
 
         if rng.random() < 0.65:
@@ -3977,10 +4687,10 @@ def wrap_source(source: str, rng: random.Random) -> str:
             encode_steps.append(("rol", rot))
         if rng.random() < 0.4:
             xor_key2 = rng.randint(1, 255)
-            encoded = bytes((byte ^ xor_key2) for byte in encoded)
+            encoded = _xor_bytes(encoded, xor_key2)
             encode_steps.append(("xor", xor_key2))
 
-        encoded = zlib.compress(encoded, rng.randint(6, 9))
+        encoded = zlib.compress(encoded, rng.randint(4, _ZLIB_LEVEL))
         encode_steps.append(("zlib", 0))
 
         base_codec = rng.choice(("b85", "b64"))
@@ -4055,7 +4765,7 @@ def wrap_source(source: str, rng: random.Random) -> str:
 
         plan_text = ";".join(f"{tag_values[name]}:{value}" for name, value in decode_steps)
         plan_key = rng.randint(1, 255)
-        plan_blob = bytes((byte ^ plan_key) for byte in plan_text.encode("utf-8")).hex()
+        plan_blob = _xor_bytes(plan_text.encode("utf-8"), plan_key).hex()
 
         segment_chunks.append(shuffled_chunks)
         segment_orders.append(restore_order)
@@ -4144,7 +4854,7 @@ def wrap_source(source: str, rng: random.Random) -> str:
             f"        elif {tag_name} == {tag_values['unz']}:",
             f"            {data_name} = {alias_z}.decompress({data_name})",
             f"        elif {tag_name} == {tag_values['xor']}:",
-            f"            {data_name} = bytes(({byte_name} ^ {value_name}) for {byte_name} in {data_name})",
+            f"            {data_name} = {data_name}.translate(bytes(({byte_name} ^ {value_name}) for {byte_name} in range(256)))",
             f"        elif {tag_name} == {tag_values['rev']}:",
             f"            {data_name} = {data_name}[::-1]",
             f"        elif {tag_name} == {tag_values['ror']}:",
@@ -4180,6 +4890,65 @@ def wrap_source(source: str, rng: random.Random) -> str:
     return "\n".join(lines)
 
 
+def build_constant_handler(
+    transform: str,
+    config: ObfuscationConfig,
+    rng: random.Random,
+    value_salt: int,
+) -> ast.NodeTransformer | None:
+    if transform == "bools" and config.bools:
+        return BoolObfuscator(rng, config.bool_mode)
+    if transform == "ints" and config.ints:
+        return IntObfuscator(rng, config.int_mode, value_salt)
+    if transform == "floats" and config.floats:
+        return FloatObfuscator(rng, config.float_mode)
+    if transform == "bytes" and config.bytes_:
+        return BytesObfuscator(rng, config.bytes_mode, value_salt)
+    if transform == "none" and config.none_values:
+        return NoneObfuscator(rng, config.none_mode)
+    return None
+
+
+def build_rewrite_stage(
+    transform: str,
+    config: ObfuscationConfig,
+    rng: random.Random,
+    call_helper_names: tuple[str, ...],
+) -> ast.NodeTransformer | None:
+    if transform == "attrs" and config.attrs:
+        return AttributeLoadObfuscator(
+            rng,
+            config.preserve_attrs,
+            config.attr_mode,
+            config.attr_rate,
+            config.dynamic_methods["attr"],
+        )
+    if transform == "setattrs" and config.setattrs:
+        return SetAttrRewriter(
+            rng,
+            config.preserve_attrs,
+            config.setattr_mode,
+            config.setattr_rate,
+            config.dynamic_methods["setattr"],
+        )
+    if transform == "calls" and config.calls:
+        return CallObfuscator(
+            rng,
+            call_helper_names,
+            config.call_mode,
+            config.call_rate,
+            config.dynamic_methods["call"],
+        )
+    if transform == "flow" and config.flow:
+        return FlowObfuscator(
+            rng,
+            config.keep_docstrings,
+            config.flow_rate,
+            config.flow_count,
+        )
+    return None
+
+
 def obfuscate_source(
     source: str,
     config: ObfuscationConfig,
@@ -4194,29 +4963,33 @@ def obfuscate_source(
         "value_salt": value_salt,
     }
     if "builtins_eval_call" in config.dynamic_methods["call"]:
-        stats.warnings.append("risky method enabled: call:builtins_eval_call")
+        stats.warn("risky method enabled: call:builtins_eval_call")
 
-    stats.junk_functions = inject_junk_functions(tree, rng, config.junk, config.junk_position)
+    # One generator mints every new name in the pipeline. Its set holds every identifier
+    # in the tree plus every name minted so far; names replaced by the rename pass are
+    # left in, which only keeps them off-limits.
+    scan = _IdentifierScan(tree)
+    names = NameGenerator(scan.ids | config.preserve_names, rng)
+
+    stats.junk_functions = inject_junk_functions(tree, rng, config.junk, config.junk_position, names.used)
 
     rename_map: dict[str, str] = {}
     if config.rename:
-        keyword_preserve = collect_keyword_argument_names(tree)
+        keyword_preserve = scan.keyword_args
         preserve_for_rename = config.preserve_names | keyword_preserve
-        used = collect_identifiers(tree) | preserve_for_rename
-        generator = NameGenerator(used, rng)
-        collector = RenameCollector(preserve_for_rename, generator)
-        collector.visit(tree)
-        rename_map = collector.mapping
-        tree = Renamer(rename_map).visit(tree)
+        for name in keyword_preserve:
+            names.reserve(name)
+        renamer = RenameVisitor(preserve_for_rename, names)
+        tree = renamer.visit(tree)
+        rename_map = renamer.mapping
         stats.renamed = len(rename_map)
 
-    tree, stats.redirects = apply_frontline_redirects(tree, config, rng)
+    tree, stats.redirects = apply_frontline_redirects(tree, config, rng, names)
 
     if config.strings:
-        helper_name_gen = NameGenerator(collect_identifiers(tree), rng)
         helper_specs: list[tuple[str, dict[str, int]]] = []
         for _ in range(max(1, config.string_helpers)):
-            helper_name = helper_name_gen.next_name()
+            helper_name = names.next_name()
             mode_tags: dict[str, int] = {}
             used_tags: set[int] = set()
             for key in ("xor", "b85", "reverse"):
@@ -4234,14 +5007,21 @@ def obfuscate_source(
             config.string_chunk_max,
             config.string_mode,
             value_salt,
+            config.string_dedup,
+            names,
         )
         tree = string_obf.transform(tree, config.mt_workers, rng.randint(0, 2**31 - 1))
         stats.strings += string_obf.changed
         if string_obf.changed > 0 and isinstance(tree, ast.Module):
+            insert_block_after_docstring(tree, string_obf.prelude)
             insertion_specs = list(helper_specs)
             rng.shuffle(insertion_specs)
-            for helper_name, mode_tags in insertion_specs:
-                insert_after_docstring(tree, build_string_helper(helper_name, mode_tags, rng, value_salt))
+            string_helper_defs = [
+                build_string_helper(helper_name, mode_tags, rng, value_salt)
+                for helper_name, mode_tags in insertion_specs
+            ]
+            string_helper_defs.reverse()
+            insert_block_after_docstring(tree, string_helper_defs)
             string_helpers = helper_hints["string_helpers"]
             assert isinstance(string_helpers, list)
             for helper_name, mode_tags in helper_specs:
@@ -4249,8 +5029,7 @@ def obfuscate_source(
 
     call_helper_names: tuple[str, ...] = ()
     if config.calls:
-        call_helper_gen = NameGenerator(collect_identifiers(tree), rng)
-        call_helper_names = tuple(call_helper_gen.next_name() for _ in range(max(1, config.call_helpers)))
+        call_helper_names = tuple(names.next_name() for _ in range(max(1, config.call_helpers)))
     if config.calls and (
         (config.call_mode in {"mixed", "wrap"} and "helper_wrap" in config.dynamic_methods["call"])
         or config.call_mode == "wrap"
@@ -4259,48 +5038,51 @@ def obfuscate_source(
         assert isinstance(call_helpers, list)
         call_helpers.extend(call_helper_names)
 
+    no_sites = {"setattrs", "flow", "floats"} - collect_transform_sites(tree)
     for _ in range(config.passes):
-        for transform in config.transform_order:
-            if transform == "imports" and config.imports:
+        constant_handlers: list[tuple[str, ast.NodeTransformer]] = []
+        rewrite_stages: list[tuple[str, ast.NodeTransformer]] = []
+        for transform in (*config.transform_order, ""):
+            if constant_handlers and transform not in CONSTANT_TRANSFORMS:
+                tree = ConstantObfuscator([handler for _, handler in constant_handlers]).visit(tree)
+                for name, handler in constant_handlers:
+                    field_name = CONSTANT_TRANSFORMS[name]
+                    setattr(stats, field_name, getattr(stats, field_name) + handler.changed)
+                constant_handlers = []
+            if rewrite_stages and transform not in REWRITE_TRANSFORMS:
+                if len(rewrite_stages) == 1:
+                    tree = rewrite_stages[0][1].visit(tree)
+                else:
+                    tree = FusedRewriter([stage for _, stage in rewrite_stages]).visit(tree)
+                for name, stage in rewrite_stages:
+                    field_name = REWRITE_TRANSFORMS[name]
+                    setattr(stats, field_name, getattr(stats, field_name) + stage.changed)
+                rewrite_stages = []
+            if transform in CONSTANT_TRANSFORMS:
+                if transform in no_sites:
+                    continue
+                handler = build_constant_handler(transform, config, rng, value_salt)
+                if handler is not None:
+                    constant_handlers.append((transform, handler))
+            elif transform in REWRITE_TRANSFORMS:
+                if transform in no_sites:
+                    continue
+                stage = build_rewrite_stage(transform, config, rng, call_helper_names)
+                # Every rewrite is behind its rate gate, so a zero-rate stage is built
+                # (construction may draw from rng) but its walk is skipped.
+                if stage is not None and stage.rate > 0.0:
+                    rewrite_stages.append((transform, stage))
+            elif transform == "imports" and config.imports:
                 import_obf = ImportObfuscator(
                     rng,
                     config.import_mode,
                     config.import_rate,
                     config.dynamic_methods["import"],
-                    collect_identifiers(tree),
+                    names,
                 )
-                tree = import_obf.visit(tree)
+                if import_obf.rate > 0.0:
+                    tree = import_obf.visit(tree)
                 stats.imports += import_obf.changed
-            elif transform == "attrs" and config.attrs:
-                attr_obf = AttributeLoadObfuscator(
-                    rng,
-                    config.preserve_attrs,
-                    config.attr_mode,
-                    config.attr_rate,
-                    config.dynamic_methods["attr"],
-                )
-                tree = attr_obf.visit(tree)
-                stats.attrs += attr_obf.changed
-            elif transform == "setattrs" and config.setattrs:
-                setattrs_obf = SetAttrRewriter(
-                    rng,
-                    config.preserve_attrs,
-                    config.setattr_mode,
-                    config.setattr_rate,
-                    config.dynamic_methods["setattr"],
-                )
-                tree = setattrs_obf.visit(tree)
-                stats.setattrs += setattrs_obf.changed
-            elif transform == "calls" and config.calls:
-                call_obf = CallObfuscator(
-                    rng,
-                    call_helper_names,
-                    config.call_mode,
-                    config.call_rate,
-                    config.dynamic_methods["call"],
-                )
-                tree = call_obf.visit(tree)
-                stats.calls += call_obf.changed
             elif transform == "conds" and config.conditions:
                 cond_obf = ConditionObfuscator(
                     rng,
@@ -4308,7 +5090,8 @@ def obfuscate_source(
                     config.condition_rate,
                     config.branch_rate,
                 )
-                tree = cond_obf.visit(tree)
+                if cond_obf.rate > 0.0 or cond_obf.branch_rate > 0.0:
+                    tree = cond_obf.visit(tree)
                 stats.conditions += cond_obf.changed
                 stats.branch_extensions += cond_obf.branch_extended
             elif transform == "loops" and config.loops:
@@ -4316,39 +5099,11 @@ def obfuscate_source(
                     rng,
                     config.loop_mode,
                     config.loop_rate,
-                    collect_identifiers(tree),
+                    names,
                 )
-                tree = loop_obf.visit(tree)
+                if loop_obf.rate > 0.0:
+                    tree = loop_obf.visit(tree)
                 stats.loops += loop_obf.changed
-            elif transform == "bools" and config.bools:
-                bool_obf = BoolObfuscator(rng, config.bool_mode)
-                tree = bool_obf.visit(tree)
-                stats.bools += bool_obf.changed
-            elif transform == "ints" and config.ints:
-                int_obf = IntObfuscator(rng, config.int_mode, value_salt)
-                tree = int_obf.visit(tree)
-                stats.ints += int_obf.changed
-            elif transform == "floats" and config.floats:
-                float_obf = FloatObfuscator(rng, config.float_mode)
-                tree = float_obf.visit(tree)
-                stats.floats += float_obf.changed
-            elif transform == "bytes" and config.bytes_:
-                bytes_obf = BytesObfuscator(rng, config.bytes_mode, value_salt)
-                tree = bytes_obf.visit(tree)
-                stats.bytes_ += bytes_obf.changed
-            elif transform == "none" and config.none_values:
-                none_obf = NoneObfuscator(rng, config.none_mode)
-                tree = none_obf.visit(tree)
-                stats.none_values += none_obf.changed
-            elif transform == "flow" and config.flow:
-                flow_obf = FlowObfuscator(
-                    rng,
-                    config.keep_docstrings,
-                    config.flow_rate,
-                    config.flow_count,
-                )
-                tree = flow_obf.visit(tree)
-                stats.flow_blocks += flow_obf.changed
 
     if (
         config.calls
@@ -4361,27 +5116,26 @@ def obfuscate_source(
     ):
         insertion_names = list(call_helper_names)
         rng.shuffle(insertion_names)
-        for helper_name in insertion_names:
-            insert_after_docstring(tree, build_call_helper(helper_name, rng))
+        call_helper_defs = [build_call_helper(helper_name, rng) for helper_name in insertion_names]
+        call_helper_defs.reverse()
+        insert_block_after_docstring(tree, call_helper_defs)
 
     if config.builtins:
-        builtin_targets = collect_builtin_loads(tree, config.preserve_names)
+        builtin_targets, builtin_sites = collect_builtin_load_sites(tree, config.preserve_names)
         if builtin_targets:
-            used = collect_identifiers(tree) | config.preserve_names
-            generator = NameGenerator(used, rng)
-            builtin_map = {name: generator.next_name() for name in builtin_targets}
+            builtin_map = {name: names.next_name() for name in builtin_targets}
             builtin_transform = BuiltinAliasTransformer(builtin_map, config.builtin_rate, rng)
-            tree = builtin_transform.visit(tree)
+            builtin_transform.apply_sites(builtin_sites)
             if isinstance(tree, ast.Module):
+                aliases: list[ast.stmt] = []
                 for name in reversed(builtin_targets):
                     chosen = rng.choice(config.dynamic_methods["builtin"])
-                    insert_after_docstring(
-                        tree,
-                        build_builtin_alias(builtin_map[name], name, chosen, rng),
-                    )
+                    aliases.append(build_builtin_alias(builtin_map[name], name, chosen, rng))
+                aliases.reverse()
+                insert_block_after_docstring(tree, aliases)
             stats.builtins = builtin_transform.changed
 
-    ast.fix_missing_locations(tree)
+    _fill_statement_locations(tree)
     output = ast.unparse(tree)
 
     if config.wrap:
@@ -4395,12 +5149,96 @@ def obfuscate_source(
     return output, rename_map, stats, helper_hints
 
 
-def sha256_text(text: str) -> str:
-    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+# Settings that never change the obfuscated output; kept out of the cache key.
+CACHE_IGNORED_FIELDS = frozenset(
+    {
+        "emit_map",
+        "emit_meta",
+        "cache_dir",
+        "meta_include_source",
+        "meta_minimal",
+        "meta_omit_rename_map",
+        "meta_omit_helper_hints",
+        "deobf_mode",
+        "check",
+        "explain",
+    }
+)
+
+
+def obfuscation_cache_key(source: str, config: ObfuscationConfig) -> str:
+    relevant = {item.name: getattr(config, item.name) for item in fields(config) if item.name not in CACHE_IGNORED_FIELDS}
+    digest = hashlib.blake2b(digest_size=20)
+    # The tool's own source is part of the key so upgrades never serve stale output.
+    digest.update(Path(__file__).read_bytes())
+    digest.update(source.encode("utf-8"))
+    digest.update(
+        json.dumps(
+            relevant,
+            sort_keys=True,
+            default=lambda value: sorted(value) if isinstance(value, (set, frozenset)) else str(value),
+        ).encode("utf-8")
+    )
+    return digest.hexdigest()
+
+
+def cached_obfuscate_source(
+    source: str,
+    config: ObfuscationConfig,
+) -> tuple[str, dict[str, str], ObfuscationStats, dict[str, object]]:
+    # Unseeded runs are meant to differ every time, so they bypass the cache.
+    if config.cache_dir is None or config.seed is None:
+        return obfuscate_source(source, config)
+    entry_path = config.cache_dir / f"{obfuscation_cache_key(source, config)}.json"
+    try:
+        entry = json.loads(entry_path.read_text(encoding="utf-8"))
+        output = entry["output"]
+        stats = ObfuscationStats(**entry["stats"])
+        if config.check:
+            compile(output, "<obfuscated>", "exec")
+        return output, entry["rename_map"], stats, entry["helper_hints"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    output, rename_map, stats, helper_hints = obfuscate_source(source, config)
+    entry = {
+        "output": output,
+        "rename_map": rename_map,
+        "stats": {item.name: getattr(stats, item.name) for item in fields(stats)},
+        "helper_hints": helper_hints,
+    }
+    try:
+        config.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = entry_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(entry), encoding="utf-8")
+        tmp_path.replace(entry_path)
+    except OSError:
+        pass
+    return output, rename_map, stats, helper_hints
+
+
+_HASH_CHUNK = 1 << 16
+
+
+def sha256_text(*parts: str) -> str:
+    # Digest of the concatenated parts, encoded in 64K-character slices so no full
+    # UTF-8 copy of a large source is held; slicing on code points keeps it exact.
+    digest = hashlib.sha256()
+    for part in parts:
+        if len(part) <= _HASH_CHUNK:
+            digest.update(part.encode("utf-8"))
+            continue
+        for start in range(0, len(part), _HASH_CHUNK):
+            digest.update(part[start : start + _HASH_CHUNK].encode("utf-8"))
+    return digest.hexdigest()
+
+
+# Level 6 is within ~1% of level 9 on source text at roughly half the cost.
+_ZLIB_LEVEL = 6
 
 
 def encode_source_payload(source: str) -> str:
-    return base64.b85encode(zlib.compress(source.encode("utf-8"), 9)).decode("ascii")
+    return base64.b85encode(zlib.compress(source.encode("utf-8"), _ZLIB_LEVEL)).decode("ascii")
 
 
 def decode_source_payload(payload: str) -> str:
@@ -4445,7 +5283,8 @@ def config_to_meta(config: ObfuscationConfig) -> dict[str, object]:
             "loop_rate": config.loop_rate,
             "redirect_rate": config.redirect_rate,
         },
-        "dynamic_methods": {k: list(v) for k, v in config.dynamic_methods.items()},
+        # Method pools are already tuples, which json writes as lists.
+        "dynamic_methods": dict(config.dynamic_methods),
         "junk": {"count": config.junk, "position": config.junk_position},
         "string": {
             "mode": config.string_mode,
@@ -4478,17 +5317,11 @@ def config_to_meta(config: ObfuscationConfig) -> dict[str, object]:
         "condition_mode": config.condition_mode,
         "loop_mode": config.loop_mode,
         "attr_mode": config.attr_mode,
-        "import_rate": config.import_rate,
-        "attr_rate": config.attr_rate,
-        "flow_rate": config.flow_rate,
-        "condition_rate": config.condition_rate,
-        "branch_rate": config.branch_rate,
-        "loop_rate": config.loop_rate,
-        "redirect_rate": config.redirect_rate,
         "flow_count": config.flow_count,
         "order": list(config.transform_order),
         "seed": config.seed,
         "mt_workers": config.mt_workers,
+        "string_dedup": config.string_dedup,
         "value_salt": config.value_salt,
         "auto_value_salt": config.auto_value_salt,
     }
@@ -4525,7 +5358,7 @@ def build_obfumeta(
     stats: ObfuscationStats,
     helper_hints: dict[str, object] | None = None,
 ) -> dict[str, object]:
-    warnings = list(stats.warnings)
+    warnings = list(stats.warnings or ())
     if config.meta_minimal:
         warnings.append("meta-minimal: omitted source payload, rename_map and helper_hints")
     meta: dict[str, object] = {
@@ -4534,7 +5367,8 @@ def build_obfumeta(
         "config": config_to_meta(config),
         "stats": stats_to_meta(stats),
         "input_sha256": sha256_text(source),
-        "output_sha256": sha256_text(output),
+        # Hash of the file as obfuscate_file() writes it, trailing newline included.
+        "output_sha256": sha256_text(output, "\n"),
         "warnings": warnings,
     }
     if not config.meta_omit_rename_map:
@@ -4546,9 +5380,26 @@ def build_obfumeta(
     return meta
 
 
+# Stands in for the source payload while the rest of the metadata is serialized.
+_PAYLOAD_SLOT = "\0original_source_b85_zlib\0"
+
+
 def write_obfumeta(path: Path, meta: dict[str, object]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(meta, indent=2, sort_keys=True), encoding="utf-8")
+    payload = meta.get("original_source_b85_zlib")
+    if not isinstance(payload, str):
+        path.write_text(json.dumps(meta, indent=2, sort_keys=True), encoding="utf-8")
+        return
+    # The payload dwarfs everything else and base85 text never needs JSON escaping,
+    # so it is written straight into its slot instead of going through the encoder.
+    text = json.dumps({**meta, "original_source_b85_zlib": _PAYLOAD_SLOT}, indent=2, sort_keys=True)
+    head, _, tail = text.partition(json.dumps(_PAYLOAD_SLOT))
+    with path.open("w", encoding="utf-8") as handle:
+        handle.write(head)
+        handle.write('"')
+        handle.write(payload)
+        handle.write('"')
+        handle.write(tail)
 
 
 def is_identifier_name(text: str) -> bool:
@@ -4718,7 +5569,7 @@ def extract_thunk_wrapped_call(node: ast.Call) -> ast.Call | None:
     return None
 
 
-class BestEffortDeobfuscator(ast.NodeTransformer):
+class BestEffortDeobfuscator(DispatchTransformer):
     def __init__(
         self,
         string_helpers: dict[str, dict[str, int]] | None = None,
@@ -4747,7 +5598,7 @@ class BestEffortDeobfuscator(ast.NodeTransformer):
         if mode == mode_map.get("b85") and isinstance(payload, ast.Constant) and isinstance(payload.value, str):
             try:
                 self.changes += 1
-                return ast.Constant(base64.b85decode(payload.value.encode("ascii")).decode("utf-8"))
+                return ast.Constant(base64.b85decode(payload.value.encode("ascii")).decode("utf-8", "surrogatepass"))
             except Exception:
                 return None
         if mode == mode_map.get("reverse") and isinstance(payload, ast.Constant) and isinstance(payload.value, str):
@@ -4755,17 +5606,32 @@ class BestEffortDeobfuscator(ast.NodeTransformer):
             return ast.Constant(payload.value[::-1])
         if mode == mode_map.get("xor") and isinstance(payload, ast.Tuple):
             chars: list[str] = []
-            for entry in payload.elts:
+            entries: list[ast.expr] = payload.elts
+            if entries and isinstance(entries[0], ast.Constant):
+                # Flat (key, hex, key, hex, ...) payloads; older outputs nest each pair.
+                if len(entries) % 2:
+                    return None
+                entries = [ast.Tuple(elts=entries[idx : idx + 2], ctx=_LOAD) for idx in range(0, len(entries), 2)]
+            for entry in entries:
                 if (
                     not isinstance(entry, ast.Tuple)
                     or len(entry.elts) != 2
                     or not isinstance(entry.elts[0], ast.Constant)
                     or not isinstance(entry.elts[0].value, int)
-                    or not isinstance(entry.elts[1], ast.Tuple)
                 ):
                     return None
                 key = entry.elts[0].value
-                for v in entry.elts[1].elts:
+                data = entry.elts[1]
+                if isinstance(data, ast.Constant) and isinstance(data.value, str):
+                    try:
+                        chars.append(_xor_bytes(bytes.fromhex(data.value), (key ^ salt) & 0xFF).decode("utf-8", "surrogatepass"))
+                    except ValueError:
+                        return None
+                    continue
+                # Older outputs: one int Constant per character.
+                if not isinstance(data, ast.Tuple):
+                    return None
+                for v in data.elts:
                     if not isinstance(v, ast.Constant) or not isinstance(v.value, int):
                         return None
                     chars.append(chr(v.value ^ key ^ salt))
@@ -4807,16 +5673,16 @@ class BestEffortDeobfuscator(ast.NodeTransformer):
         self.generic_visit(node)
         string_restored = self._decode_string_helper(node)
         if string_restored is not None:
-            return ast.copy_location(string_restored, node)
+            return _cl(string_restored, node)
         rebuilt_call = self._decode_triplet_call(node)
         if rebuilt_call is not None:
-            return ast.copy_location(rebuilt_call, node)
+            return _cl(rebuilt_call, node)
         kind = call_kind(node.func)
         if kind == "getattr" and len(node.args) == 2:
             attr = decode_obf_text_expr(node.args[1])
             if attr is not None and is_identifier_name(attr):
                 self.changes += 1
-                return ast.copy_location(ast.Attribute(value=node.args[0], attr=attr, ctx=ast.Load()), node)
+                return _cl(ast.Attribute(value=node.args[0], attr=attr, ctx=_LOAD), node)
         return node
 
     def visit_Expr(self, node: ast.Expr) -> ast.AST:
@@ -4828,9 +5694,9 @@ class BestEffortDeobfuscator(ast.NodeTransformer):
             attr = decode_obf_text_expr(node.value.args[1])
             if attr is not None and is_identifier_name(attr):
                 self.changes += 1
-                return ast.copy_location(
+                return _cl(
                     ast.Assign(
-                        targets=[ast.Attribute(value=node.value.args[0], attr=attr, ctx=ast.Store())],
+                        targets=[ast.Attribute(value=node.value.args[0], attr=attr, ctx=_STORE)],
                         value=node.value.args[2],
                     ),
                     node,
@@ -4839,8 +5705,8 @@ class BestEffortDeobfuscator(ast.NodeTransformer):
             attr = decode_obf_text_expr(node.value.args[1])
             if attr is not None and is_identifier_name(attr):
                 self.changes += 1
-                return ast.copy_location(
-                    ast.Delete(targets=[ast.Attribute(value=node.value.args[0], attr=attr, ctx=ast.Del())]),
+                return _cl(
+                    ast.Delete(targets=[ast.Attribute(value=node.value.args[0], attr=attr, ctx=_DEL)]),
                     node,
                 )
         return node
@@ -4897,7 +5763,7 @@ def rewrite_import_assignments_in_tree(tree: ast.AST) -> int:
                     if aliases:
                         changed += 1
                         out.append(
-                            ast.copy_location(
+                            _cl(
                                 ast.ImportFrom(module=module_name, names=aliases, level=0),
                                 stmt,
                             )
@@ -4907,7 +5773,7 @@ def rewrite_import_assignments_in_tree(tree: ast.AST) -> int:
                     changed += 1
                     asname = target_name if target_name != module_name.split(".")[0] else None
                     out.append(
-                        ast.copy_location(
+                        _cl(
                             ast.Import(names=[ast.alias(name=module_name, asname=asname)]),
                             stmt,
                         )
@@ -4933,7 +5799,7 @@ def rewrite_import_assignments_in_tree(tree: ast.AST) -> int:
                     changed += 1
                     asname = stmt.targets[0].id if stmt.targets[0].id != attr_name else None
                     out.append(
-                        ast.copy_location(
+                        _cl(
                             ast.ImportFrom(
                                 module=module_name,
                                 names=[ast.alias(name=attr_name, asname=asname)],
@@ -5023,7 +5889,7 @@ def deobfuscate_with_meta(
     simplifier = BestEffortDeobfuscator(string_helper_map, call_helper_set)
     tree = simplifier.visit(tree)
     import_changes = rewrite_import_assignments_in_tree(tree)
-    ast.fix_missing_locations(tree)
+    _fill_statement_locations(tree)
     if mode == "strict":
         raise ValueError("Strict mode requires source payload in metadata")
     warn_bits: list[str] = []
@@ -5056,7 +5922,7 @@ def explain_config(config: ObfuscationConfig) -> None:
         f"cond_rate={config.condition_rate:.2f}, branch_rate={config.branch_rate:.2f}, "
         f"loop_rate={config.loop_rate:.2f}, flow_count={config.flow_count}, "
         f"mt_workers={config.mt_workers}, "
-        f"str_chunks={config.string_chunk_min}-{config.string_chunk_max}, "
+        f"str_chunks={config.string_chunk_min}-{config.string_chunk_max}, str_dedup={config.string_dedup}, "
         f"str_helpers={config.string_helpers}, call_helpers={config.call_helpers}, "
         f"redirects={config.frontline_redirects}, redirect_rate={config.redirect_rate:.2f}, "
         f"redirect_max={config.redirect_max}, redirect_kinds={','.join(sorted(config.redirect_kinds))}, "
@@ -5070,44 +5936,14 @@ def explain_config(config: ObfuscationConfig) -> None:
     )
 
 
-def main() -> int:
-    args = parse_args()
-    try:
-        config = resolve_config(args)
-    except ValueError as exc:
-        print(f"error: {exc}", file=sys.stderr)
-        return 2
-
-    source = args.input.read_text(encoding="utf-8")
-    if args.deobfuscate:
-        if args.meta is None:
-            print("error: --meta is required with --deobfuscate", file=sys.stderr)
-            return 2
-        try:
-            restored, deobf_warnings = deobfuscate_with_meta(
-                source,
-                args.meta,
-                config.deobf_mode,
-                args.force,
-            )
-        except Exception as exc:
-            print(f"error: {exc}", file=sys.stderr)
-            return 2
-        args.output.parent.mkdir(parents=True, exist_ok=True)
-        args.output.write_text(restored + "\n", encoding="utf-8")
-        print(f"Deobfuscated: {args.output} using meta={args.meta}")
-        for warn in deobf_warnings:
-            print(f"warning: {warn}")
-        return 0
-
-    if config.explain:
-        explain_config(config)
-
-    output, rename_map, stats, helper_hints = obfuscate_source(source, config)
+def obfuscate_file(input_path: Path, output_path: Path, config: ObfuscationConfig) -> ObfuscationStats:
+    source = input_path.read_text(encoding="utf-8")
+    output, rename_map, stats, helper_hints = cached_obfuscate_source(source, config)
 
-    args.output.parent.mkdir(parents=True, exist_ok=True)
-    written_output = output + "\n"
-    args.output.write_text(written_output, encoding="utf-8")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", encoding="utf-8") as handle:
+        handle.write(output)
+        handle.write("\n")
 
     if config.emit_map is not None:
         config.emit_map.parent.mkdir(parents=True, exist_ok=True)
@@ -5118,11 +5954,52 @@ def main() -> int:
     if config.emit_meta is not None:
         write_obfumeta(
             config.emit_meta,
-            build_obfumeta(config, source, written_output, rename_map, stats, helper_hints),
+            build_obfumeta(config, source, output, rename_map, stats, helper_hints),
         )
+    return stats
 
-    print(
-        f"Wrote: {args.output} | "
+
+def _obfuscate_file_job(job: tuple[Path, Path, ObfuscationConfig]) -> ObfuscationStats:
+    return obfuscate_file(*job)
+
+
+def derive_file_seed(seed: int | None, path: Path) -> int | None:
+    # Stable across processes and runs (unlike hash()), so batch builds stay deterministic.
+    if seed is None:
+        return None
+    digest = hashlib.blake2b(path.name.encode("utf-8"), digest_size=8).digest()
+    return seed ^ int.from_bytes(digest, "big")
+
+
+def plan_batch_jobs(
+    inputs: list[Path],
+    output_dir: Path,
+    config: ObfuscationConfig,
+) -> list[tuple[Path, Path, ObfuscationConfig]]:
+    # Each file gets its own output, map and meta path inside the given directories.
+    for flag, target in (("--output", output_dir), ("--emit-map", config.emit_map), ("--emit-meta", config.emit_meta)):
+        if target is not None and target.is_file():
+            raise ValueError(f"{flag} must be a directory when several inputs are given")
+    jobs: list[tuple[Path, Path, ObfuscationConfig]] = []
+    seen: set[str] = set()
+    for path in inputs:
+        name = path.name
+        if name in seen:
+            raise ValueError(f"duplicate input file name: {name}")
+        seen.add(name)
+        file_config = replace(
+            config,
+            seed=derive_file_seed(config.seed, path),
+            emit_map=None if config.emit_map is None else config.emit_map / f"{name}.map.json",
+            emit_meta=None if config.emit_meta is None else config.emit_meta / f"{name}.obfumeta.json",
+        )
+        jobs.append((path, output_dir / name, file_config))
+    return jobs
+
+
+def format_run_summary(output_path: Path, config: ObfuscationConfig, stats: ObfuscationStats) -> str:
+    return (
+        f"Wrote: {output_path} | "
         f"features(profile={config.profile}, dynamic={config.dynamic_level}, "
         f"rename={config.rename}, strings={config.strings}, ints={config.ints}, "
         f"floats={config.floats}, bytes={config.bytes_}, none={config.none_values}, "
@@ -5140,6 +6017,63 @@ def main() -> int:
         f"setattrs={stats.setattrs}, calls={stats.calls}, builtins={stats.builtins}, redirects={stats.redirects}, "
         f"junk={stats.junk_functions})"
     )
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    try:
+        config = resolve_config(args, argv)
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+
+    if args.deobfuscate:
+        if len(args.input) != 1:
+            print("error: --deobfuscate takes a single input file", file=sys.stderr)
+            return 2
+        if args.meta is None:
+            print("error: --meta is required with --deobfuscate", file=sys.stderr)
+            return 2
+        source = args.input[0].read_text(encoding="utf-8")
+        try:
+            restored, deobf_warnings = deobfuscate_with_meta(
+                source,
+                args.meta,
+                config.deobf_mode,
+                args.force,
+            )
+        except Exception as exc:
+            print(f"error: {exc}", file=sys.stderr)
+            return 2
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(restored + "\n", encoding="utf-8")
+        print(f"Deobfuscated: {args.output} using meta={args.meta}")
+        for warn in deobf_warnings:
+            print(f"warning: {warn}")
+        return 0
+
+    if config.explain:
+        explain_config(config)
+
+    if len(args.input) == 1:
+        stats = obfuscate_file(args.input[0], args.output, config)
+        print(format_run_summary(args.output, config, stats))
+        return 0
+
+    try:
+        jobs = plan_batch_jobs(args.input, args.output, config)
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+    workers = min(args.jobs or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        results = list(map(_obfuscate_file_job, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, len(jobs) // (workers * 4))
+            results = list(executor.map(_obfuscate_file_job, jobs, chunksize=chunksize))
+    for (_, output_path, file_config), stats in zip(jobs, results):
+        print(format_run_summary(output_path, file_config, stats))
     return 0
 
 